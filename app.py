@@ -6,9 +6,9 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s",
     filemode="a" #append to the file if it exists
 )
-import threading
-import io
+import contextlib
 import copy
+import functools
 import json
 import os
 import logging
@@ -17,19 +17,25 @@ import httpx
 import asyncio
 import uuid
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from quart import (
     Blueprint,
     Quart,
+    Request,
     jsonify,
     make_response,
     request,
     send_from_directory,
     render_template,
     current_app,
-    send_file
+    send_file,
+    stream_with_context,
+    websocket
 )
+from werkzeug.exceptions import RequestEntityTooLarge
 
-from openai import AsyncAzureOpenAI
+from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
 from azure.identity.aio import (
     DefaultAzureCredential,
     get_bearer_token_provider
@@ -48,9 +54,37 @@ from backend.utils import (
     convert_to_pf_format,
     format_pf_non_streaming_response,
 )
+from backend.chat.response_cache import (
+    ResponseCache,
+    StreamRecorder,
+    answer_from_response,
+    replay_response,
+    replay_stream,
+)
+from backend.chat.semantic_cache import SemanticCache, partition_key
+from backend.functions.calls import ToolCall, ToolCallDispatcher, run_tool_calls
+from backend.functions.catalogue import ToolCatalogue, ToolSnapshot
+from backend.http_client import SharedHTTPClient
+from backend.speech.admission import AdmissionController, Overloaded
+from backend.speech.decoders import PCMDecoder, SniffingDecoder, create_decoder
+from backend.speech.formats import AudioFormat, UnsupportedAudio
+from backend.speech.language_hints import LanguageHintCache
+from backend.speech.limits import LimitedDecoder, UploadTooLarge, check_content_length, limited
+from backend.speech.local import LocalRecognizerBackend
+from backend.speech.metrics import RequestTimer, TranscriptionMetrics, timed
+from backend.speech.pool import RecognizerPool
+from backend.speech.recognition import (
+    SpeechRecognizerFactory,
+    recognize_continuous,
+    recognize_once,
+    segments_text,
+)
+from backend.speech.segmented import PCMSegmenter, SegmentedRecognition
+from backend.speech.streaming import decode_and_recognize, decode_and_recognize_segmented, decode_short_clip
+from backend.speech.transcript_cache import TranscriptCache
+from backend.speech.vad import SilenceTrimmer, contains_speech, pcm_seconds, trim_silence
+from backend.speech.workers import SpeechWorkerClient, forwarded_headers
 import tempfile
-import azure.cognitiveservices.speech as speechsdk
-import ffmpeg
 import csv
 from azure.storage.blob.aio import BlobServiceClient
 import pandas as pd
@@ -62,9 +96,6 @@ from azure.core.pipeline.transport import AioHttpTransport
 
 
 
-#for speech
-SPEECH_KEY = os.getenv("AZURE_SPEECH_KEY")
-SPEECH_REGION = os.getenv("AZURE_SPEECH_REGION")
 #for storage
 AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 AZURE_RESULTS_CONTAINER = os.getenv("AZURE_RESULTS_CONTAINER")
@@ -76,13 +107,98 @@ bp = Blueprint("routes", __name__, static_folder="static", template_folder="stat
 cosmos_db_ready = asyncio.Event()
 
 
+#audio uploads are bounded by AZURE_SPEECH_MAX_UPLOAD_BYTES, every other request by Quart's MAX_CONTENT_LENGTH
+SPEECH_UPLOAD_PATHS = ("/transcribe", "/conversation/voice", "/history/generate/voice")
+
+
+class SpeechUploadRequest(Request):
+    #Quart sizes the body limit when the request is created, before routing, so it is picked by path here
+    def __init__(self, method, scheme, path, *args, max_content_length=None, **kwargs):
+        if path in SPEECH_UPLOAD_PATHS:
+            max_content_length = app_settings.speech.max_upload_bytes or None
+        super().__init__(method, scheme, path, *args, max_content_length=max_content_length, **kwargs)
+
+    @property
+    def max_content_length(self):
+        #read by the multipart parser of the voice endpoints
+        if self.path in SPEECH_UPLOAD_PATHS:
+            return app_settings.speech.max_upload_bytes or None
+        return super().max_content_length
+
+
 def create_app():
     app = Quart(__name__)
+    app.request_class = SpeechUploadRequest
     app.register_blueprint(bp)
     app.config["TEMPLATES_AUTO_RELOAD"] = True
     
     @app.before_serving
     async def init():
+        app.speech_executor = ThreadPoolExecutor(
+            max_workers=app_settings.speech.max_workers,
+            thread_name_prefix="speech"
+        )
+        app.audio_decoder = create_decoder(app_settings.speech.decoder)
+        app.live_audio_decoder = create_decoder(app_settings.speech.decoder, live=True)
+        app.language_hints = LanguageHintCache(**app_settings.speech.language_hint_options())
+        #segments beyond the first of every request share these, so long recordings cannot starve short ones
+        app.segment_slots = asyncio.Semaphore(app_settings.speech.segment_max_parallel_per_worker)
+        app.transcription_metrics = TranscriptionMetrics()
+        app.transcribe_admission = AdmissionController(**app_settings.speech.admission_options())
+        app.live_admission = AdmissionController(**app_settings.speech.live_admission_options())
+        app.transcript_cache = TranscriptCache(
+            [app_settings.speech.backend, *app_settings.speech.languages],
+            max_entries=app_settings.speech.transcript_cache_size,
+            ttl_seconds=app_settings.speech.transcript_cache_ttl_seconds,
+            directory=app_settings.speech.transcript_cache_dir,
+            executor=app.speech_executor
+        )
+        logging.info(f"Using the {app.audio_decoder.name} audio decoder")
+        app.speech_workers = None
+        if app_settings.speech.worker_processes > 0:
+            #uploads are transcribed by the separate speech worker pool (see gunicorn.conf.py), live dictation stays here
+            app.speech_workers = SpeechWorkerClient(app_settings.speech.worker_socket)
+            logging.info(f"Forwarding transcriptions to the speech workers on {app_settings.speech.worker_socket}")
+        app.speech_recognizers = None
+        app.recognizer_pool = None
+        if app_settings.speech.backend == "local":
+            #in-process stand-in for load tests, no Speech resource involved
+            logging.warning("Using the local speech recognizer backend -- transcripts are placeholders")
+            app.speech_recognizers = LocalRecognizerBackend(app_settings.speech.languages, **app_settings.speech.local_backend_options())
+        elif app_settings.speech.key and app_settings.speech.region:
+            app.speech_recognizers = SpeechRecognizerFactory(app_settings.speech)
+        else:
+            logging.warning("AZURE_SPEECH_KEY or AZURE_SPEECH_REGION is not set -- transcription is disabled")
+        if app.speech_recognizers:
+            app.recognizer_pool = RecognizerPool(
+                app.speech_recognizers.create_push,
+                size=app_settings.speech.pool_size,
+                executor=app.speech_executor,
+                max_idle_seconds=app_settings.speech.pool_max_idle_seconds
+            )
+            await app.recognizer_pool.start()
+        app.azure_openai_client = None
+        app.azure_openai_credential = None
+        app.azure_openai_client_lock = asyncio.Lock()
+        app.http_client = None
+        app.tool_catalogue = None
+        app.cosmos_conversation_client = None
+        if app_settings.speech.worker_mode:
+            #a speech worker process only serves /transcribe to the web workers, the chat clients would sit idle
+            logging.info("Speech worker mode -- skipping the chat, tool and history clients")
+            return
+        #remote function calls and promptflow share one pooled client instead of connecting anew on every call
+        app.http_client = SharedHTTPClient(**app_settings.outbound_http.client_options())
+        app.tool_catalogue = await init_tool_catalogue()
+        app.response_cache = ResponseCache(**app_settings.response_cache.cache_options())
+        app.semantic_cache = SemanticCache(**app_settings.response_cache.semantic_cache_options())
+        if app.semantic_cache.enabled and not app_settings.azure_openai.embedding_name:
+            logging.warning("RESPONSE_CACHE_SEMANTIC_ENABLED needs AZURE_OPENAI_EMBEDDING_NAME -- the semantic cache is disabled")
+            app.semantic_cache = SemanticCache(max_entries=0)
+        try:
+            app.azure_openai_client = await init_openai_client()
+        except Exception:
+            logging.exception("Failed to initialize the Azure OpenAI client, retrying on the first chat request")
         try:
             app.cosmos_conversation_client = await init_cosmosdb_client()
             cosmos_db_ready.set()
@@ -90,6 +206,19 @@ def create_app():
             logging.exception("Failed to initialize CosmosDB client")
             app.cosmos_conversation_client = None
             raise e
+
+    @app.after_serving
+    async def shutdown():
+        if app.recognizer_pool:
+            await app.recognizer_pool.close()
+        if app.speech_workers:
+            await app.speech_workers.close()
+        await close_openai_client()
+        if app.tool_catalogue:
+            await app.tool_catalogue.close()
+        if app.http_client:
+            await app.http_client.close()
+        app.speech_executor.shutdown(wait=False, cancel_futures=True)
     
     return app
 
@@ -103,102 +232,401 @@ async def index():
     )
 
 
-# the SDK will call our methods whenever it needs more audio samples
-class MemoryPCMCallback(speechsdk.audio.PullAudioInputStreamCallback):
-    def __init__(self, pcm_bytes: bytes):
-        super().__init__()
-        self._buf = io.BytesIO(pcm_bytes) #we take the full PCM data (a bytes object) and wrap it in a BytesIO, which behaves like a file in memory
-    def read(self, buffer: memoryview) -> int:
-        chunk = self._buf.read(buffer.nbytes)
-        if not chunk:
-            return 0    #end of chunk
-        buffer[:len(chunk)] = chunk #fill SDK's buffer
-        return len(chunk)
-    def close(self) -> None:
-        self._buf.close() #when the SDK is done with the stream, it calls close()
-        super().close()
-
 #MicButton uses MediaRecorder to grab raw microphone samples, it packages them into a small WebM file and hands us a Blob
 
-@bp.route("/transcribe", methods=["POST"])
-async def transcribe():
-    start_t = time.time()
-    logging.info("Transcription request received")
+def speech_user_id(headers):
+    return get_authenticated_user_details(request_headers=headers).get("user_principal_id")
 
-    webm = await request.data #quart endpoint reads the blob(webm) and now we have the compressed audio bytes in memory
 
-    #FFmpeg: WebM → raw PCM (16 kHz, 16 bit, mono) in memory
-    try:
-        proc = (
-            ffmpeg.input("pipe:0")
-                  .output("pipe:1",
-                          format="s16le",
-                          acodec="pcm_s16le",
-                          ac=1, ar="16000")
-                  .run_async(pipe_stdin=True, pipe_stdout=True,
-                             pipe_stderr=True)
-        )
-        pcm_bytes, err = proc.communicate(input=webm)
-        if proc.returncode:
-            raise RuntimeError(err.decode().strip())
-        logging.info("FFmpeg → PCM successful")
-    except Exception as e:
-        logging.error("FFmpeg conversion failed: %s", e)
-        return jsonify({"text": "", "error": "ffmpeg conversion failed"}), 500
+async def create_recognizer(create, *args):
+    #building a recognizer blocks (SDK configuration, preconnect), never do it on the event loop
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(current_app.speech_executor, functools.partial(create, *args))
 
-    #Configure Speech SDK with in-memory pull stream
-    speech_config = speechsdk.SpeechConfig(
-        subscription=SPEECH_KEY, region=SPEECH_REGION
+
+async def acquire_recognizer(languages=None):
+    #the warm pool holds recognizers for the full language set, narrowed ones are built on demand
+    if not languages:
+        return await current_app.recognizer_pool.acquire()
+    return await create_recognizer(current_app.speech_recognizers.create_push, False, languages)
+
+
+def segmented_recognition(languages=None, timer=None):
+    return SegmentedRecognition(
+        functools.partial(acquire_recognizer, languages),
+        current_app.speech_executor,
+        max_parallel=app_settings.speech.segment_max_parallel,
+        worker_slots=current_app.segment_slots,
+        timer=timer
+    )
+
+
+def single_shot_eligible(languages=None, seconds=None):
+    #single-shot only identifies the language at the start (a handful of candidates) and takes one utterance of at most 15s
+    max_seconds = app_settings.speech.single_shot_max_seconds
+    return (
+        max_seconds > 0
+        and current_app.speech_recognizers.supports_single_shot(languages)
+        and (seconds is None or seconds <= max_seconds)
     )
-    langs = ["de-DE", "en-US", "tr-TR", "ru-RU", "pl-PL", "it-IT", "fr-FR", "uk-UA", "cs-CZ" ,"es-ES"]  
-    auto_lang = speechsdk.languageconfig.AutoDetectSourceLanguageConfig(langs)
-    #enable Continuous LID mode
-    speech_config.set_property(
-        property_id=speechsdk.PropertyId.SpeechServiceConnection_LanguageIdMode, value='Continuous' #without it we won't be able to add 10 langs
+
+
+async def recognize_short(pcm_bytes, languages=None, timer=None):
+    recognizer = await create_recognizer(current_app.speech_recognizers.create_once, pcm_bytes, languages)
+    with timer.measure("recognition") if timer else contextlib.nullcontext():
+        segments = await recognize_once(recognizer)
+    if timer and segments:
+        timer.mark("first_segment")
+    return segments
+
+
+async def recognize_pcm(pcm_bytes, languages=None, timer=None):
+    #returns the segments and the strategy that recognized them
+    if single_shot_eligible(languages, pcm_seconds(len(pcm_bytes))):
+        #short commands skip the session start/stop round trips of continuous recognition
+        return await recognize_short(pcm_bytes, languages, timer), "single_shot"
+
+    if app_settings.speech.segmented:
+        #long recordings are split at pauses and the segments recognized concurrently
+        recognition = segmented_recognition(languages, timer)
+        segmenter = PCMSegmenter(**app_settings.speech.segment_options())
+        for piece in segmenter.push(pcm_bytes) + segmenter.flush():
+            recognition.feed(*piece)
+        return await recognition.result(), "segmented"
+
+    recognizer = await create_recognizer(current_app.speech_recognizers.create_pull, pcm_bytes, languages)
+
+    #Collect all segments (even after silence). The SDK callbacks resolve an asyncio future instead of blocking a thread,
+    #so we await the end of the session (session_stopped or canceled) while the worker keeps handling other requests
+    if not timer:
+        return await recognize_continuous(recognizer, current_app.speech_executor), "continuous"
+    with timer.measure("recognition"):
+        return await recognize_continuous(
+            recognizer, current_app.speech_executor, on_recognized=lambda text: timer.mark("first_segment")
+        ), "continuous"
+
+
+async def audio_contains_speech(pcm_bytes):
+    return await asyncio.get_running_loop().run_in_executor(
+        current_app.speech_executor,
+        functools.partial(contains_speech, pcm_bytes, app_settings.speech.vad_threshold_dbfs)
+    )
+
+
+async def check_language_hint(user_id, hint, segments, pcm_bytes, strategy=None):
+    #speech outside the hinted languages comes back empty or with low confidence: forget the hint and recognize
+    #the same audio again with every language. An empty result is only suspicious when VAD hears speech in the audio,
+    #a silent clip comes back empty whatever the language and would only be paid for twice
+    if hint and pcm_bytes and not current_app.language_hints.is_confident(segments) and (
+        segments or await audio_contains_speech(pcm_bytes)
+    ):
+        logging.info("Language hint %s did not fit, recognizing again with all languages", hint)
+        current_app.language_hints.reject(user_id)
+        hint = None
+        segments, strategy = await recognize_pcm(pcm_bytes)
+    current_app.language_hints.record(user_id, segments, hint)
+    return segments, strategy
+
+
+async def stream_transcription(chunks, decoder, trimmer, user_id, segmented=False, on_recognizing=None, on_recognized=None, timer=None, single_shot=False):
+    #returns the segments and the strategy that recognized them
+    hint = current_app.language_hints.lookup(user_id)
+    decode_stage = "decode"
+    if single_shot and single_shot_eligible(hint):
+        #PCM is held back until the clip turns out short (decoded to the end within the limit) or long
+        pcm_bytes, frames = await decode_short_clip(
+            chunks, decoder, app_settings.speech.single_shot_max_seconds, trimmer, timer
         )
-    
-    fmt = speechsdk.audio.AudioStreamFormat(
-        samples_per_second=16000,
-        bits_per_sample=16,
-        channels=1
+        if pcm_bytes is not None:
+            if not pcm_bytes:
+                logging.warning("No audio to recognize, skipping recognition")
+                return [], None
+            segments = await recognize_short(pcm_bytes, hint, timer)
+            return await check_language_hint(user_id, hint, segments, pcm_bytes, "single_shot")
+        #long: the held and the remaining PCM go on to streaming recognition, already trimmed. decode_short_clip times the
+        #decode to its end, the handoff gets a stage of its own so it does not restart (and cut short) that measurement
+        chunks, decoder, trimmer = frames, PCMDecoder(AudioFormat("pcm")), None
+        decode_stage = "handoff"
+
+    sent_audio = bytearray() if hint else None #kept only when a fallback might need it
+    if segmented:
+        segments = await decode_and_recognize_segmented(
+            chunks,
+            segmented_recognition(hint, timer),
+            PCMSegmenter(**app_settings.speech.segment_options()),
+            decoder=decoder,
+            trimmer=trimmer,
+            sent_audio=sent_audio,
+            timer=timer,
+            decode_stage=decode_stage,
         )
-    
-    #getting the converted audio...
-    pull_cb    = MemoryPCMCallback(pcm_bytes) #instance of callback class
-    pull_stream= speechsdk.audio.PullAudioInputStream(pull_cb, fmt) #it will call pull_cb.read() to fetch exactly the right number of bytes whenever the recognizer asks for audio
-    audio_cfg  = speechsdk.audio.AudioConfig(stream=pull_stream) # we package the pull-stream into an AudioConfig, which is how the Speech SDK learns where to get its audio from
-
-    recognizer = speechsdk.SpeechRecognizer(
-        speech_config=speech_config,
-        auto_detect_source_language_config=auto_lang,
-        audio_config=audio_cfg
-    )
+        return await check_language_hint(user_id, hint, segments, sent_audio, "segmented")
+
+    pooled = await acquire_recognizer(hint)
+    try:
+        segments = await decode_and_recognize(
+            chunks,
+            pooled.push_stream,
+            pooled.recognizer,
+            current_app.speech_executor,
+            decoder=decoder,
+            on_recognizing=on_recognizing,
+            on_recognized=on_recognized,
+            trimmer=trimmer,
+            sent_audio=sent_audio,
+            timer=timer,
+            decode_stage=decode_stage,
+        )
+    finally:
+        pooled.close()
+    return await check_language_hint(user_id, hint, segments, sent_audio, "continuous")
+
+
+def upload_too_large_error():
+    #Quart's RequestEntityTooLarge (see SpeechUploadRequest), worded like our own UploadTooLarge
+    return f"upload is larger than {app_settings.speech.max_upload_bytes} bytes"
+
+
+@bp.route("/transcribe", methods=["POST"])
+async def transcribe():
+    logging.info("Transcription request received")
+    if not current_app.speech_recognizers:
+        return jsonify({"text": "", "error": "Speech is not configured"}), 500
 
-    #Collect all segments (even after silence)
-    all_text = []
-    done = threading.Event() #The done object is a simple way to pause the code until SDK is finished with audio stream. done intially holds the flag set to False
+    user_id = speech_user_id(request.headers)
+    try:
+        #an oversized upload is turned away by its Content-Length before it takes a slot or is read at all
+        check_content_length(request.content_length, app_settings.speech.max_upload_bytes)
+        if current_app.speech_workers:
+            #the speech worker pool admits, decodes and recognizes, this worker only streams the upload in and the result out
+            result, status, headers = await current_app.speech_workers.transcribe(
+                limited(request.body, app_settings.speech.max_upload_bytes), forwarded_headers(request.headers)
+            )
+            return jsonify(result), status, headers
+        #backpressure: a burst of uploads waits in a bounded queue instead of piling up decoders and recognizer sessions,
+        #beyond that it is turned away right away and the client retries later
+        async with current_app.transcribe_admission.admit(user_id):
+            result, status = await transcribe_upload(user_id, request.body, request.headers.get("Content-Type"))
+    except Overloaded as e:
+        logging.warning(f"Transcription rejected: {e.reason}")
+        return jsonify({"text": "", "error": e.reason}), 429, {"Retry-After": str(e.retry_after)}
+    except UploadTooLarge as e:
+        logging.warning(f"Transcription rejected: {e}")
+        return jsonify({"text": "", "error": str(e)}), 413
+    except RequestEntityTooLarge:
+        logging.warning("Transcription rejected: upload over MAX_CONTENT_LENGTH")
+        return jsonify({"text": "", "error": upload_too_large_error()}), 413
+    except UnsupportedAudio as e:
+        logging.warning(f"Transcription rejected: {e}")
+        return jsonify({"text": "", "error": str(e)}), 415
+    return jsonify(result), status
+
+
+async def transcribe_upload(user_id, body, content_type=None):
+    #body is an async iterable of the uploaded audio bytes, returns the /transcribe JSON and its status code.
+    #raises UploadTooLarge (or Quart's RequestEntityTooLarge) when the upload or its audio goes over the configured limits,
+    #UnsupportedAudio for raw PCM at a sample rate or channel count we do not convert
+    start_t = time.time()
+    timer = RequestTimer()
+    loop = asyncio.get_running_loop()
+
+    vad_options = app_settings.speech.vad_options()
+    transcript_cache = current_app.transcript_cache
+    cache_key = None
+    decoder = current_app.audio_decoder
+    if app_settings.speech.pcm_passthrough:
+        #WAV and raw PCM (told apart by magic bytes and Content-Type) skip the decoder, only compressed audio goes through it
+        decoder = SniffingDecoder(decoder, content_type)
+    #uploads without (or with a wrong) Content-Length are cut off once they go over the limit, and so is the decoded audio
+    body = limited(body, app_settings.speech.max_upload_bytes)
+    decoder = LimitedDecoder(decoder, app_settings.speech.max_audio_seconds)
+    if app_settings.speech.streaming_decode:
+        #pipelined: request body chunks → decoder, PCM frames → push stream → recognizer, so decode and recognition overlap.
+        #the recognizer comes pre-connected from the warm pool, unless the user's language hint needs a narrowed one
+        #silence is trimmed on the fly before it reaches the Speech service
+        trimmer = SilenceTrimmer(enabled=app_settings.speech.vad_enabled, **vad_options)
+        chunks = timed(body, timer)
+        uploaded = loop.create_future() #resolves to the cache key once the whole upload went through
+        if transcript_cache.enabled:
+            chunks = transcript_cache.hashed(chunks, uploaded)
+        transcription = asyncio.ensure_future(stream_transcription(
+            chunks, decoder, trimmer, user_id, segmented=app_settings.speech.segmented, timer=timer, single_shot=True
+        ))
+        cached = None
+        try:
+            #a retried upload is recognized as such once its last byte arrived, the work already started is dropped
+            await asyncio.wait({transcription, uploaded}, return_when=asyncio.FIRST_COMPLETED)
+            if uploaded.done():
+                cache_key = uploaded.result()
+                cached = await transcript_cache.get(cache_key)
+            if cached is None:
+                segments, strategy = await transcription
+        except (UploadTooLarge, UnsupportedAudio, RequestEntityTooLarge):
+            raise
+        except Exception as e:
+            logging.error("Streaming transcription failed: %s", e)
+            return {"text": "", "error": "audio decoding failed"}, 500
+        finally:
+            if not transcription.done():
+                transcription.cancel()
+                await asyncio.gather(transcription, return_exceptions=True)
+        if cached is not None:
+            logging.info(f"Transcript cache hit after {time.time()-start_t:.2f}s")
+            return {**cached, "cached": True}, 200
+        audio_stats = trimmer.stats()
+    else:
+        webm = b"".join([chunk async for chunk in body]) #the whole blob(webm), now we have the compressed audio bytes in memory (up to max_upload_bytes)
+        timer.mark("body_read")
+        if transcript_cache.enabled:
+            cache_key = transcript_cache.key(webm)
+            cached = await transcript_cache.get(cache_key)
+            if cached is not None:
+                logging.info(f"Transcript cache hit after {time.time()-start_t:.2f}s")
+                return {**cached, "cached": True}, 200
+
+        #WebM → raw PCM (16 kHz, 16 bit, mono) in memory, on the speech executor so the event loop keeps serving other requests
+        try:
+            with timer.measure("decode"):
+                pcm_bytes = await loop.run_in_executor(current_app.speech_executor, decoder.decode, webm)
+            logging.info(f"{decoder.name} → PCM successful")
+        except (UploadTooLarge, UnsupportedAudio, RequestEntityTooLarge):
+            raise
+        except Exception as e:
+            logging.error("Audio decoding failed: %s", e)
+            return {"text": "", "error": "audio decoding failed"}, 500
+
+        #VAD: strip leading/trailing silence and shorten long pauses, we pay for (and wait on) every second we send
+        received_bytes = len(pcm_bytes)
+        if app_settings.speech.vad_enabled:
+            pcm_bytes = await loop.run_in_executor(
+                current_app.speech_executor, functools.partial(trim_silence, pcm_bytes, **vad_options)
+            )
+        audio_stats = {
+            "received_seconds": round(pcm_seconds(received_bytes), 2),
+            "sent_seconds": round(pcm_seconds(len(pcm_bytes)), 2),
+        }
+
+        segments, strategy = [], None
+        if pcm_bytes:
+            hint = current_app.language_hints.lookup(user_id)
+            segments, strategy = await recognize_pcm(pcm_bytes, hint, timer)
+            segments, strategy = await check_language_hint(user_id, hint, segments, pcm_bytes, strategy)
+
+    transcript = segments_text(segments)
+    logging.info(f"Transcription done in {time.time()-start_t:.2f}s via {decoder.name}, {strategy} ({audio_stats['sent_seconds']}s of {audio_stats['received_seconds']}s audio sent): {transcript!r}")
+    timings = timer.report(audio_stats["received_seconds"])
+    current_app.transcription_metrics.observe(timings, strategy)
+    logging.info(f"Transcription timings: {json.dumps(timings)}")
+    result = {"text": transcript, "audio": audio_stats, "strategy": strategy}
+    if cache_key:
+        await transcript_cache.put(cache_key, result)
+    return {**result, "cached": False}, 200
+
+#live dictation: MicButton streams MediaRecorder timeslice chunks as binary frames while the user is still speaking and sends
+#{"type": "stop"} when they confirm. We answer with {"type": "partial"|"final", "text": ...} frames as the SDK recognizes speech
+#and a closing {"type": "done", "text": <full transcript>} frame
+
+@bp.websocket("/transcribe/ws")
+async def transcribe_ws():
+    logging.info("Live transcription session opened")
+    if not current_app.speech_recognizers:
+        await websocket.send_json({"type": "error", "error": "Speech is not configured"})
+        return
+
+    #a live session holds a recognizer for as long as the user speaks; sessions have a limit of their own, apart from
+    #/transcribe, and one too many is turned away right away instead of waiting for a slot
+    user_id = speech_user_id(websocket.headers)
+    try:
+        async with current_app.live_admission.admit(user_id):
+            await live_transcription(user_id)
+    except Overloaded as e:
+        logging.warning(f"Live transcription rejected: {e.reason}")
+        await websocket.send_json({"type": "error", "error": e.reason, "retry_after": e.retry_after})
+        await websocket.close(1013) # try again later
 
-    def on_rec(evt):
-        if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech: #if a speech is recognized
-            all_text.append(evt.result.text)
 
-    def on_stop(evt):
-        done.set() #now the flag is set , continue
+async def live_transcription(user_id):
+    start_t = time.time()
+    events = asyncio.Queue()
 
-    #first recognized.connect starts , and then continuous_recognition starts and the code pauses by done.wait() till the Flag turns to True,
-    #when the session_stopped (after clicking complete button) or canceled (after complete cross button) the Flag turns True and then we call stop_continous_recognititon()
-    recognizer.recognized.connect(on_rec) 
-    recognizer.session_stopped.connect(on_stop)
-    recognizer.canceled.connect(on_stop)
+    async def audio_chunks():
+        while True:
+            message = await websocket.receive()
+            if isinstance(message, str):
+                try:
+                    control = json.loads(message)
+                except json.JSONDecodeError:
+                    continue
+                if control.get("type") == "stop":
+                    return
+                continue
+            yield message
 
-    #Run continuous → wait for end-of-stream → stop
-    recognizer.start_continuous_recognition()
-    done.wait() #pause here until the flag is True 
-    recognizer.stop_continuous_recognition()
+    async def send_events():
+        while True:
+            frame = await events.get()
+            if frame is None:
+                return
+            await websocket.send_json(frame)
 
-    transcript = " ".join(all_text).strip()
-    logging.info(f"Transcription done in {time.time()-start_t:.2f}s: {transcript!r}")
-    return jsonify({"text": transcript})
+    sender = asyncio.create_task(send_events())
+    trimmer = SilenceTrimmer(enabled=app_settings.speech.vad_enabled, **app_settings.speech.vad_options())
+    try:
+        #a live session is held to the same limits as an upload
+        segments, _ = await stream_transcription(
+            limited(audio_chunks(), app_settings.speech.max_upload_bytes),
+            LimitedDecoder(current_app.live_audio_decoder, app_settings.speech.max_audio_seconds),
+            trimmer,
+            user_id,
+            on_recognizing=lambda text: events.put_nowait({"type": "partial", "text": text}),
+            on_recognized=lambda text: events.put_nowait({"type": "final", "text": text}),
+        )
+        transcript = segments_text(segments)
+        events.put_nowait({"type": "done", "text": transcript, "audio": trimmer.stats()})
+        logging.info(f"Live transcription done in {time.time()-start_t:.2f}s: {transcript!r}")
+    except asyncio.CancelledError:
+        #client went away, nobody is listening for the remaining frames
+        sender.cancel()
+        raise
+    except UploadTooLarge as e:
+        logging.warning(f"Live transcription stopped: {e}")
+        events.put_nowait({"type": "error", "error": str(e)})
+    except Exception as e:
+        logging.error("Live transcription failed: %s", e)
+        events.put_nowait({"type": "error", "error": "transcription failed"})
+    finally:
+        events.put_nowait(None)
+
+    await sender
+
+
+@bp.route("/transcribe/metrics", methods=["GET"])
+async def transcribe_metrics():
+    metrics = {}
+    if current_app.recognizer_pool:
+        metrics["recognizer_pool"] = current_app.recognizer_pool.stats()
+    metrics["language_hints"] = current_app.language_hints.stats()
+    metrics["transcript_cache"] = current_app.transcript_cache.stats()
+    metrics["transcription"] = current_app.transcription_metrics.stats()
+    metrics["admission"] = current_app.transcribe_admission.stats()
+    metrics["live_admission"] = current_app.live_admission.stats()
+    if current_app.speech_workers:
+        #forwarded from this web worker, plus the metrics of whichever speech worker process answers
+        metrics["speech_workers"] = current_app.speech_workers.stats()
+        metrics["speech_workers"]["pool"] = await current_app.speech_workers.metrics()
+    return jsonify(metrics), 200
+
+@bp.route("/http/metrics", methods=["GET"])
+async def http_metrics():
+    #saturation of the shared outbound client: requests waiting for a per-host slot, and latency per endpoint
+    return jsonify(current_app.http_client.stats()), 200
+
+@bp.route("/conversation/metrics", methods=["GET"])
+async def conversation_metrics():
+    return jsonify({
+        "response_cache": current_app.response_cache.stats(),
+        "semantic_cache": current_app.semantic_cache.stats(),
+    }), 200
 
 @bp.route("/favicon.ico")
 async def favicon():
@@ -231,7 +659,8 @@ async def evaluate():
                 }
                 
                 try:
-                    response = await complete_chat_request(request_body, request.headers)
+                    #the golden set is asked to evaluate the model, never answered from the response cache
+                    response = await complete_chat_request(request_body, request.headers, use_cache=False)
                     #logging.info(f"raw response: {response}") #gives everything
                
                     choices = response.get("choices", [])
@@ -315,8 +744,6 @@ frontend_settings = {
 MS_DEFENDER_ENABLED = os.environ.get("MS_DEFENDER_ENABLED", "true").lower() == "true"
 
 
-azure_openai_tools = []
-azure_openai_available_tools = []
 
 # Initialize Azure OpenAI Client
 async def init_openai_client():
@@ -347,53 +774,90 @@ async def init_openai_client():
             else f"https://{app_settings.azure_openai.resource}.openai.azure.com/"
         )
 
+        # Deployment
+        deployment = app_settings.azure_openai.model
+        if not deployment:
+            raise ValueError("AZURE_OPENAI_MODEL is required")
+
         # Authentication
         aoai_api_key = app_settings.azure_openai.key
         ad_token_provider = None
         if not aoai_api_key:
             logging.debug("No AZURE_OPENAI_KEY found, using Azure Entra ID auth")
-            async with DefaultAzureCredential() as credential:
-                ad_token_provider = get_bearer_token_provider(
-                    credential,
-                    "https://cognitiveservices.azure.com/.default"
-                )
-
-        # Deployment
-        deployment = app_settings.azure_openai.model
-        if not deployment:
-            raise ValueError("AZURE_OPENAI_MODEL is required")
+            # lives as long as the client: the token provider caches the token and refreshes it before it expires
+            current_app.azure_openai_credential = DefaultAzureCredential()
+            ad_token_provider = get_bearer_token_provider(
+                current_app.azure_openai_credential,
+                "https://cognitiveservices.azure.com/.default"
+            )
 
         # Default Headers
         default_headers = {"x-ms-useragent": USER_AGENT}
 
-        # Remote function calls
-        if app_settings.azure_openai.function_call_azure_functions_enabled:
-            azure_functions_tools_url = f"{app_settings.azure_openai.function_call_azure_functions_tools_base_url}?code={app_settings.azure_openai.function_call_azure_functions_tools_key}"
-            async with httpx.AsyncClient() as client:
-                response = await client.get(azure_functions_tools_url)
-            response_status_code = response.status_code
-            if response_status_code == httpx.codes.OK:
-                azure_openai_tools.extend(json.loads(response.text))
-                for tool in azure_openai_tools:
-                    azure_openai_available_tools.append(tool["function"]["name"])
-            else:
-                logging.error(f"An error occurred while getting OpenAI Function Call tools metadata: {response.status_code}")
+        # Connection pool, kept warm across requests so a turn does not pay TCP+TLS setup
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=app_settings.azure_openai.max_connections,
+                max_keepalive_connections=app_settings.azure_openai.max_keepalive_connections,
+                keepalive_expiry=app_settings.azure_openai.keepalive_expiry_seconds,
+            )
+        )
 
-        
         azure_openai_client = AsyncAzureOpenAI(
             api_version=app_settings.azure_openai.preview_api_version,
             api_key=aoai_api_key,
             azure_ad_token_provider=ad_token_provider,
             default_headers=default_headers,
             azure_endpoint=endpoint,
+            http_client=http_client,
         )
 
         return azure_openai_client
     except Exception as e:
-        logging.exception("Exception in Azure OpenAI initialization", e)
+        logging.exception("Exception in Azure OpenAI initialization")
         azure_openai_client = None
+        if current_app.azure_openai_credential is not None:
+            await current_app.azure_openai_credential.close()
+            current_app.azure_openai_credential = None
         raise e
 
+async def init_tool_catalogue():
+    #remote function calls: the tool definitions are fetched at startup and refreshed in the background, not per request
+    if not app_settings.azure_openai.function_call_azure_functions_enabled:
+        return None
+    azure_functions_tools_url = f"{app_settings.azure_openai.function_call_azure_functions_tools_base_url}?code={app_settings.azure_openai.function_call_azure_functions_tools_key}"
+    catalogue = ToolCatalogue(
+        azure_functions_tools_url,
+        current_app.http_client,
+        ttl_seconds=app_settings.azure_openai.function_call_azure_functions_tools_ttl_seconds
+    )
+    await catalogue.start()
+    return catalogue
+
+
+def tool_snapshot():
+    if current_app.tool_catalogue is None:
+        return ToolSnapshot()
+    return current_app.tool_catalogue.snapshot
+
+
+async def get_openai_client():
+    #one client per worker, created at startup; if that failed (e.g. missing settings) the next request tries again
+    async with current_app.azure_openai_client_lock:
+        if current_app.azure_openai_client is None:
+            current_app.azure_openai_client = await init_openai_client()
+    return current_app.azure_openai_client
+
+
+async def close_openai_client():
+    if current_app.azure_openai_client is not None:
+        await current_app.azure_openai_client.close()
+        current_app.azure_openai_client = None
+    if current_app.azure_openai_credential is not None:
+        await current_app.azure_openai_credential.close()
+        current_app.azure_openai_credential = None
+
+
 async def openai_remote_azure_function_call(function_name, function_args):
     if app_settings.azure_openai.function_call_azure_functions_enabled is not True:
         return
@@ -404,12 +868,30 @@ async def openai_remote_azure_function_call(function_name, function_args):
         "tool_name": function_name,
         "tool_arguments": json.loads(function_args)
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(azure_functions_tool_url, data=json.dumps(body), headers=headers)
+    response = await current_app.http_client.post(
+        azure_functions_tool_url,
+        endpoint="tool",
+        content=json.dumps(body),
+        headers=headers,
+        timeout=app_settings.azure_openai.function_call_azure_functions_tool_timeout_seconds
+    )
     response.raise_for_status()
 
     return response.text
 
+def tool_call_options():
+    #independent tool calls of one turn run concurrently, the results come back in the order of the calls
+    return {
+        "max_parallel": app_settings.azure_openai.function_call_azure_functions_max_parallel,
+        "timeout_seconds": app_settings.azure_openai.function_call_azure_functions_tool_timeout_seconds,
+    }
+
+def tool_dispatcher():
+    return ToolCallDispatcher(openai_remote_azure_function_call, **tool_call_options())
+
+async def call_tools(tool_calls):
+    return await run_tool_calls(tool_calls, openai_remote_azure_function_call, **tool_call_options())
+
 async def init_cosmosdb_client():
     cosmos_conversation_client = None
     if app_settings.chat_history:
@@ -497,8 +979,9 @@ def prepare_model_args(request_body, request_headers):
 
     if len(messages) > 0:
         if messages[-1]["role"] == "user":
-            if app_settings.azure_openai.function_call_azure_functions_enabled and len(azure_openai_tools) > 0:
-                model_args["tools"] = azure_openai_tools
+            tools = tool_snapshot().tools
+            if app_settings.azure_openai.function_call_azure_functions_enabled and tools:
+                model_args["tools"] = list(tools)
 
             if app_settings.datasource:
                 model_args["extra_body"] = {
@@ -560,24 +1043,23 @@ async def promptflow_request(request):
         }
         # Adding timeout for scenarios where response takes longer to come back
         logging.debug(f"Setting timeout to {app_settings.promptflow.response_timeout}")
-        async with httpx.AsyncClient(
-            timeout=float(app_settings.promptflow.response_timeout)
-        ) as client:
-            pf_formatted_obj = convert_to_pf_format(
-                request,
-                app_settings.promptflow.request_field_name,
-                app_settings.promptflow.response_field_name
-            )
-            # NOTE: This only support question and chat_history parameters
-            # If you need to add more parameters, you need to modify the request body
-            response = await client.post(
-                app_settings.promptflow.endpoint,
-                json={
-                    app_settings.promptflow.request_field_name: pf_formatted_obj[-1]["inputs"][app_settings.promptflow.request_field_name],
-                    "chat_history": pf_formatted_obj[:-1],
-                },
-                headers=headers,
-            )
+        pf_formatted_obj = convert_to_pf_format(
+            request,
+            app_settings.promptflow.request_field_name,
+            app_settings.promptflow.response_field_name
+        )
+        # NOTE: This only support question and chat_history parameters
+        # If you need to add more parameters, you need to modify the request body
+        response = await current_app.http_client.post(
+            app_settings.promptflow.endpoint,
+            endpoint="promptflow",
+            json={
+                app_settings.promptflow.request_field_name: pf_formatted_obj[-1]["inputs"][app_settings.promptflow.request_field_name],
+                "chat_history": pf_formatted_obj[:-1],
+            },
+            headers=headers,
+            timeout=float(app_settings.promptflow.response_timeout),
+        )
         resp = response.json()
         resp["id"] = request["messages"][-1]["id"]
         return resp
@@ -590,13 +1072,13 @@ async def process_function_call(response):
     messages = []
 
     if response_message.tool_calls:
-        for tool_call in response_message.tool_calls:
-            # Check if function exists
-            if tool_call.function.name not in azure_openai_available_tools:
-                continue
-            
-            function_response = await openai_remote_azure_function_call(tool_call.function.name, tool_call.function.arguments)
+        # Only functions of the catalogue are called, all of them at once
+        tool_calls = [tool_call for tool_call in response_message.tool_calls if tool_call.function.name in tool_snapshot()]
+        function_responses = await call_tools([
+            ToolCall(tool_call.function.name, tool_call.function.arguments, tool_call.id) for tool_call in tool_calls
+        ])
 
+        for tool_call, function_response in zip(tool_calls, function_responses):
             # adding assistant response to messages
             messages.append(
                 {
@@ -622,7 +1104,7 @@ async def process_function_call(response):
     
     return None
 
-async def send_chat_request(request_body, request_headers):
+def chat_model_args(request_body, request_headers):
     filtered_messages = []
     messages = request_body.get("messages", [])
     for message in messages:
@@ -630,10 +1112,80 @@ async def send_chat_request(request_body, request_headers):
             filtered_messages.append(message)
             
     request_body['messages'] = filtered_messages
-    model_args = prepare_model_args(request_body, request_headers)
+    return prepare_model_args(request_body, request_headers)
+
+
+def single_turn_question(model_args):
+    # Follow-up questions depend on the conversation so far, only first questions are looked up by meaning
+    messages = [message for message in model_args["messages"] if message["role"] != "system"]
+    if len(messages) == 1 and messages[0]["role"] == "user" and isinstance(messages[0]["content"], str):
+        return messages[0]["content"]
+    return None
+
+
+async def embed_question(question):
+    started = time.monotonic()
+    try:
+        azure_openai_client = await get_openai_client()
+        response = await azure_openai_client.embeddings.create(
+            model=app_settings.azure_openai.embedding_name,
+            input=question,
+            timeout=app_settings.response_cache.semantic_embedding_timeout_seconds,
+        )
+    except Exception:
+        logging.exception("Failed to embed the question for the semantic cache")
+        return None
+    current_app.semantic_cache.embedding_seconds.observe(time.monotonic() - started)
+    return response.data[0].embedding
+
+
+async def cached_answer(model_args, use_cache=True):
+    '''
+    Looks the request up in the exact-match response cache and, for a
+    single-turn question, in the semantic cache. Returns the cached answer
+    or None, and a function that stores the new answer in both.
+    '''
+    stores = []
+
+    def remember(answer):
+        for store in stores:
+            store(answer)
+
+    if not use_cache:
+        return None, remember
+
+    if current_app.response_cache.enabled:
+        key = current_app.response_cache.key(model_args)
+        answer = current_app.response_cache.get(key)
+        if answer:
+            return answer, remember
+        stores.append(functools.partial(current_app.response_cache.put, key))
+
+    question = single_turn_question(model_args)
+    if current_app.semantic_cache.enabled and question:
+        partition = partition_key(model_args)
+        embedding = await embed_question(question)
+        if embedding is not None:
+            answer = current_app.semantic_cache.get(partition, embedding)
+            if answer:
+                # the same wording next time is answered without embedding it again
+                remember(answer)
+                return answer, remember
+            stores.append(functools.partial(current_app.semantic_cache.put, partition, embedding))
+
+    return None, remember
+
+
+def finish_reason(completion):
+    return completion.choices[0].finish_reason if completion.choices else None
+
+
+async def send_chat_request(request_body, request_headers, model_args=None):
+    if model_args is None:
+        model_args = chat_model_args(request_body, request_headers)
 
     try:
-        azure_openai_client = await init_openai_client()
+        azure_openai_client = await get_openai_client()
         raw_response = await azure_openai_client.chat.completions.with_raw_response.create(**model_args)
         response = raw_response.parse()
         apim_request_id = raw_response.headers.get("apim-request-id") 
@@ -644,7 +1196,7 @@ async def send_chat_request(request_body, request_headers):
     return response, apim_request_id
 
 
-async def complete_chat_request(request_body, request_headers):
+async def complete_chat_request(request_body, request_headers, use_cache=True):
     if app_settings.base_settings.use_promptflow:
         response = await promptflow_request(request_body)
         history_metadata = request_body.get("history_metadata", {})
@@ -655,9 +1207,15 @@ async def complete_chat_request(request_body, request_headers):
             app_settings.promptflow.citations_field_name
         )
     else:
-        response, apim_request_id = await send_chat_request(request_body, request_headers)
+        model_args = chat_model_args(request_body, request_headers)
         history_metadata = request_body.get("history_metadata", {})
+        answer, remember = await cached_answer(model_args, use_cache)
+        if answer:
+            return replay_response(answer, history_metadata)
+
+        response, apim_request_id = await send_chat_request(request_body, request_headers, model_args)
         non_streaming_response = format_non_streaming_response(response, history_metadata, apim_request_id)
+        function_response = None
 
         if app_settings.azure_openai.function_call_azure_functions_enabled:
             function_response = await process_function_call(response)  # Add await here
@@ -669,6 +1227,12 @@ async def complete_chat_request(request_body, request_headers):
                 history_metadata = request_body.get("history_metadata", {})
                 non_streaming_response = format_non_streaming_response(response, history_metadata, apim_request_id)
 
+        # answers that depend on tool results (weather, stock levels, ...) are not repeated
+        if not function_response and finish_reason(response) == "stop":
+            answer = answer_from_response(non_streaming_response)
+            if answer:
+                remember(answer)
+
     return non_streaming_response
 
 class AzureOpenaiFunctionCallStreamState():
@@ -679,6 +1243,21 @@ class AzureOpenaiFunctionCallStreamState():
         self.current_tool_call = None       # JSON with the tool name and arguments currently being streamed
         self.function_messages = []         # All function messages to be appended to the chat history
         self.streaming_state = "INITIAL"    # Streaming state (INITIAL, STREAMING, COMPLETED)
+        self.dispatcher = None              # Runs each tool call as soon as its arguments are complete
+
+
+def finish_streamed_tool_call(function_call_stream_state):
+    # The arguments of the current tool call are complete: start it while the model streams the next one
+    state = function_call_stream_state
+    state.current_tool_call["tool_arguments"] = state.tool_arguments_stream
+    state.tool_arguments_stream = ""
+    state.tool_name = ""
+    state.tool_calls.append(state.current_tool_call)
+    if state.dispatcher is None:
+        state.dispatcher = tool_dispatcher()
+    state.dispatcher.submit(ToolCall(
+        state.current_tool_call["tool_name"], state.current_tool_call["tool_arguments"], state.current_tool_call["tool_id"]
+    ))
 
 
 async def process_function_call_stream(completionChunk, function_call_stream_state, request_body, request_headers, history_metadata, apim_request_id):
@@ -692,27 +1271,24 @@ async def process_function_call_stream(completionChunk, function_call_stream_sta
                 # New tool call
                 if tool_call_chunk.id:
                     if function_call_stream_state.current_tool_call:
-                        function_call_stream_state.tool_arguments_stream += tool_call_chunk.function.arguments if tool_call_chunk.function.arguments else ""
-                        function_call_stream_state.current_tool_call["tool_arguments"] = function_call_stream_state.tool_arguments_stream
-                        function_call_stream_state.tool_arguments_stream = ""
-                        function_call_stream_state.tool_name = ""
-                        function_call_stream_state.tool_calls.append(function_call_stream_state.current_tool_call)
+                        finish_streamed_tool_call(function_call_stream_state)
 
                     function_call_stream_state.current_tool_call = {
                         "tool_id": tool_call_chunk.id,
                         "tool_name": tool_call_chunk.function.name if function_call_stream_state.tool_name == "" else function_call_stream_state.tool_name
                     }
+                    function_call_stream_state.tool_arguments_stream = tool_call_chunk.function.arguments if tool_call_chunk.function.arguments else ""
                 else:
                     function_call_stream_state.tool_arguments_stream += tool_call_chunk.function.arguments if tool_call_chunk.function.arguments else ""
                 
         # Function call - Streaming completed
         elif response_message.tool_calls is None and function_call_stream_state.streaming_state == "STREAMING":
-            function_call_stream_state.current_tool_call["tool_arguments"] = function_call_stream_state.tool_arguments_stream
-            function_call_stream_state.tool_calls.append(function_call_stream_state.current_tool_call)
-            
-            for tool_call in function_call_stream_state.tool_calls:
-                tool_response = await openai_remote_azure_function_call(tool_call["tool_name"], tool_call["tool_arguments"])
+            finish_streamed_tool_call(function_call_stream_state)
 
+            # the earlier calls have been running since their arguments were complete
+            tool_responses = await function_call_stream_state.dispatcher.results()
+
+            for tool_call, tool_response in zip(function_call_stream_state.tool_calls, tool_responses):
                 function_call_stream_state.function_messages.append({
                     "role": "assistant",
                     "function_call": {
@@ -735,33 +1311,61 @@ async def process_function_call_stream(completionChunk, function_call_stream_sta
             return function_call_stream_state.streaming_state
 
 
-async def stream_chat_request(request_body, request_headers):
-    response, apim_request_id = await send_chat_request(request_body, request_headers)
+async def stream_chat_request(request_body, request_headers, use_cache=True):
+    model_args = chat_model_args(request_body, request_headers)
     history_metadata = request_body.get("history_metadata", {})
+    answer, remember = await cached_answer(model_args, use_cache)
+    if answer:
+        return replay_stream(answer, history_metadata)
+
+    response, apim_request_id = await send_chat_request(request_body, request_headers, model_args)
+    recorder = StreamRecorder()
+
+    def cache_answer():
+        # only once the whole answer went out, a client that went away leaves an incomplete one
+        answer = recorder.answer()
+        if answer:
+            remember(answer)
     
+    #the response is streamed after the handler returned, function calls inside need the app context (shared OpenAI client)
+    @stream_with_context
     async def generate(apim_request_id, history_metadata):
         if app_settings.azure_openai.function_call_azure_functions_enabled:
             # Maintain state during function call streaming
             function_call_stream_state = AzureOpenaiFunctionCallStreamState()
             
-            async for completionChunk in response:
-                stream_state = await process_function_call_stream(completionChunk, function_call_stream_state, request_body, request_headers, history_metadata, apim_request_id)
-                
-                # No function call, asistant response
-                if stream_state == "INITIAL":
-                    yield format_stream_response(completionChunk, history_metadata, apim_request_id)
-
-                # Function call stream completed, functions were executed.
-                # Append function calls and results to history and send to OpenAI, to stream the final answer.
-                if stream_state == "COMPLETED":
-                    request_body["messages"].extend(function_call_stream_state.function_messages)
-                    function_response, apim_request_id = await send_chat_request(request_body, request_headers)
-                    async for functionCompletionChunk in function_response:
-                        yield format_stream_response(functionCompletionChunk, history_metadata, apim_request_id)
+            try:
+                async for completionChunk in response:
+                    stream_state = await process_function_call_stream(completionChunk, function_call_stream_state, request_body, request_headers, history_metadata, apim_request_id)
+                    
+                    # No function call, asistant response
+                    if stream_state == "INITIAL":
+                        event = format_stream_response(completionChunk, history_metadata, apim_request_id)
+                        recorder.add(event, finish_reason(completionChunk))
+                        yield event
+
+                    # Function call stream completed, functions were executed.
+                    # Append function calls and results to history and send to OpenAI, to stream the final answer.
+                    if stream_state == "COMPLETED":
+                        request_body["messages"].extend(function_call_stream_state.function_messages)
+                        function_response, apim_request_id = await send_chat_request(request_body, request_headers)
+                        async for functionCompletionChunk in function_response:
+                            yield format_stream_response(functionCompletionChunk, history_metadata, apim_request_id)
+            finally:
+                # the client went away mid-stream: tool calls already started are not needed anymore
+                if function_call_stream_state.dispatcher is not None:
+                    function_call_stream_state.dispatcher.cancel()
+
+            # answers that depend on tool results (weather, stock levels, ...) are not repeated
+            if function_call_stream_state.streaming_state == "INITIAL":
+                cache_answer()
                 
         else:
             async for completionChunk in response:
-                yield format_stream_response(completionChunk, history_metadata, apim_request_id)
+                event = format_stream_response(completionChunk, history_metadata, apim_request_id)
+                recorder.add(event, finish_reason(completionChunk))
+                yield event
+            cache_answer()
 
     return generate(apim_request_id=apim_request_id, history_metadata=history_metadata)
 
@@ -795,6 +1399,103 @@ async def conversation():
     return await conversation_internal(request_json, request.headers)
 
 
+#hands-free: one multipart request carries the recording ("audio") and the /conversation or /history/generate payload
+#("request"). The transcript comes back as the first NDJSON line and the answer streams on the same response, so
+#there is no second round trip between end of speech and the first answer token
+
+@bp.route("/conversation/voice", methods=["POST"])
+async def voice_conversation():
+    return await voice_answer(history=False)
+
+
+@bp.route("/history/generate/voice", methods=["POST"])
+async def voice_add_conversation():
+    await cosmos_db_ready.wait()
+    return await voice_answer(history=True)
+
+
+async def voice_answer(history):
+    logging.info("Voice conversation request received")
+    if not current_app.speech_recognizers:
+        return jsonify({"error": "Speech is not configured"}), 500
+
+    try:
+        #the whole multipart request counts against the upload limit
+        check_content_length(request.content_length, app_settings.speech.max_upload_bytes)
+        files = await request.files
+        form = await request.form
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except RequestEntityTooLarge:
+        return jsonify({"error": upload_too_large_error()}), 413
+    audio = files.get("audio")
+    if audio is None or "request" not in form:
+        return jsonify({"error": "expected multipart fields audio and request"}), 400
+    try:
+        request_body = json.loads(form["request"])
+    except json.JSONDecodeError:
+        return jsonify({"error": "request must be json"}), 400
+    if not isinstance(request_body, dict) or not isinstance(request_body.get("messages", []), list):
+        return jsonify({"error": "request must be a json object with a list of messages"}), 400
+
+    async def upload():
+        yield audio.read()
+
+    user_id = speech_user_id(request.headers)
+    headers = {}
+    try:
+        if current_app.speech_workers:
+            transcription, status, headers = await current_app.speech_workers.transcribe(
+                limited(upload(), app_settings.speech.max_upload_bytes), forwarded_headers(request.headers, audio.content_type)
+            )
+        else:
+            async with current_app.transcribe_admission.admit(user_id):
+                transcription, status = await transcribe_upload(user_id, upload(), audio.content_type)
+    except Overloaded as e:
+        logging.warning(f"Transcription rejected: {e.reason}")
+        return jsonify({"error": e.reason}), 429, {"Retry-After": str(e.retry_after)}
+    except UploadTooLarge as e:
+        logging.warning(f"Transcription rejected: {e}")
+        return jsonify({"error": str(e)}), 413
+    except RequestEntityTooLarge:
+        logging.warning("Transcription rejected: upload over MAX_CONTENT_LENGTH")
+        return jsonify({"error": upload_too_large_error()}), 413
+    except UnsupportedAudio as e:
+        logging.warning(f"Transcription rejected: {e}")
+        return jsonify({"error": str(e)}), 415
+    if status != 200:
+        return jsonify(transcription), status, headers
+
+    message = {
+        "id": str(uuid.uuid4()),
+        "role": "user",
+        "content": transcription["text"],
+        "date": datetime.now(timezone.utc).isoformat(),
+    }
+    request_body["messages"] = request_body.get("messages", []) + [message]
+    request_headers = request.headers
+
+    @stream_with_context
+    async def generate():
+        yield {"transcript": transcription, "message": message}
+        if not message["content"]:
+            return #nothing was said, there is nothing to answer
+        if history:
+            request_body["history_metadata"] = await add_user_message(
+                user_id, request_body.get("conversation_id"), request_body["messages"]
+            )
+        if app_settings.azure_openai.stream and not app_settings.base_settings.use_promptflow:
+            async for event in await stream_chat_request(request_body, request_headers):
+                yield event
+        else:
+            yield await complete_chat_request(request_body, request_headers)
+
+    response = await make_response(format_as_ndjson(generate()))
+    response.timeout = None
+    response.mimetype = "application/json-lines"
+    return response
+
+
 @bp.route("/frontend_settings", methods=["GET"])
 def get_frontend_settings():
     try:
@@ -816,44 +1517,9 @@ async def add_conversation():
     conversation_id = request_json.get("conversation_id", None)
 
     try:
-        # make sure cosmos is configured
-        if not current_app.cosmos_conversation_client:
-            raise Exception("CosmosDB is not configured or not working")
-
-        # check for the conversation_id, if the conversation is not set, we will create a new one
-        history_metadata = {}
-        if not conversation_id:
-            title = await generate_title(request_json["messages"])
-            conversation_dict = await current_app.cosmos_conversation_client.create_conversation(
-                user_id=user_id, title=title
-            )
-            conversation_id = conversation_dict["id"]
-            history_metadata["title"] = title
-            history_metadata["date"] = conversation_dict["createdAt"]
-
-        ## Format the incoming message object in the "chat/completions" messages format
-        ## then write it to the conversation history in cosmos
-        messages = request_json["messages"]
-        if len(messages) > 0 and messages[-1]["role"] == "user":
-            createdMessageValue = await current_app.cosmos_conversation_client.create_message(
-                uuid=str(uuid.uuid4()),
-                conversation_id=conversation_id,
-                user_id=user_id,
-                input_message=messages[-1],
-            )
-            if createdMessageValue == "Conversation not found":
-                raise Exception(
-                    "Conversation not found for the given conversation ID: "
-                    + conversation_id
-                    + "."
-                )
-        else:
-            raise Exception("No user message found")
-
         # Submit request to Chat Completions for response
         request_body = await request.get_json()
-        history_metadata["conversation_id"] = conversation_id
-        request_body["history_metadata"] = history_metadata
+        request_body["history_metadata"] = await add_user_message(user_id, conversation_id, request_json["messages"])
         return await conversation_internal(request_body, request.headers)
 
     except Exception as e:
@@ -861,6 +1527,45 @@ async def add_conversation():
         return jsonify({"error": str(e)}), 500
 
 
+async def add_user_message(user_id, conversation_id, messages):
+    # make sure cosmos is configured
+    if not current_app.cosmos_conversation_client:
+        raise Exception("CosmosDB is not configured or not working")
+
+    # check for the conversation_id, if the conversation is not set, we will create a new one
+    history_metadata = {}
+    if not conversation_id:
+        title = await generate_title(messages)
+        conversation_dict = await current_app.cosmos_conversation_client.create_conversation(
+            user_id=user_id, title=title
+        )
+        conversation_id = conversation_dict["id"]
+        history_metadata["title"] = title
+        history_metadata["date"] = conversation_dict["createdAt"]
+
+    ## Format the incoming message object in the "chat/completions" messages format
+    ## then write it to the conversation history in cosmos
+    if len(messages) > 0 and messages[-1]["role"] == "user":
+        createdMessageValue = await current_app.cosmos_conversation_client.create_message(
+            uuid=str(uuid.uuid4()),
+            conversation_id=conversation_id,
+            user_id=user_id,
+            input_message=messages[-1],
+        )
+        if createdMessageValue == "Conversation not found":
+            raise Exception(
+                "Conversation not found for the given conversation ID: "
+                + conversation_id
+                + "."
+            )
+    else:
+        raise Exception("No user message found")
+
+    # the metadata the answer is streamed with, so the client knows where it belongs
+    history_metadata["conversation_id"] = conversation_id
+    return history_metadata
+
+
 @bp.route("/history/update", methods=["POST"])
 async def update_conversation():
     await cosmos_db_ready.wait()
@@ -1252,7 +1957,7 @@ async def generate_title(conversation_messages) -> str:
     messages.append({"role": "user", "content": title_prompt})
 
     try:
-        azure_openai_client = await init_openai_client()
+        azure_openai_client = await get_openai_client()
         response = await azure_openai_client.chat.completions.create(
             model=app_settings.azure_openai.model, messages=messages, temperature=1, max_tokens=64
         )
@@ -0,0 +1,170 @@
+import collections
+import hashlib
+import json
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass(frozen=True)
+class CachedAnswer():
+    '''The messages of one finished answer: the citations ("tool") if any, then the assistant text.'''
+    model: str
+    messages: Tuple[dict, ...]
+
+
+def normalise_content(content):
+    if isinstance(content, str):
+        return _WHITESPACE.sub(" ", content).strip()
+    return content
+
+
+def key_material(model_args: dict) -> dict:
+    '''
+    The parts of a chat completion request that decide the answer: the
+    messages (role, name, content with whitespace collapsed), the model and
+    sampling settings, the system message and the datasource payload, which
+    carries a user's document-level access filter. Whether the answer is
+    streamed and the per-user security context are left out.
+    '''
+    material = {name: value for name, value in model_args.items() if name not in ("messages", "stream", "extra_body")}
+    material["messages"] = [
+        {
+            "role": message.get("role"),
+            "name": message.get("name"),
+            "content": normalise_content(message.get("content")),
+            "function_call": message.get("function_call"),
+        }
+        for message in model_args.get("messages", [])
+    ]
+    material["data_sources"] = (model_args.get("extra_body") or {}).get("data_sources")
+    return material
+
+
+class ResponseCache():
+    '''
+    Finished chat answers keyed by a SHA-256 of key_material(), so a question
+    that was answered before with the same history and configuration is
+    answered again without calling Azure OpenAI or the datasource. A
+    per-worker in-memory LRU of max_entries; entries older than ttl_seconds
+    are dropped on access.
+    '''
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+        self.enabled = max_entries > 0
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        # key → (answer, stored at)
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def key(self, model_args: dict) -> str:
+        material = json.dumps(key_material(model_args), sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedAnswer]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            answer, stored_at = entry
+            if time.monotonic() - stored_at <= self._ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return answer
+            del self._entries[key]
+            self.expired += 1
+        self.misses += 1
+        return None
+
+    def put(self, key: str, answer: CachedAnswer) -> None:
+        if not self.enabled:
+            return
+        self._entries[key] = (answer, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+
+def answer_from_response(response_obj: dict) -> Optional[CachedAnswer]:
+    '''The answer of a format_non_streaming_response() result, None if it has no assistant text.'''
+    choices = response_obj.get("choices") or [{}]
+    messages = tuple(dict(message) for message in choices[0].get("messages", []))
+    if not any(message.get("role") == "assistant" and message.get("content") for message in messages):
+        return None
+    return CachedAnswer(response_obj.get("model", ""), messages)
+
+
+class StreamRecorder():
+    '''
+    Collects the format_stream_response() events of one streamed answer.
+    answer() has the citations and the joined assistant text, but only if
+    the model finished with "stop" -- truncated or filtered answers are not
+    worth repeating.
+    '''
+
+    def __init__(self):
+        self.model = ""
+        self.tool_messages = []
+        self.content = []
+        self.finish_reason = None
+
+    def add(self, event: dict, finish_reason: Optional[str] = None) -> None:
+        self.model = event.get("model") or self.model
+        for message in (event.get("choices") or [{}])[0].get("messages", []):
+            if message.get("role") == "assistant" and message.get("content"):
+                self.content.append(message["content"])
+            elif message.get("role") == "tool" and "tool_calls" not in message:
+                self.tool_messages.append(dict(message))
+        self.finish_reason = finish_reason or self.finish_reason
+
+    def answer(self) -> Optional[CachedAnswer]:
+        if self.finish_reason != "stop" or not self.content:
+            return None
+        return CachedAnswer(self.model, (*self.tool_messages, {"role": "assistant", "content": "".join(self.content)}))
+
+
+def _replayed(answer: CachedAnswer, object_name: str, history_metadata: dict) -> dict:
+    # a new id per replay: the frontend stores it as the message id, e.g. for feedback
+    return {
+        "id": f"cached-{uuid.uuid4()}",
+        "model": answer.model,
+        "created": int(time.time()),
+        "object": object_name,
+        "choices": [{"messages": []}],
+        "history_metadata": history_metadata,
+        "apim-request-id": None,
+        "cached": True,
+    }
+
+
+def replay_response(answer: CachedAnswer, history_metadata: dict) -> dict:
+    '''A cached answer in the format_non_streaming_response() format.'''
+    response_obj = _replayed(answer, "chat.completion", history_metadata)
+    response_obj["choices"][0]["messages"] = [dict(message) for message in answer.messages]
+    return response_obj
+
+
+async def replay_stream(answer: CachedAnswer, history_metadata: dict) -> AsyncIterator[dict]:
+    '''A cached answer as format_stream_response() events, one per message, all with the same id.'''
+    template = _replayed(answer, "chat.completion.chunk", history_metadata)
+    for message in answer.messages:
+        event = dict(template, choices=[{"messages": [dict(message)]}])
+        yield event
@@ -0,0 +1,154 @@
+import collections
+import hashlib
+import json
+import time
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.chat.response_cache import CachedAnswer, key_material
+from backend.speech.metrics import LATENCY_BUCKETS, Histogram
+
+
+def partition_key(model_args: dict) -> str:
+    '''
+    Everything of key_material() except the user's question: model, sampling
+    settings, system message, tools and the datasource payload with its
+    access filter. Only questions asked under the same partition can share
+    answers.
+    '''
+    material = key_material(model_args)
+    material["messages"] = [message for message in material["messages"] if message["role"] != "user"]
+    return hashlib.sha256(json.dumps(material, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+class _Partition():
+    '''Unit-length question embeddings, one row per cached answer; the matrix grows by doubling up to max_entries.'''
+
+    def __init__(self, dimensions: int):
+        self.vectors = np.zeros((16, dimensions), dtype=np.float32)
+        self.stored_at = np.zeros(16)
+        self.used_at = np.zeros(16)
+        self.answers = []
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def similarities(self, vector: np.ndarray, oldest: float) -> np.ndarray:
+        similarities = self.vectors[:len(self)] @ vector
+        similarities[self.stored_at[:len(self)] < oldest] = -np.inf # expired
+        return similarities
+
+    def row_for_new_entry(self, max_entries: int, oldest: float) -> Tuple[int, bool]:
+        '''The row for a new entry, and whether writing it evicts a live one.'''
+        if len(self) < max_entries:
+            if len(self) == len(self.vectors):
+                grown = min(len(self.vectors) * 2, max_entries)
+                self.vectors = np.resize(self.vectors, (grown, self.vectors.shape[1]))
+                self.stored_at = np.resize(self.stored_at, grown)
+                self.used_at = np.resize(self.used_at, grown)
+            self.answers.append(None)
+            return len(self) - 1, False
+        # expired entries go first, then the least recently used
+        used_at = np.where(self.stored_at[:len(self)] < oldest, -np.inf, self.used_at[:len(self)])
+        row = int(np.argmin(used_at))
+        return row, bool(used_at[row] != -np.inf)
+
+
+class SemanticCache():
+    '''
+    Answers to single-turn questions, found again by the embedding of the
+    question: a paraphrase of a cached question whose cosine similarity is
+    at least threshold gets the cached answer. Questions are partitioned by
+    partition_key(); each partition holds at most max_entries answers and
+    evicts the least recently used one. At most max_partitions partitions
+    are kept, the least recently used one is dropped first. Entries older
+    than ttl_seconds are not served.
+    '''
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 1024,
+        max_partitions: int = 64,
+        ttl_seconds: float = 3600.0,
+    ):
+        self.enabled = max_entries > 0
+        self.threshold = threshold
+        self._max_entries = max_entries
+        self._max_partitions = max_partitions
+        self._ttl_seconds = ttl_seconds
+        self._partitions = collections.OrderedDict()
+        self.embedding_seconds = Histogram(LATENCY_BUCKETS)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _unit(self, embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def _partition(self, partition: str, dimensions: int, create: bool) -> Optional[_Partition]:
+        entries = self._partitions.get(partition)
+        if entries is not None and entries.vectors.shape[1] != dimensions:
+            # the embedding model changed, its vectors are not comparable
+            del self._partitions[partition]
+            entries = None
+        if entries is None and create:
+            entries = self._partitions[partition] = _Partition(dimensions)
+            while len(self._partitions) > self._max_partitions:
+                _, dropped = self._partitions.popitem(last=False)
+                self.evictions += len(dropped)
+        if entries is not None:
+            self._partitions.move_to_end(partition)
+        return entries
+
+    def _nearest(self, entries: _Partition, vector: np.ndarray):
+        if not len(entries):
+            return None, -np.inf
+        similarities = entries.similarities(vector, time.monotonic() - self._ttl_seconds)
+        row = int(np.argmax(similarities))
+        return row, float(similarities[row])
+
+    def get(self, partition: str, embedding: Sequence[float]) -> Optional[CachedAnswer]:
+        vector = self._unit(embedding)
+        entries = self._partition(partition, len(embedding), create=False) if vector is not None else None
+        if entries is not None:
+            row, similarity = self._nearest(entries, vector)
+            if row is not None and similarity >= self.threshold:
+                entries.used_at[row] = time.monotonic()
+                self.hits += 1
+                return entries.answers[row]
+        self.misses += 1
+        return None
+
+    def put(self, partition: str, embedding: Sequence[float], answer: CachedAnswer) -> None:
+        vector = self._unit(embedding)
+        if not self.enabled or vector is None:
+            return
+        entries = self._partition(partition, len(embedding), create=True)
+        now = time.monotonic()
+        row, similarity = self._nearest(entries, vector)
+        evicted = False
+        if row is None or similarity < self.threshold:
+            row, evicted = entries.row_for_new_entry(self._max_entries, now - self._ttl_seconds)
+        # else: a paraphrase answered at the same time, the newer answer replaces it
+        entries.vectors[row] = vector
+        entries.stored_at[row] = now
+        entries.used_at[row] = now
+        entries.answers[row] = answer
+        self.evictions += int(evicted)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "partitions": len(self._partitions),
+            "entries": sum(len(entries) for entries in self._partitions.values()),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "embedding_seconds": self.embedding_seconds.snapshot(),
+        }
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+
+@dataclass
+class ToolCall():
+    name: str
+    arguments: str
+    id: Optional[str] = None
+
+
+def tool_error(message: str) -> str:
+    '''Tool result standing in for a call that failed, so the model can still answer with what it has.'''
+    return json.dumps({"error": message})
+
+
+class ToolCallDispatcher():
+    '''
+    Starts tool calls as soon as they are known, e.g. while the model is
+    still streaming the next ones. At most max_parallel run at a time, and
+    each gets timeout_seconds once it has started. results() waits for all
+    of them and returns the results in the order they were submitted. A
+    call that times out or fails gets a tool_error result instead of
+    failing the whole turn.
+    '''
+
+    def __init__(
+        self,
+        invoke: Callable[[str, str], Awaitable[Optional[str]]],
+        max_parallel: int = 4,
+        timeout_seconds: float = 30.0,
+    ):
+        self._invoke = invoke
+        self._slots = asyncio.Semaphore(max(max_parallel, 1))
+        self._timeout_seconds = timeout_seconds
+        self._tasks: List[asyncio.Future] = []
+
+    async def _run(self, tool_call: ToolCall) -> Optional[str]:
+        async with self._slots:
+            try:
+                return await asyncio.wait_for(self._invoke(tool_call.name, tool_call.arguments), self._timeout_seconds)
+            except asyncio.TimeoutError:
+                logging.warning(f"Tool {tool_call.name} timed out after {self._timeout_seconds:g}s")
+                return tool_error(f"{tool_call.name} timed out")
+            except Exception:
+                logging.exception(f"Tool {tool_call.name} failed")
+                return tool_error(f"{tool_call.name} failed")
+
+    def submit(self, tool_call: ToolCall) -> None:
+        self._tasks.append(asyncio.ensure_future(self._run(tool_call)))
+
+    async def results(self) -> List[Optional[str]]:
+        return list(await asyncio.gather(*self._tasks))
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+
+async def run_tool_calls(
+    tool_calls: Sequence[ToolCall],
+    invoke: Callable[[str, str], Awaitable[Optional[str]]],
+    max_parallel: int = 4,
+    timeout_seconds: float = 30.0,
+) -> List[Optional[str]]:
+    '''Run the tool calls of one model turn concurrently, see ToolCallDispatcher.'''
+    dispatcher = ToolCallDispatcher(invoke, max_parallel, timeout_seconds)
+    for tool_call in tool_calls:
+        dispatcher.submit(tool_call)
+    return await dispatcher.results()
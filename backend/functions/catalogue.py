@@ -0,0 +1,112 @@
+import asyncio
+import contextlib
+import logging
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional, Tuple
+
+import httpx
+
+from backend.http_client import SharedHTTPClient
+
+
+@dataclass(frozen=True)
+class ToolSnapshot():
+    '''
+    One fetched version of the tool catalogue: the definitions in catalogue
+    order, one per function name, and a name → definition index. Replaced
+    whole on refresh, never changed in place.
+    '''
+    tools: Tuple[dict, ...] = ()
+    by_name: Mapping[str, dict] = field(default_factory=lambda: MappingProxyType({}))
+    fetched_at: Optional[float] = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.by_name
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+
+def build_snapshot(definitions: Iterable[dict], fetched_at: Optional[float] = None) -> ToolSnapshot:
+    '''Deduplicate tool definitions by function name (the first one wins), skipping malformed ones.'''
+    by_name = {}
+    for definition in definitions:
+        name = definition.get("function", {}).get("name") if isinstance(definition, dict) else None
+        if not name:
+            logging.warning(f"Skipping a tool definition without a function name: {definition!r}")
+            continue
+        by_name.setdefault(name, definition)
+    return ToolSnapshot(tuple(by_name.values()), MappingProxyType(by_name), fetched_at)
+
+
+class ToolCatalogue():
+    '''
+    The Azure Functions tool catalogue, fetched once at start() and then
+    refreshed in the background every ttl_seconds, so chat requests read
+    the current snapshot without a network hop. A failed fetch keeps the
+    previous snapshot and is retried after retry_seconds.
+    '''
+
+    def __init__(
+        self,
+        url: str,
+        client: SharedHTTPClient,
+        ttl_seconds: float = 300.0,
+        retry_seconds: float = 30.0,
+        timeout_seconds: float = 10.0,
+    ):
+        self._url = url
+        self._client = client
+        self._ttl_seconds = ttl_seconds
+        self._retry_seconds = retry_seconds
+        self._timeout_seconds = timeout_seconds
+        self._refresher = None
+        self.snapshot = ToolSnapshot()
+        self.refreshes = 0
+        self.failures = 0
+
+    async def _fetch(self) -> list:
+        response = await self._client.get(self._url, endpoint="tools", timeout=self._timeout_seconds)
+        response.raise_for_status()
+        return response.json()
+
+    async def refresh(self) -> bool:
+        try:
+            definitions = await self._fetch()
+        except (httpx.HTTPError, ValueError) as e:
+            self.failures += 1
+            logging.error(f"An error occurred while getting OpenAI Function Call tools metadata: {e}")
+            return False
+        self.snapshot = build_snapshot(definitions, time.time())
+        self.refreshes += 1
+        return True
+
+    async def _refresh_loop(self) -> None:
+        ok = True
+        while True:
+            await asyncio.sleep(self._ttl_seconds if ok else min(self._retry_seconds, self._ttl_seconds))
+            ok = await self.refresh()
+
+    async def start(self) -> None:
+        ok = await self.refresh()
+        if self._ttl_seconds > 0:
+            self._refresher = asyncio.ensure_future(self._refresh_loop())
+        elif not ok:
+            logging.warning("The tool catalogue is empty and will not be refreshed")
+
+    async def close(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._refresher
+
+    def stats(self) -> dict:
+        age = time.time() - self.snapshot.fetched_at if self.snapshot.fetched_at else None
+        return {
+            "tools": len(self.snapshot),
+            "age_seconds": round(age, 1) if age is not None else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
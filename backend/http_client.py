@@ -0,0 +1,120 @@
+import asyncio
+import collections
+import logging
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from backend.speech.metrics import LATENCY_BUCKETS, Histogram
+
+try:
+    import h2  # noqa: F401 -- httpx needs it for HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class _HostStats():
+    def __init__(self):
+        self.active = 0
+        self.waiting = 0
+        self.max_active = 0
+        self.saturated = 0
+        self.requests = 0
+        self.errors = 0
+        self.wait_seconds = Histogram(LATENCY_BUCKETS)
+
+    def snapshot(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_active": self.max_active,
+            "saturated": self.saturated,
+            "requests": self.requests,
+            "errors": self.errors,
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
+
+
+class SharedHTTPClient():
+    '''
+    One pooled httpx.AsyncClient per worker for the outbound calls of a chat
+    turn (remote function calls, promptflow), so they reuse warm keep-alive
+    connections instead of paying DNS, TCP and TLS setup on every hop.
+    HTTP/2 is used where the server and the h2 package allow it. At most
+    max_per_host requests go to one host at a time; requests beyond that
+    wait, which shows up as "saturated" in stats(). Each call names its
+    endpoint, for the latency metrics, and passes that endpoint's timeout.
+    '''
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry_seconds: float = 60.0,
+        max_per_host: int = 20,
+        http2: bool = True,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        if http2 and not HTTP2_AVAILABLE:
+            logging.warning("HTTP/2 requested but the h2 package is not installed, using HTTP/1.1")
+            http2 = False
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry_seconds,
+            ),
+            transport=transport,
+        )
+        self._max_per_host = max_per_host
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._hosts: Dict[str, _HostStats] = collections.defaultdict(_HostStats)
+        self._latency: Dict[str, Histogram] = {}
+
+    async def request(self, method: str, url: str, endpoint: str = "default", **kwargs) -> httpx.Response:
+        host = httpx.URL(url).host
+        slots = self._slots.setdefault(host, asyncio.Semaphore(self._max_per_host))
+        stats = self._hosts[host]
+        if slots.locked():
+            stats.saturated += 1
+
+        stats.waiting += 1
+        queued_at = time.monotonic()
+        try:
+            await slots.acquire()
+        finally:
+            stats.waiting -= 1
+        stats.wait_seconds.observe(time.monotonic() - queued_at)
+
+        stats.active += 1
+        stats.max_active = max(stats.max_active, stats.active)
+        stats.requests += 1
+        started = time.monotonic()
+        try:
+            return await self._client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            stats.errors += 1
+            raise
+        finally:
+            stats.active -= 1
+            slots.release()
+            self._latency.setdefault(endpoint, Histogram(LATENCY_BUCKETS)).observe(time.monotonic() - started)
+
+    async def get(self, url: str, endpoint: str = "default", **kwargs) -> httpx.Response:
+        return await self.request("GET", url, endpoint, **kwargs)
+
+    async def post(self, url: str, endpoint: str = "default", **kwargs) -> httpx.Response:
+        return await self.request("POST", url, endpoint, **kwargs)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "max_per_host": self._max_per_host,
+            "hosts": {host: stats.snapshot() for host, stats in self._hosts.items()},
+            "latency_seconds": {endpoint: histogram.snapshot() for endpoint, histogram in self._latency.items()},
+        }
@@ -82,6 +82,170 @@ class _PromptflowSettings(BaseSettings):
     citations_field_name: str = "documents"
 
 
+class _OutboundHTTPSettings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_prefix="OUTBOUND_HTTP_",
+        env_file=DOTENV_PATH,
+        extra="ignore",
+        env_ignore_empty=True
+    )
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_seconds: float = 60.0
+    max_per_host: int = 20
+    http2: bool = True
+
+    def client_options(self) -> dict:
+        return {
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "keepalive_expiry_seconds": self.keepalive_expiry_seconds,
+            "max_per_host": self.max_per_host,
+            "http2": self.http2,
+        }
+
+
+class _ResponseCacheSettings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_prefix="RESPONSE_CACHE_",
+        env_file=DOTENV_PATH,
+        extra="ignore",
+        env_ignore_empty=True
+    )
+
+    enabled: bool = False
+    size: int = 1024
+    ttl_seconds: float = 3600.0
+    semantic_enabled: bool = False
+    semantic_threshold: confloat(gt=0.0, le=1.0) = 0.95
+    semantic_size: int = 1024
+    semantic_partitions: int = 64
+    semantic_embedding_timeout_seconds: float = 5.0
+
+    def cache_options(self) -> dict:
+        return {
+            "max_entries": self.size if self.enabled else 0,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    def semantic_cache_options(self) -> dict:
+        return {
+            "threshold": self.semantic_threshold,
+            "max_entries": self.semantic_size if self.semantic_enabled else 0,
+            "max_partitions": self.semantic_partitions,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+class _SpeechSettings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_prefix="AZURE_SPEECH_",
+        env_file=DOTENV_PATH,
+        extra="ignore",
+        env_ignore_empty=True
+    )
+
+    key: Optional[str] = None
+    region: Optional[str] = None
+    languages: Optional[List[str]] = [
+        "de-DE", "en-US", "tr-TR", "ru-RU", "pl-PL",
+        "it-IT", "fr-FR", "uk-UA", "cs-CZ", "es-ES"
+    ]
+    max_workers: int = 8
+    streaming_decode: bool = True
+    pool_size: int = 2
+    pool_max_idle_seconds: float = 240.0
+    decoder: Literal["auto", "pyav", "ffmpeg"] = "auto"
+    pcm_passthrough: bool = True
+    max_upload_bytes: int = 26214400
+    max_audio_seconds: float = 600.0
+    vad_enabled: bool = True
+    vad_threshold_dbfs: float = -45.0
+    vad_max_pause_ms: int = 600
+    vad_padding_ms: int = 300
+    language_hints_enabled: bool = True
+    language_hint_max_users: int = 10000
+    language_hint_ttl_seconds: float = 604800.0
+    language_hint_max_languages: int = 2
+    language_hint_min_samples: int = 3
+    language_hint_min_confidence: float = 0.5
+    single_shot_max_seconds: float = 10.0
+    segmented: bool = True
+    segment_max_seconds: float = 30.0
+    segment_lookback_seconds: float = 5.0
+    segment_max_parallel: int = 4
+    segment_max_parallel_per_worker: int = 8
+    transcript_cache_size: int = 256
+    transcript_cache_ttl_seconds: float = 86400.0
+    transcript_cache_dir: Optional[str] = None
+    max_concurrent: int = 8
+    max_queue: int = 16
+    max_per_user: int = 0
+    queue_timeout_seconds: float = 60.0
+    max_live_sessions: int = 8
+    worker_processes: int = 0
+    worker_mode: bool = False
+    worker_socket: str = "/tmp/speech-workers.sock"
+    backend: Literal["azure", "local"] = "azure"
+    local_connect_seconds: float = 0.15
+    local_rtf: float = 0.1
+
+    @field_validator('languages', mode='before')
+    @classmethod
+    def split_languages(cls, comma_separated_string: str, info: ValidationInfo) -> List[str]:
+        if isinstance(comma_separated_string, str) and len(comma_separated_string) > 0:
+            return parse_multi_columns(comma_separated_string)
+
+        return cls.model_fields[info.field_name].get_default()
+
+    def vad_options(self) -> dict:
+        return {
+            "threshold_dbfs": self.vad_threshold_dbfs,
+            "max_pause_ms": self.vad_max_pause_ms,
+            "padding_ms": self.vad_padding_ms,
+        }
+
+    def language_hint_options(self) -> dict:
+        return {
+            "enabled": self.language_hints_enabled,
+            "max_users": self.language_hint_max_users,
+            "ttl_seconds": self.language_hint_ttl_seconds,
+            "max_languages": self.language_hint_max_languages,
+            "min_samples": self.language_hint_min_samples,
+            "min_confidence": self.language_hint_min_confidence,
+        }
+
+    def local_backend_options(self) -> dict:
+        return {
+            "connect_seconds": self.local_connect_seconds,
+            "rtf": self.local_rtf,
+        }
+
+    def admission_options(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "max_per_user": self.max_per_user,
+            "queue_timeout_seconds": self.queue_timeout_seconds,
+        }
+
+    def live_admission_options(self) -> dict:
+        # a live session holds its slot for as long as the user dictates, so it is not queued
+        return {
+            "max_concurrent": self.max_live_sessions,
+            "max_queue": 0,
+            "max_per_user": self.max_per_user,
+        }
+
+    def segment_options(self) -> dict:
+        return {
+            "max_segment_seconds": self.segment_max_seconds,
+            "lookback_seconds": self.segment_lookback_seconds,
+            "threshold_dbfs": self.vad_threshold_dbfs,
+        }
+
+
 class _AzureOpenAIFunction(BaseModel):
     name: str = Field(..., min_length=1)
     description: str = Field(..., min_length=1)
@@ -120,14 +284,20 @@ class _AzureOpenAISettings(BaseSettings):
     frequency_penalty: Optional[confloat(ge=-2.0, le=2.0)] = 0.0
     system_message: str = "You are an AI assistant that helps people find information."
     preview_api_version: str = MINIMUM_SUPPORTED_AZURE_OPENAI_PREVIEW_API_VERSION
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_seconds: float = 120.0
     embedding_endpoint: Optional[str] = None
     embedding_key: Optional[str] = None
     embedding_name: Optional[str] = None
     function_call_azure_functions_enabled: Optional[bool] = False
     function_call_azure_functions_tools_key: Optional[str] = None
     function_call_azure_functions_tools_base_url: Optional[str] = None
+    function_call_azure_functions_tools_ttl_seconds: float = 300.0
     function_call_azure_functions_tool_key: Optional[str] = None
     function_call_azure_functions_tool_base_url: Optional[str] = None
+    function_call_azure_functions_tool_timeout_seconds: float = 30.0
+    function_call_azure_functions_max_parallel: int = 4
     
     @field_validator('tools', mode='before')
     @classmethod
@@ -768,6 +938,9 @@ class _AppSettings(BaseModel):
     azure_openai: _AzureOpenAISettings = _AzureOpenAISettings()
     search: _SearchCommonSettings = _SearchCommonSettings()
     ui: Optional[_UiSettings] = _UiSettings()
+    speech: _SpeechSettings = _SpeechSettings()
+    outbound_http: _OutboundHTTPSettings = _OutboundHTTPSettings()
+    response_cache: _ResponseCacheSettings = _ResponseCacheSettings()
     
     # Constructed properties
     chat_history: Optional[_ChatHistorySettings] = None
@@ -0,0 +1,108 @@
+import asyncio
+import collections
+import contextlib
+import math
+import time
+from typing import Optional
+
+from backend.speech.metrics import LATENCY_BUCKETS, Histogram
+
+
+class Overloaded(Exception):
+    '''Raised instead of queueing when a worker (or a user) already has too much in flight.'''
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController():
+    '''
+    Bounds the transcriptions a worker runs at once. Up to max_concurrent
+    requests run, up to max_queue more wait for a slot (at most
+    queue_timeout_seconds), and anything beyond is rejected right away
+    with Overloaded. max_per_user, when set, caps the running and waiting
+    requests of a single user. max_concurrent 0 disables the limit.
+    '''
+
+    def __init__(
+        self,
+        max_concurrent: int = 8,
+        max_queue: int = 16,
+        max_per_user: int = 0,
+        queue_timeout_seconds: float = 60.0,
+    ):
+        self.enabled = max_concurrent > 0
+        self._max_concurrent = max_concurrent
+        self._max_queue = max_queue
+        self._max_per_user = max_per_user
+        self._queue_timeout_seconds = queue_timeout_seconds
+        self._slots = asyncio.Semaphore(max(max_concurrent, 1))
+        self._per_user = collections.Counter()
+        # moving average of how long an admitted request holds its slot
+        self._hold_seconds = 1.0
+        self.wait_seconds = Histogram(LATENCY_BUCKETS)
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def retry_after(self) -> int:
+        '''Seconds until the queue ahead of a new request has likely drained.'''
+        return max(1, math.ceil(self._hold_seconds * (self.queued + 1) / self._max_concurrent))
+
+    def _reject(self, reason: str) -> Overloaded:
+        self.rejected += 1
+        return Overloaded(reason, self.retry_after())
+
+    @contextlib.asynccontextmanager
+    async def admit(self, user_id: Optional[str] = None):
+        if not self.enabled:
+            yield
+            return
+
+        if self._max_per_user and user_id and self._per_user[user_id] >= self._max_per_user:
+            raise self._reject("too many transcriptions for this user")
+        if self._slots.locked() and self.queued >= self._max_queue:
+            raise self._reject("too many transcriptions in progress")
+
+        self._per_user[user_id] += 1
+        try:
+            queued_at = time.monotonic()
+            if self._slots.locked():
+                self.queued += 1
+                try:
+                    await asyncio.wait_for(self._slots.acquire(), self._queue_timeout_seconds)
+                except asyncio.TimeoutError:
+                    raise self._reject("timed out waiting for a transcription slot")
+                finally:
+                    self.queued -= 1
+            else:
+                await self._slots.acquire() # a free slot is taken without suspending
+            self.wait_seconds.observe(time.monotonic() - queued_at)
+
+            self.admitted += 1
+            self.active += 1
+            started_at = time.monotonic()
+            try:
+                yield
+            finally:
+                self.active -= 1
+                self._slots.release()
+                self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (time.monotonic() - started_at)
+        finally:
+            self._per_user[user_id] -= 1
+            if not self._per_user[user_id]:
+                del self._per_user[user_id]
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self._max_concurrent,
+            "max_queue": self._max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
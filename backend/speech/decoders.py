@@ -0,0 +1,338 @@
+import asyncio
+import contextvars
+import io
+import logging
+import queue
+import subprocess
+import threading
+from abc import ABC, abstractmethod
+from typing import AsyncIterable, AsyncIterator, Callable, Optional, Sequence
+
+from backend.speech.formats import AudioFormat, PCMConverter, sniff_format
+
+try:
+    import av
+except ImportError:
+    av = None
+
+# WebM/Opus (or anything FFmpeg understands) on stdin → 16 kHz mono s16le PCM on stdout
+FFMPEG_PCM_ARGS = [
+    "ffmpeg", "-hide_banner", "-loglevel", "error",
+    "-i", "pipe:0",
+    "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", "16000",
+    "pipe:1",
+]
+
+# live dictation: keep FFmpeg from buffering seconds of input while it probes the stream
+FFMPEG_LIVE_PCM_ARGS = [
+    "ffmpeg", "-hide_banner", "-loglevel", "error",
+    "-fflags", "nobuffer", "-probesize", "32768", "-analyzeduration", "0",
+    "-i", "pipe:0",
+    "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", "16000",
+    "pipe:1",
+]
+
+# same probing limits for the in-process decoder
+PYAV_LIVE_OPTIONS = {"fflags": "nobuffer", "probesize": "32768", "analyzeduration": "0"}
+
+# 100 ms of 16 kHz mono s16le audio
+PCM_FRAME_BYTES = 3200
+
+
+async def stream_decode(
+    chunks: AsyncIterable[bytes],
+    on_pcm: Callable[[bytes], None],
+    args: Sequence[str] = FFMPEG_PCM_ARGS,
+    frame_bytes: int = PCM_FRAME_BYTES,
+) -> int:
+    '''
+    Pipe compressed audio chunks through an FFmpeg subprocess as they arrive
+    and hand every decoded PCM frame to on_pcm as soon as FFmpeg emits it.
+    Returns the number of PCM bytes produced.
+    '''
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    async def feed():
+        try:
+            async for chunk in chunks:
+                if chunk:
+                    proc.stdin.write(chunk)
+                    await proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # FFmpeg gave up on the input, its exit code and stderr tell us why
+            pass
+        finally:
+            proc.stdin.close()
+
+    feeder = asyncio.create_task(feed())
+    stderr = asyncio.create_task(proc.stderr.read())
+    total = 0
+    try:
+        while True:
+            pcm = await proc.stdout.read(frame_bytes)
+            if not pcm:
+                break
+            total += len(pcm)
+            on_pcm(pcm)
+
+        await feeder
+        returncode = await proc.wait()
+        err = await stderr
+    except BaseException:
+        feeder.cancel()
+        stderr.cancel()
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+
+    if returncode:
+        raise RuntimeError(err.decode(errors="replace").strip())
+
+    return total
+
+
+class AudioDecoder(ABC):
+    '''Turns compressed audio into 16 kHz mono s16le PCM.'''
+    name = ""
+
+    @abstractmethod
+    def decode(self, data: bytes) -> bytes:
+        '''Blocking decode of a complete upload. Run it on an executor.'''
+        pass
+
+    @abstractmethod
+    async def stream(self, chunks: AsyncIterable[bytes], on_pcm: Callable[[bytes], None]) -> int:
+        '''Decode chunks as they arrive, calling on_pcm on the loop for every PCM frame.'''
+        pass
+
+
+class FFmpegSubprocessDecoder(AudioDecoder):
+    '''Forks an FFmpeg process per request.'''
+    name = "ffmpeg"
+
+    def __init__(self, args: Sequence[str] = FFMPEG_PCM_ARGS):
+        self.args = list(args)
+
+    def decode(self, data: bytes) -> bytes:
+        proc = subprocess.run(self.args, input=data, capture_output=True)
+        if proc.returncode:
+            raise RuntimeError(proc.stderr.decode(errors="replace").strip())
+        return proc.stdout
+
+    async def stream(self, chunks, on_pcm) -> int:
+        return await stream_decode(chunks, on_pcm, args=self.args)
+
+
+class _ChunkReader(io.RawIOBase):
+    '''Blocking file object fed from the event loop, read by the decoder thread.'''
+
+    def __init__(self):
+        self._chunks = queue.SimpleQueue()
+        self._pending = b""
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def put(self, chunk: Optional[bytes]) -> None:
+        # None marks the end of the input
+        self._chunks.put(chunk)
+
+    def readinto(self, buffer) -> int:
+        while not self._pending and not self._eof:
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._eof = True
+            else:
+                self._pending = chunk
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _resolve(future: asyncio.Future, result=None, exception: Optional[BaseException] = None) -> None:
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+
+class PyAVDecoder(AudioDecoder):
+    '''
+    In-process WebM/Ogg-Opus demux, decode and resample through the libav
+    bindings, so no process is forked per request. Each stream() decodes
+    on a thread of its own, see stream().
+    '''
+    name = "pyav"
+
+    def __init__(self, options: Optional[dict] = None):
+        if av is None:
+            raise RuntimeError("PyAV is not installed")
+        self._options = options or {}
+
+    def _decode_file(self, file, emit: Callable[[bytes], None]) -> int:
+        total = 0
+        try:
+            with av.open(file, mode="r", options=self._options) as container:
+                resampler = av.AudioResampler(format="s16", layout="mono", rate=16000)
+                for frame in container.decode(audio=0):
+                    for resampled in resampler.resample(frame):
+                        pcm = resampled.to_ndarray().tobytes()
+                        total += len(pcm)
+                        emit(pcm)
+                for resampled in resampler.resample(None):
+                    pcm = resampled.to_ndarray().tobytes()
+                    total += len(pcm)
+                    emit(pcm)
+        except av.error.FFmpegError as e:
+            raise RuntimeError(str(e)) from e
+        return total
+
+    def decode(self, data: bytes) -> bytes:
+        pcm = bytearray()
+        self._decode_file(io.BytesIO(data), pcm.extend)
+        return pcm # not copied into bytes, the callers only read it
+
+    async def stream(self, chunks, on_pcm) -> int:
+        loop = asyncio.get_running_loop()
+        reader = _ChunkReader()
+        # run on_pcm in the caller's context (e.g. the request's app context), not the decoder thread's
+        context = contextvars.copy_context()
+
+        def emit(pcm: bytes) -> None:
+            loop.call_soon_threadsafe(on_pcm, pcm, context=context)
+
+        decoding = loop.create_future()
+
+        def decode() -> None:
+            try:
+                result, exception = self._decode_file(reader, emit), None
+            except BaseException as e:
+                result, exception = None, e
+            try:
+                loop.call_soon_threadsafe(_resolve, decoding, result, exception)
+            except RuntimeError:
+                pass # the loop is closed, nobody waits for the result anymore
+
+        #the decoder thread blocks in readinto() until the client sends more, for as long as the upload or live session lasts.
+        #on a shared executor a few slow clients would hold the threads recognizer starts and stops need, so each stream
+        #gets its own thread; their number is bounded by transcription admission and the live session limit
+        threading.Thread(target=decode, name="pyav-stream", daemon=True).start()
+        try:
+            async for chunk in chunks:
+                if decoding.done():
+                    # the decoder gave up on the input, its exception tells us why
+                    break
+                if chunk:
+                    reader.put(chunk)
+        finally:
+            reader.put(None)
+
+        return await decoding
+
+
+class PCMDecoder(AudioDecoder):
+    '''
+    WAV and raw PCM uploads need no decoding: 16 kHz mono is passed through
+    as is, anything else is only downmixed and resampled, on the loop's
+    default executor so a long chunk does not hold up the event loop.
+    '''
+    name = "pcm"
+
+    def __init__(self, audio_format: AudioFormat):
+        self.audio_format = audio_format
+
+    def decode(self, data: bytes) -> bytes:
+        converter = PCMConverter(self.audio_format)
+        return converter.push(data) + converter.flush()
+
+    async def stream(self, chunks, on_pcm) -> int:
+        loop = asyncio.get_running_loop()
+        converter = PCMConverter(self.audio_format)
+
+        async def convert(step: Callable, *args) -> bytes:
+            if converter.passthrough:
+                return step(*args) # only slicing, not worth a thread hop
+            return await loop.run_in_executor(None, step, *args)
+
+        total = 0
+        async for chunk in chunks:
+            pcm = await convert(converter.push, chunk)
+            if pcm:
+                total += len(pcm)
+                on_pcm(pcm)
+        pcm = await convert(converter.flush)
+        if pcm:
+            total += len(pcm)
+            on_pcm(pcm)
+        return total
+
+
+class SniffingDecoder(AudioDecoder):
+    '''
+    Per-upload decoder that looks at the first bytes and the Content-Type:
+    WAV and raw PCM go through PCMDecoder, everything else through the
+    compressed decoder. audio_format and name tell what was picked.
+    '''
+
+    def __init__(self, compressed: AudioDecoder, content_type: Optional[str] = None):
+        self._compressed = compressed
+        self._content_type = content_type
+        self.audio_format: Optional[AudioFormat] = None
+        self.name = compressed.name
+
+    def _select(self, head: bytes, complete: bool) -> Optional[AudioDecoder]:
+        audio_format = sniff_format(head, self._content_type, complete)
+        if audio_format is None:
+            return None
+        self.audio_format = audio_format
+        decoder = PCMDecoder(audio_format) if audio_format.is_pcm else self._compressed
+        self.name = decoder.name
+        return decoder
+
+    def decode(self, data: bytes) -> bytes:
+        return self._select(data, complete=True).decode(data)
+
+    async def stream(self, chunks, on_pcm) -> int:
+        iterator = chunks.__aiter__()
+        head = b""
+        complete = False
+        decoder = None
+        while decoder is None:
+            try:
+                head += await iterator.__anext__()
+            except StopAsyncIteration:
+                complete = True
+            decoder = self._select(head, complete)
+
+        async def replayed() -> AsyncIterator[bytes]:
+            if head:
+                yield head
+            if not complete:
+                async for chunk in iterator:
+                    yield chunk
+
+        return await decoder.stream(replayed(), on_pcm)
+
+
+def create_decoder(name: str = "auto", live: bool = False) -> AudioDecoder:
+    '''
+    "auto" prefers the in-process PyAV decoder and falls back to the FFmpeg
+    subprocess when PyAV is not installed. live tunes probing for low latency.
+    '''
+    if name in ("auto", "pyav") and av is not None:
+        return PyAVDecoder(options=PYAV_LIVE_OPTIONS if live else None)
+
+    if name == "pyav":
+        logging.warning("PyAV is not installed, falling back to the FFmpeg subprocess decoder")
+
+    return FFmpegSubprocessDecoder(FFMPEG_LIVE_PCM_ARGS if live else FFMPEG_PCM_ARGS)
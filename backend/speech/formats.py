@@ -0,0 +1,267 @@
+import math
+import struct
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from backend.speech.vad import BYTES_PER_SAMPLE, SAMPLE_RATE
+
+# give up waiting for the data chunk of a WAV header after this many bytes and let the decoder sort it out
+MAX_HEADER_BYTES = 65536
+
+# containers told apart by their first bytes, for logging
+MAGIC_BYTES = (
+    (b"\x1a\x45\xdf\xa3", "webm"),
+    (b"OggS", "ogg"),
+    (b"fLaC", "flac"),
+    (b"ID3", "mp3"),
+    (b"#!AMR", "amr"),
+)
+
+# output samples resampled at once, so the filter taps stay small however long the recording is
+RESAMPLE_BLOCK = 4096
+
+# PCM rates converted in process; the resampling filter grows with the rate ratio, so other rates go to the decoder
+SUPPORTED_PCM_RATES = frozenset((8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000))
+MAX_PCM_CHANNELS = 8
+# up/down of the rates above stay below this, see Resampler
+MAX_RESAMPLE_FACTOR = 1000
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+RAW_PCM_TYPES = {"audio/pcm": False, "audio/l16": True} # mime type → big endian
+
+
+class UnsupportedAudio(Exception):
+    '''Raw PCM whose sample rate or channel count is not supported.'''
+
+
+def supported_pcm(rate: int, channels: int) -> bool:
+    return rate in SUPPORTED_PCM_RATES and 0 < channels <= MAX_PCM_CHANNELS
+
+
+@dataclass
+class AudioFormat:
+    '''
+    What an upload contains. "wav" and "pcm" are 16-bit PCM that needs no
+    decoding, anything else is left to a decoder. data_offset is where the
+    samples start, data_bytes how many there are (None: up to the end).
+    '''
+    container: str
+    sample_rate: int = SAMPLE_RATE
+    channels: int = 1
+    big_endian: bool = False
+    data_offset: int = 0
+    data_bytes: Optional[int] = None
+
+    @property
+    def is_pcm(self) -> bool:
+        return self.container in ("wav", "pcm")
+
+
+def parse_content_type(content_type: Optional[str]):
+    '''"audio/L16; rate=8000" → ("audio/l16", {"rate": "8000"})'''
+    if not content_type:
+        return "", {}
+    mimetype, *params = content_type.split(";")
+    options = {}
+    for param in params:
+        key, _, value = param.partition("=")
+        options[key.strip().lower()] = value.strip().strip('"')
+    return mimetype.strip().lower(), options
+
+
+def _parse_wav(head: bytes) -> Optional[AudioFormat]:
+    '''The format of a RIFF/WAVE header, None while the data chunk has not been reached.'''
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(head):
+        chunk_id = head[offset:offset + 4]
+        size = int.from_bytes(head[offset + 4:offset + 8], "little")
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            if body + 16 > len(head):
+                return None
+            tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", head, body)
+            if tag == WAVE_FORMAT_EXTENSIBLE and size >= 40:
+                if body + 26 > len(head):
+                    return None
+                tag = struct.unpack_from("<H", head, body + 24)[0] # first two bytes of the subformat GUID
+            fmt = (tag, channels, rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return AudioFormat("wav-unknown")
+            tag, channels, rate, bits = fmt
+            if tag != WAVE_FORMAT_PCM or bits != 16 or not channels or not rate:
+                # float, 24-bit, A-law, ADPCM, ... WAVs go through the decoder
+                return AudioFormat(f"wav-{tag}-{bits}bit")
+            if not supported_pcm(rate, channels):
+                # odd rates and channel layouts are left to the decoder too
+                return AudioFormat(f"wav-{rate}hz-{channels}ch")
+            # streamed WAVs write 0 or 0xFFFFFFFF because the length was not known yet
+            data_bytes = size if 0 < size < 0xFFFFFFFF else None
+            return AudioFormat("wav", rate, channels, data_offset=body, data_bytes=data_bytes)
+        offset = body + size + (size & 1)
+    return None
+
+
+def sniff_format(head: bytes, content_type: Optional[str] = None, complete: bool = False) -> Optional[AudioFormat]:
+    '''
+    Detect the format of an upload from its first bytes and Content-Type.
+    Magic bytes win over the header; raw PCM has none, so it is recognized
+    by Content-Type alone: audio/pcm (little endian) or audio/L16 (big
+    endian, RFC 2586), with rate (or samplerate) and channels parameters.
+    Returns None when more bytes are needed, unless complete says there are
+    no more. Raises UnsupportedAudio for raw PCM at a rate or channel count
+    outside SUPPORTED_PCM_RATES and MAX_PCM_CHANNELS, no decoder can take
+    headerless audio instead.
+    '''
+    if len(head) < 12 and not complete:
+        return None
+
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        fmt = _parse_wav(head)
+        if fmt is None and not complete and len(head) < MAX_HEADER_BYTES:
+            return None
+        return fmt or AudioFormat("wav-unknown")
+
+    for magic, container in MAGIC_BYTES:
+        if head.startswith(magic):
+            return AudioFormat(container)
+    if head[4:8] == b"ftyp":
+        return AudioFormat("mp4")
+
+    mimetype, options = parse_content_type(content_type)
+    if mimetype in RAW_PCM_TYPES:
+        try:
+            rate = int(options.get("rate") or options.get("samplerate") or SAMPLE_RATE)
+            channels = int(options.get("channels") or 1)
+        except ValueError:
+            return AudioFormat("unknown")
+        if not supported_pcm(rate, channels):
+            raise UnsupportedAudio(f"unsupported raw PCM: {rate} Hz, {channels} channels")
+        return AudioFormat("pcm", rate, channels, big_endian=RAW_PCM_TYPES[mimetype])
+
+    return AudioFormat("unknown")
+
+
+def _design_filter(up: int, down: int) -> np.ndarray:
+    # Kaiser-windowed sinc low-pass at the lower of the two Nyquist rates, for the signal upsampled by up
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    n = np.arange(-half_len, half_len + 1)
+    taps = np.sinc(n / max_rate) * np.kaiser(2 * half_len + 1, 5.0)
+    return taps * (up / taps.sum())
+
+
+class Resampler():
+    '''
+    Polyphase FIR resampler from any integer rate to target, incrementally:
+    process() whatever samples arrive and flush() at the end. Equivalent to
+    upsampling by up, low-pass filtering and keeping every down-th sample,
+    but only the filter taps that hit real samples are computed.
+    '''
+
+    def __init__(self, rate: int, target: int = SAMPLE_RATE):
+        divisor = math.gcd(rate, target)
+        self.up = target // divisor
+        self.down = rate // divisor
+        if max(self.up, self.down) > MAX_RESAMPLE_FACTOR:
+            # the filter has 20 taps per unit of the larger factor
+            raise UnsupportedAudio(f"cannot resample {rate} Hz to {target} Hz")
+        taps = _design_filter(self.up, self.down)
+        self._delay = len(taps) // 2
+        self._width = -(-len(taps) // self.up)
+        # phase p, tap k → taps[p + k * up]
+        self._phases = np.pad(taps, (0, self._width * self.up - len(taps))).reshape(self._width, self.up).T
+        self._history = np.zeros(self._width - 1)
+        self._history_start = 1 - self._width # input index of _history[0], zeros before the signal
+        self._received = 0
+        self._produced = 0
+
+    def _available(self, received: int) -> int:
+        # outputs whose newest input sample has arrived
+        return max((received * self.up - 1 - self._delay) // self.down + 1, 0)
+
+    def _run(self, count: int) -> np.ndarray:
+        out = np.empty(max(count - self._produced, 0))
+        k = np.arange(self._width)
+        for start in range(self._produced, count, RESAMPLE_BLOCK):
+            m = np.arange(start, min(start + RESAMPLE_BLOCK, count))
+            position = m * self.down + self._delay
+            newest = position // self.up - self._history_start
+            samples = self._history[newest[:, None] - k[None, :]]
+            out[start - self._produced:start - self._produced + len(m)] = np.einsum(
+                "ij,ij->i", samples, self._phases[position % self.up]
+            )
+        self._produced = max(count, self._produced)
+
+        # keep only what the next output still reaches back to
+        oldest = (self._produced * self.down + self._delay) // self.up - self._width + 1
+        drop = min(max(oldest - self._history_start, 0), len(self._history))
+        self._history = self._history[drop:]
+        self._history_start += drop
+        return out
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        self._history = np.concatenate((self._history, samples))
+        self._received += len(samples)
+        return self._run(self._available(self._received))
+
+    def flush(self) -> np.ndarray:
+        total = -(-self._received * self.up // self.down)
+        self._history = np.concatenate((self._history, np.zeros(self._delay // self.up + self._width)))
+        return self._run(total)
+
+
+def to_pcm16(samples: np.ndarray) -> bytes:
+    return np.clip(np.round(samples), -32768, 32767).astype("<i2").tobytes()
+
+
+class PCMConverter():
+    '''
+    Incremental 16-bit PCM (any rate, channel count, byte order) → 16 kHz
+    mono s16le. push() the bytes of an upload as they arrive, header
+    included, and forward what it returns. Audio that already is 16 kHz
+    mono little endian comes back unchanged.
+    '''
+
+    def __init__(self, fmt: AudioFormat):
+        self._skip = fmt.data_offset
+        self._remaining = fmt.data_bytes
+        self._channels = fmt.channels
+        self._dtype = ">i2" if fmt.big_endian else "<i2"
+        self._frame_bytes = BYTES_PER_SAMPLE * fmt.channels
+        self._resampler = Resampler(fmt.sample_rate) if fmt.sample_rate != SAMPLE_RATE else None
+        self.passthrough = self._resampler is None and fmt.channels == 1 and not fmt.big_endian
+        self._remainder = b""
+
+    def push(self, data: bytes) -> bytes:
+        if self._skip:
+            skipped = min(self._skip, len(data))
+            data = data[skipped:]
+            self._skip -= skipped
+        if self._remaining is not None:
+            data = data[:self._remaining] # chunks after the data chunk (e.g. LIST) are not audio
+            self._remaining -= len(data)
+        if self._remainder:
+            data = self._remainder + data
+        whole = len(data) - len(data) % self._frame_bytes
+        self._remainder = data[whole:]
+        if whole < len(data):
+            data = data[:whole]
+        if self.passthrough or not data:
+            return data
+
+        samples = np.frombuffer(data, dtype=self._dtype)
+        if self._channels > 1:
+            samples = samples.reshape(-1, self._channels).mean(axis=1)
+        if self._resampler is not None:
+            samples = self._resampler.process(samples.astype(np.float64))
+        return to_pcm16(samples)
+
+    def flush(self) -> bytes:
+        if self._resampler is None:
+            return b""
+        return to_pcm16(self._resampler.flush())
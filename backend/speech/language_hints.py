@@ -0,0 +1,123 @@
+import collections
+import time
+from typing import List, Optional, Sequence
+
+from backend.speech.recognition import RecognizedSegment
+
+
+class LanguageHintCache():
+    '''
+    Remembers which languages each user was recently recognized in, so their
+    next transcription can pick from one or two candidates instead of every
+    configured language.
+
+    Entries are keyed by user_principal_id, expire ttl_seconds after their
+    last update and the least recently used user is evicted beyond
+    max_users. A hint is only given once a user has min_samples detections
+    in their window, and it is dropped again when recognition with it comes
+    back with low confidence.
+    '''
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_users: int = 10000,
+        ttl_seconds: float = 604800.0,
+        max_languages: int = 2,
+        min_samples: int = 3,
+        min_confidence: float = 0.5,
+        window: int = 10,
+    ):
+        self.enabled = enabled
+        self._max_users = max_users
+        self._ttl_seconds = ttl_seconds
+        self._max_languages = max_languages
+        self._min_samples = min_samples
+        self._min_confidence = min_confidence
+        self._window = window
+        # user id → (recent detected languages, last update)
+        self._entries = collections.OrderedDict()
+        self.lookups = 0
+        self.hints_used = 0
+        self.single_language = 0
+        self.fallbacks = 0
+        self.evictions = 0
+
+    def lookup(self, user_id: Optional[str]) -> Optional[List[str]]:
+        '''The narrowed candidate list for this user, or None to use every language.'''
+        if not self.enabled or not user_id:
+            return None
+
+        self.lookups += 1
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+
+        detections, updated_at = entry
+        if time.monotonic() - updated_at > self._ttl_seconds:
+            del self._entries[user_id]
+            return None
+
+        self._entries.move_to_end(user_id)
+        if len(detections) < self._min_samples:
+            return None
+
+        counts = collections.Counter(detections)
+        hint = [language for language, _ in counts.most_common(self._max_languages)]
+        self.hints_used += 1
+        if len(hint) == 1:
+            self.single_language += 1
+        return hint
+
+    def record(
+        self,
+        user_id: Optional[str],
+        segments: Sequence[RecognizedSegment],
+        hint: Optional[Sequence[str]] = None,
+    ) -> None:
+        '''
+        Remember the languages detected in a transcription. With a single
+        fixed language the service does not report one, so the hint is used.
+        '''
+        if not self.enabled or not user_id:
+            return
+
+        fixed = hint[0] if hint and len(hint) == 1 else None
+        languages = {segment.language or fixed for segment in segments} - {None}
+        if not languages:
+            return
+
+        entry = self._entries.pop(user_id, None)
+        detections = entry[0] if entry else collections.deque(maxlen=self._window)
+        detections.extend(sorted(languages))
+        self._entries[user_id] = (detections, time.monotonic())
+        while len(self._entries) > self._max_users:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def is_confident(self, segments: Sequence[RecognizedSegment]) -> bool:
+        '''
+        Whether a result recognized with a hint can be trusted. Speech in a
+        language outside the hint comes back empty or with low confidence.
+        '''
+        if not segments:
+            return False
+        scores = [segment.confidence for segment in segments if segment.confidence is not None]
+        if not scores:
+            return True
+        return sum(scores) / len(scores) >= self._min_confidence
+
+    def reject(self, user_id: Optional[str]) -> None:
+        '''The hint did not fit, start over with the full language set.'''
+        self.fallbacks += 1
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._entries),
+            "lookups": self.lookups,
+            "hints_used": self.hints_used,
+            "single_language": self.single_language,
+            "fallbacks": self.fallbacks,
+            "evictions": self.evictions,
+        }
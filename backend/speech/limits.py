@@ -0,0 +1,72 @@
+from typing import AsyncIterable, AsyncIterator, Optional
+
+from backend.speech.decoders import AudioDecoder
+from backend.speech.vad import pcm_seconds
+
+
+class UploadTooLarge(Exception):
+    '''The upload, or the audio decoded from it, is over the configured limit.'''
+
+
+def check_content_length(content_length: Optional[int], max_bytes: int) -> None:
+    '''Reject an upload by its Content-Length before any of it is read. 0 disables the limit.'''
+    if max_bytes and content_length is not None and content_length > max_bytes:
+        raise UploadTooLarge(f"upload is larger than {max_bytes} bytes")
+
+
+async def limited(chunks: AsyncIterable[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    '''Pass chunks through unchanged and raise UploadTooLarge once more than max_bytes went by.'''
+    total = 0
+    async for chunk in chunks:
+        total += len(chunk)
+        if max_bytes and total > max_bytes:
+            raise UploadTooLarge(f"upload is larger than {max_bytes} bytes")
+        yield chunk
+
+
+class LimitedDecoder(AudioDecoder):
+    '''
+    Caps the duration of the decoded audio. Streaming stops forwarding PCM
+    at the limit and stops feeding the decoder, then raises UploadTooLarge;
+    a complete decode raises once it is done. 0 disables the limit.
+    '''
+
+    def __init__(self, decoder: AudioDecoder, max_seconds: float):
+        self._decoder = decoder
+        self._max_seconds = max_seconds
+
+    @property
+    def name(self) -> str:
+        return self._decoder.name
+
+    def _error(self) -> UploadTooLarge:
+        return UploadTooLarge(f"audio is longer than {self._max_seconds:g} seconds")
+
+    def decode(self, data: bytes) -> bytes:
+        pcm = self._decoder.decode(data)
+        if self._max_seconds and pcm_seconds(len(pcm)) > self._max_seconds:
+            raise self._error()
+        return pcm
+
+    async def stream(self, chunks, on_pcm) -> int:
+        if not self._max_seconds:
+            return await self._decoder.stream(chunks, on_pcm)
+
+        received = 0
+
+        def forward(pcm: bytes) -> None:
+            nonlocal received
+            received += len(pcm)
+            if pcm_seconds(received) <= self._max_seconds:
+                on_pcm(pcm)
+
+        async def fed() -> AsyncIterator[bytes]:
+            async for chunk in chunks:
+                if pcm_seconds(received) > self._max_seconds:
+                    raise self._error()
+                yield chunk
+
+        total = await self._decoder.stream(fed(), forward)
+        if pcm_seconds(received) > self._max_seconds:
+            raise self._error()
+        return total
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import threading
+import time
+from types import SimpleNamespace
+from typing import List, Optional, Sequence, Union
+
+import azure.cognitiveservices.speech as speechsdk
+
+from backend.speech.recognition import MemoryPCMCallback, PushRecognizer, RecognizerBackend
+from backend.speech.vad import BYTES_PER_SAMPLE, SAMPLE_RATE, pcm_seconds
+
+WORDS = (
+    "alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel",
+    "india", "juliett", "kilo", "lima", "mike", "november", "oscar", "papa",
+)
+
+# 100 ms of audio per processing step
+STEP_BYTES = SAMPLE_RATE // 10 * BYTES_PER_SAMPLE
+
+
+class _Signal():
+    def __init__(self):
+        self._callbacks = []
+
+    def connect(self, callback) -> None:
+        self._callbacks.append(callback)
+
+    def fire(self, evt) -> None:
+        for callback in self._callbacks:
+            callback(evt)
+
+
+class LocalAudioStream():
+    '''Thread-safe PCM buffer standing in for the SDK's push stream.'''
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._buffer = bytearray()
+        self._offset = 0
+        self._closed = False
+
+    def write(self, data: bytes) -> None:
+        with self._cond:
+            self._buffer.extend(data)
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def read(self, size: int, timeout: float) -> Optional[bytes]:
+        '''Up to size bytes, b"" at the end of the stream, None if nothing arrived within timeout.'''
+        with self._cond:
+            self._cond.wait_for(lambda: len(self._buffer) - self._offset >= size or self._closed, timeout)
+            chunk = bytes(self._buffer[self._offset:self._offset + size])
+            if not chunk and not self._closed:
+                return None
+            self._offset += len(chunk)
+            return chunk
+
+
+class PullCallbackStream():
+    '''
+    Reads a pull stream callback (e.g. MemoryPCMCallback) the way the SDK
+    does: into one reused buffer, closing the callback at the end.
+    '''
+
+    def __init__(self, callback: speechsdk.audio.PullAudioInputStreamCallback, buffer_size: int = STEP_BYTES):
+        self._callback = callback
+        self._buffer = memoryview(bytearray(buffer_size))
+
+    def read(self, size: int, timeout: float) -> memoryview:
+        read = self._callback.read(self._buffer[:size])
+        if not read:
+            self._callback.close()
+        return self._buffer[:read]
+
+
+class _ResultFuture():
+    '''Stands in for the SDK's ResultFuture: get() blocks until the recognition thread is done.'''
+
+    def __init__(self, thread: threading.Thread, results: list):
+        self._thread = thread
+        self._results = results
+
+    def get(self):
+        self._thread.join()
+        return self._results[0]
+
+
+class LocalRecognizer():
+    '''
+    Deterministic stand-in for a Speech SDK recognizer. It consumes audio at
+    rtf seconds of processing per second of audio, fires a partial result
+    every partial_seconds of audio, a final one every segment_seconds and at
+    the end of the stream. The text is derived from a hash of the audio, so
+    the same clip always gets the same transcript. stop_continuous_recognition
+    cancels it mid-stream; with fail_after_seconds it cancels itself with an
+    error, like the service does on failures.
+    '''
+
+    def __init__(
+        self,
+        stream: Union[LocalAudioStream, PullCallbackStream],
+        language: str,
+        connect_seconds: float = 0.15,
+        rtf: float = 0.1,
+        partial_seconds: float = 0.5,
+        segment_seconds: float = 5.0,
+        fail_after_seconds: Optional[float] = None,
+    ):
+        self.recognizing = _Signal()
+        self.recognized = _Signal()
+        self.session_stopped = _Signal()
+        self.canceled = _Signal()
+        self._stream = stream
+        self._language = language
+        self._connect_seconds = connect_seconds
+        self._rtf = rtf
+        self._partial_seconds = partial_seconds
+        self._segment_seconds = segment_seconds
+        self._fail_after_seconds = fail_after_seconds
+        self._connected = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def connect(self) -> None:
+        if not self._connected:
+            time.sleep(self._connect_seconds)
+            self._connected = True
+
+    def _result(self, reason, digest, seconds: float):
+        words = digest.digest()
+        count = max(1, round(seconds * 2.5))
+        text = " ".join(WORDS[words[i % len(words)] % len(WORDS)] for i in range(count))
+        return SimpleNamespace(result=SimpleNamespace(reason=reason, text=text, properties={
+            speechsdk.PropertyId.SpeechServiceConnection_AutoDetectSourceLanguageResult: self._language,
+            speechsdk.PropertyId.SpeechServiceResponse_JsonResult: json.dumps({"NBest": [{"Confidence": 0.9}]}),
+        }))
+
+    def _run(self) -> None:
+        self.connect()
+        digest = hashlib.sha256()
+        processed = 0
+        segment = 0
+        since_partial = 0
+        while not self._stop.is_set():
+            chunk = self._stream.read(STEP_BYTES, timeout=0.05)
+            if chunk is None:
+                continue
+            if not chunk:
+                break
+
+            time.sleep(pcm_seconds(len(chunk)) * self._rtf)
+            digest.update(chunk)
+            processed += len(chunk)
+            segment += len(chunk)
+            since_partial += len(chunk)
+
+            if self._fail_after_seconds is not None and pcm_seconds(processed) >= self._fail_after_seconds:
+                self.canceled.fire(SimpleNamespace(cancellation_details=SimpleNamespace(
+                    reason=speechsdk.CancellationReason.Error, error_details="simulated service error"
+                )))
+                return
+
+            if pcm_seconds(segment) >= self._segment_seconds:
+                self.recognized.fire(self._result(speechsdk.ResultReason.RecognizedSpeech, digest, pcm_seconds(segment)))
+                digest = hashlib.sha256()
+                segment = since_partial = 0
+            elif pcm_seconds(since_partial) >= self._partial_seconds:
+                self.recognizing.fire(self._result(speechsdk.ResultReason.RecognizingSpeech, digest, pcm_seconds(segment)))
+                since_partial = 0
+
+        if segment and not self._stop.is_set():
+            self.recognized.fire(self._result(speechsdk.ResultReason.RecognizedSpeech, digest, pcm_seconds(segment)))
+        self.session_stopped.fire(SimpleNamespace())
+
+    def _recognize_once(self):
+        self.connect()
+        digest = hashlib.sha256()
+        processed = 0
+        while True:
+            chunk = self._stream.read(STEP_BYTES, timeout=0.05)
+            if chunk is None:
+                continue
+            if not chunk:
+                break
+            time.sleep(pcm_seconds(len(chunk)) * self._rtf)
+            digest.update(chunk)
+            processed += len(chunk)
+        reason = speechsdk.ResultReason.RecognizedSpeech if processed else speechsdk.ResultReason.NoMatch
+        return self._result(reason, digest, pcm_seconds(processed)).result
+
+    def recognize_once_async(self) -> _ResultFuture:
+        '''
+        Single-shot: the whole stream as one result, no partials. Like the
+        SDK it returns right away and fires recognized and session_stopped
+        when the result is in.
+        '''
+        results = []
+
+        def run():
+            results.append(self._recognize_once())
+            self.recognized.fire(SimpleNamespace(result=results[0]))
+            self.session_stopped.fire(SimpleNamespace())
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return _ResultFuture(thread, results)
+
+    def start_continuous_recognition(self) -> None:
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop_continuous_recognition(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+class LocalRecognizerBackend(RecognizerBackend):
+    '''
+    Recognizer backend that never leaves the process, for load tests and
+    benchmarks of our own decode, queueing and pooling path. Recognized
+    text is placeholder words; the language is the first candidate.
+    '''
+    name = "local"
+
+    def __init__(self, languages: Sequence[str], **recognizer_options):
+        self.languages: List[str] = list(languages)
+        self._options = recognizer_options
+
+    def _recognizer(self, stream: Union[LocalAudioStream, PullCallbackStream], languages: Optional[Sequence[str]]) -> LocalRecognizer:
+        return LocalRecognizer(stream, (languages or self.languages)[0], **self._options)
+
+    def create_push(self, preconnect: bool = False, languages: Optional[Sequence[str]] = None) -> PushRecognizer:
+        stream = LocalAudioStream()
+        recognizer = self._recognizer(stream, languages)
+        if preconnect:
+            recognizer.connect()
+        return PushRecognizer(push_stream=stream, recognizer=recognizer)
+
+    def create_pull(self, pcm_bytes: bytes, languages: Optional[Sequence[str]] = None) -> LocalRecognizer:
+        return self._recognizer(PullCallbackStream(MemoryPCMCallback(pcm_bytes)), languages)
+
+    def create_once(self, pcm_bytes: bytes, languages: Optional[Sequence[str]] = None) -> LocalRecognizer:
+        return self.create_pull(pcm_bytes, languages)
@@ -0,0 +1,137 @@
+import bisect
+import collections
+import contextlib
+import time
+from typing import AsyncIterable, AsyncIterator, Dict, Optional, Sequence
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+AUDIO_BUCKETS = (1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+RTF_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+
+
+class RequestTimer():
+    '''
+    Per-request stage timings. mark() records when something first happened,
+    relative to the start of the request; start()/stop() and measure()
+    record how long a stage took.
+    '''
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.marks: Dict[str, float] = {}
+        self.durations: Dict[str, float] = {}
+        self._running: Dict[str, float] = {}
+
+    def mark(self, name: str) -> None:
+        self.marks.setdefault(name, time.monotonic() - self.started)
+
+    def start(self, name: str) -> None:
+        self._running.setdefault(name, time.monotonic())
+
+    def stop(self, name: str) -> None:
+        if name in self._running:
+            self.durations[name] = time.monotonic() - self._running.pop(name)
+
+    @contextlib.contextmanager
+    def measure(self, name: str):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    def report(self, audio_seconds: float) -> Dict[str, float]:
+        total = time.monotonic() - self.started
+        report = {
+            "body_read_seconds": self.marks.get("body_read"),
+            "decode_seconds": self.durations.get("decode"),
+            "audio_seconds": audio_seconds,
+            "first_segment_seconds": self.marks.get("first_segment"),
+            "recognition_seconds": self.durations.get("recognition"),
+            "total_seconds": total,
+            # processing time per second of audio, below 1 is faster than real time
+            "rtf": total / audio_seconds if audio_seconds > 0 else None,
+        }
+        return {name: round(value, 3) for name, value in report.items() if value is not None}
+
+
+async def timed(chunks: AsyncIterable[bytes], timer: RequestTimer, name: str = "body_read") -> AsyncIterator[bytes]:
+    '''Pass chunks through unchanged and mark name once the last one went by.'''
+    async for chunk in chunks:
+        yield chunk
+    timer.mark(name)
+
+
+class Histogram():
+    '''
+    Cumulative bucket counts over all observations, plus percentiles over
+    the most recent window of values.
+    '''
+
+    def __init__(self, buckets: Sequence[float], window: int = 1024):
+        self._bounds = list(buckets)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._recent = collections.deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self._bounds, value)] += 1
+        self._recent.append(value)
+        self.count += 1
+        self.sum += value
+
+    def _percentile(self, values, q: float) -> float:
+        return values[min(int(q * len(values)), len(values) - 1)]
+
+    def snapshot(self) -> dict:
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self._bounds + ["+Inf"], self._counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+
+        snapshot = {"count": self.count, "sum": round(self.sum, 3), "buckets": buckets}
+        if self._recent:
+            values = sorted(self._recent)
+            snapshot.update({
+                "p50": round(self._percentile(values, 0.50), 3),
+                "p90": round(self._percentile(values, 0.90), 3),
+                "p99": round(self._percentile(values, 0.99), 3),
+            })
+        return snapshot
+
+
+class TranscriptionMetrics():
+    '''
+    Aggregates RequestTimer reports of a worker into one histogram per stage,
+    plus the total latency per recognition strategy.
+    '''
+
+    def __init__(self):
+        self.histograms = {
+            "body_read_seconds": Histogram(LATENCY_BUCKETS),
+            "decode_seconds": Histogram(LATENCY_BUCKETS),
+            "audio_seconds": Histogram(AUDIO_BUCKETS),
+            "first_segment_seconds": Histogram(LATENCY_BUCKETS),
+            "recognition_seconds": Histogram(LATENCY_BUCKETS),
+            "total_seconds": Histogram(LATENCY_BUCKETS),
+            "rtf": Histogram(RTF_BUCKETS),
+        }
+        self.total_by_strategy: Dict[str, Histogram] = {}
+
+    def observe(self, report: Dict[str, float], strategy: Optional[str] = None) -> None:
+        for name, value in report.items():
+            histogram = self.histograms.get(name)
+            if histogram is not None:
+                histogram.observe(value)
+        if strategy and "total_seconds" in report:
+            histogram = self.total_by_strategy.setdefault(strategy, Histogram(LATENCY_BUCKETS))
+            histogram.observe(report["total_seconds"])
+
+    def stats(self) -> dict:
+        stats = {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+        stats["total_seconds_by_strategy"] = {
+            strategy: histogram.snapshot() for strategy, histogram in self.total_by_strategy.items()
+        }
+        return stats
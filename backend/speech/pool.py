@@ -0,0 +1,85 @@
+import asyncio
+import collections
+import logging
+import time
+from concurrent.futures import Executor
+from typing import Callable, Optional
+
+
+class RecognizerPool():
+    '''
+    Keeps a few pre-connected recognizers warm so connection setup and the TLS
+    handshake happen off the request path.
+
+    A recognizer is bound to its audio stream, so pooled entries are single
+    use: acquire() hands one out and a background task builds a replacement.
+    When the pool is empty a recognizer is built on demand (a miss).
+    '''
+
+    def __init__(
+        self,
+        build: Callable[[bool], object],
+        size: int,
+        executor: Optional[Executor] = None,
+        max_idle_seconds: float = 240.0,
+    ):
+        self._build = build
+        self._size = size
+        self._executor = executor
+        self._max_idle_seconds = max_idle_seconds
+        self._idle = collections.deque()
+        self._refill = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    async def start(self) -> None:
+        self._schedule_refill()
+
+    async def acquire(self):
+        while self._idle:
+            entry = self._idle.popleft()
+            if time.monotonic() - entry.created_at > self._max_idle_seconds:
+                # the service drops idle connections, don't hand out a stale one
+                self.expired += 1
+                entry.close()
+                continue
+
+            self.hits += 1
+            self._schedule_refill()
+            return entry
+
+        self.misses += 1
+        self._schedule_refill()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._build, False)
+
+    def _schedule_refill(self) -> None:
+        if self._size > 0 and (self._refill is None or self._refill.done()):
+            self._refill = asyncio.ensure_future(self._fill())
+
+    async def _fill(self) -> None:
+        loop = asyncio.get_running_loop()
+        while len(self._idle) < self._size:
+            try:
+                entry = await loop.run_in_executor(self._executor, self._build, True)
+            except Exception:
+                logging.exception("Failed to pre-connect a speech recognizer")
+                return
+            self._idle.append(entry)
+
+    def stats(self) -> dict:
+        return {
+            "size": self._size,
+            "idle": len(self._idle),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+        }
+
+    async def close(self) -> None:
+        if self._refill is not None:
+            self._refill.cancel()
+            await asyncio.gather(self._refill, return_exceptions=True)
+        while self._idle:
+            self._idle.popleft().close()
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import azure.cognitiveservices.speech as speechsdk
+
+# at-start language identification, the only kind single-shot recognition has, takes at most 4 candidates
+MAX_AT_START_LANGUAGES = 4
+# longer than any pause VAD leaves in, so a single-shot clip is not cut at a pause
+SINGLE_SHOT_SILENCE_TIMEOUT_MS = 3000
+
+
+# the SDK will call our methods whenever it needs more audio samples
+class MemoryPCMCallback(speechsdk.audio.PullAudioInputStreamCallback):
+    '''
+    Pull stream over PCM that is already in memory (bytes or bytearray).
+    Reads go through a memoryview and are copied straight into the SDK's
+    buffer, so no intermediate chunk is allocated per read.
+    '''
+    def __init__(self, pcm_bytes: bytes):
+        super().__init__()
+        self._view = memoryview(pcm_bytes)
+        self._offset = 0
+    def read(self, buffer: memoryview) -> int:
+        size = min(buffer.nbytes, len(self._view) - self._offset)
+        if size <= 0:
+            return 0    #end of stream
+        buffer[:size] = self._view[self._offset:self._offset + size] #fill SDK's buffer
+        self._offset += size
+        return size
+    def close(self) -> None:
+        self._offset = len(self._view) #when the SDK is done with the stream, it calls close()
+        super().close()
+
+
+def pcm_format() -> speechsdk.audio.AudioStreamFormat:
+    return speechsdk.audio.AudioStreamFormat(
+        samples_per_second=16000,
+        bits_per_sample=16,
+        channels=1
+        )
+
+
+@dataclass
+class RecognizedSegment:
+    '''A final recognition result with the detected language and the service's confidence, when known.'''
+    text: str
+    language: Optional[str] = None
+    confidence: Optional[float] = None
+
+
+def segments_text(segments: Sequence[RecognizedSegment]) -> str:
+    return " ".join(segment.text for segment in segments).strip()
+
+
+@dataclass
+class PushRecognizer:
+    '''A recognizer wired to its own push stream, optionally pre-connected.'''
+    push_stream: speechsdk.audio.PushAudioInputStream
+    recognizer: speechsdk.SpeechRecognizer
+    connection: Optional[speechsdk.Connection] = None
+    created_at: float = field(default_factory=time.monotonic)
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+
+
+class RecognizerBackend(ABC):
+    '''
+    Builds recognizers for 16 kHz mono s16le PCM. A recognizer exposes the
+    Speech SDK's event signals (recognizing, recognized, session_stopped,
+    canceled) and start/stop_continuous_recognition, so recognize_continuous
+    drives every backend the same way.
+    '''
+    name = ""
+
+    @abstractmethod
+    def create_push(self, preconnect: bool = False, languages: Optional[Sequence[str]] = None) -> PushRecognizer:
+        '''Blocking: a recognizer fed through its own push stream.'''
+        pass
+
+    @abstractmethod
+    def create_pull(self, pcm_bytes: bytes, languages: Optional[Sequence[str]] = None):
+        '''Blocking: a recognizer reading a complete PCM buffer.'''
+        pass
+
+    @abstractmethod
+    def create_once(self, pcm_bytes: bytes, languages: Optional[Sequence[str]] = None):
+        '''Blocking: a recognizer for single-shot recognition of a short, complete PCM buffer.'''
+        pass
+
+    def supports_single_shot(self, languages: Optional[Sequence[str]] = None) -> bool:
+        '''Single-shot recognition only identifies the language at the start, among at most MAX_AT_START_LANGUAGES.'''
+        return len(languages or self.languages) <= MAX_AT_START_LANGUAGES
+
+
+class SpeechRecognizerFactory(RecognizerBackend):
+    '''
+    Holds the Speech objects that never change for a worker (speech config,
+    language detection config, audio format), so they are built once at
+    startup instead of on every request. Narrowed candidate lists get their
+    own language configs, built on first use and kept for the worker's life.
+    '''
+    name = "azure"
+
+    def __init__(self, speech_settings):
+        self.speech_config = speechsdk.SpeechConfig(
+            subscription=speech_settings.key, region=speech_settings.region
+        )
+        #enable Continuous LID mode
+        self.speech_config.set_property(
+            property_id=speechsdk.PropertyId.SpeechServiceConnection_LanguageIdMode, value='Continuous' #without it we won't be able to add 10 langs
+            )
+        #detailed results carry the NBest confidence scores
+        self.speech_config.output_format = speechsdk.OutputFormat.Detailed
+        #single-shot recognition identifies the language at the start, and must not end the clip at its first pause
+        self.once_config = speechsdk.SpeechConfig(
+            subscription=speech_settings.key, region=speech_settings.region
+        )
+        self.once_config.output_format = speechsdk.OutputFormat.Detailed
+        self.once_config.set_property(
+            property_id=speechsdk.PropertyId.Speech_SegmentationSilenceTimeoutMs, value=str(SINGLE_SHOT_SILENCE_TIMEOUT_MS)
+        )
+        self.languages = list(speech_settings.languages)
+        self.auto_lang = speechsdk.languageconfig.AutoDetectSourceLanguageConfig(self.languages)
+        self._narrowed: Dict[Tuple[str, ...], object] = {}
+        self.audio_format = pcm_format()
+
+    def _language_config(self, languages: Optional[Sequence[str]]) -> dict:
+        if not languages:
+            return {"auto_detect_source_language_config": self.auto_lang}
+
+        key = tuple(languages)
+        config = self._narrowed.get(key)
+        if config is None:
+            if len(key) == 1:
+                #a single candidate needs no language identification at all
+                config = speechsdk.languageconfig.SourceLanguageConfig(key[0])
+            else:
+                config = speechsdk.languageconfig.AutoDetectSourceLanguageConfig(list(key))
+            self._narrowed[key] = config
+
+        if len(key) == 1:
+            return {"source_language_config": config}
+        return {"auto_detect_source_language_config": config}
+
+    def create(self, stream, languages: Optional[Sequence[str]] = None, speech_config=None) -> speechsdk.SpeechRecognizer:
+        '''languages narrows the candidate list, None uses every configured language.'''
+        audio_cfg = speechsdk.audio.AudioConfig(stream=stream) # we package the stream into an AudioConfig, which is how the Speech SDK learns where to get its audio from
+
+        return speechsdk.SpeechRecognizer(
+            speech_config=speech_config or self.speech_config,
+            audio_config=audio_cfg,
+            **self._language_config(languages)
+        )
+
+    def create_push(self, preconnect: bool = False, languages: Optional[Sequence[str]] = None) -> PushRecognizer:
+        '''
+        Blocking: with preconnect the service connection (and its TLS
+        handshake) is opened right away, before any audio is available.
+        '''
+        push_stream = speechsdk.audio.PushAudioInputStream(self.audio_format)
+        recognizer = self.create(push_stream, languages)
+        connection = None
+        if preconnect:
+            connection = speechsdk.Connection.from_recognizer(recognizer)
+            connection.open(True)
+        return PushRecognizer(push_stream=push_stream, recognizer=recognizer, connection=connection)
+
+    def create_pull(self, pcm_bytes: bytes, languages: Optional[Sequence[str]] = None) -> speechsdk.SpeechRecognizer:
+        pull_cb    = MemoryPCMCallback(pcm_bytes) #instance of callback class
+        pull_stream= speechsdk.audio.PullAudioInputStream(pull_cb, self.audio_format) #it will call pull_cb.read() to fetch exactly the right number of bytes whenever the recognizer asks for audio
+        return self.create(pull_stream, languages)
+
+    def create_once(self, pcm_bytes: bytes, languages: Optional[Sequence[str]] = None) -> speechsdk.SpeechRecognizer:
+        pull_stream = speechsdk.audio.PullAudioInputStream(MemoryPCMCallback(pcm_bytes), self.audio_format)
+        return self.create(pull_stream, languages, self.once_config)
+
+
+def _segment(result) -> RecognizedSegment:
+    language = None
+    confidence = None
+    properties = getattr(result, "properties", None)
+    if properties is not None:
+        language = properties.get(speechsdk.PropertyId.SpeechServiceConnection_AutoDetectSourceLanguageResult) or None
+        try:
+            confidence = float(json.loads(properties.get(speechsdk.PropertyId.SpeechServiceResponse_JsonResult))["NBest"][0]["Confidence"])
+        except (TypeError, ValueError, KeyError, IndexError):
+            pass
+    return RecognizedSegment(text=result.text, language=language, confidence=confidence)
+
+
+def _resolve(future: asyncio.Future, result=None) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+async def recognize_continuous(
+    recognizer,
+    executor: Optional[Executor] = None,
+    on_recognizing: Optional[Callable[[str], None]] = None,
+    on_recognized: Optional[Callable[[str], None]] = None,
+) -> List[RecognizedSegment]:
+    '''
+    Run continuous recognition without blocking the event loop.
+
+    The SDK fires its events on its own threads, so every callback hops back
+    onto the loop with call_soon_threadsafe. The blocking start/stop calls run
+    on the given executor. on_recognizing and on_recognized, when given, are
+    called on the loop with interim and final text. Returns the recognized
+    segments, with their detected language and confidence, in order.
+    '''
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    segments = []
+
+    def add_segment(segment):
+        segments.append(segment)
+        if on_recognized is not None:
+            on_recognized(segment.text)
+
+    def on_rec(evt):
+        if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech:
+            loop.call_soon_threadsafe(add_segment, _segment(evt.result))
+
+    def on_partial(evt):
+        if evt.result.reason == speechsdk.ResultReason.RecognizingSpeech:
+            loop.call_soon_threadsafe(on_recognizing, evt.result.text)
+
+    def on_canceled(evt):
+        details = getattr(evt, "cancellation_details", None)
+        if details is not None and details.reason == speechsdk.CancellationReason.Error:
+            logging.error(f"Speech recognition canceled: {details.error_details}")
+        loop.call_soon_threadsafe(_resolve, done)
+
+    def on_stop(evt):
+        loop.call_soon_threadsafe(_resolve, done)
+
+    recognizer.recognized.connect(on_rec)
+    if on_recognizing is not None:
+        recognizer.recognizing.connect(on_partial)
+    recognizer.session_stopped.connect(on_stop)
+    recognizer.canceled.connect(on_canceled)
+
+    await loop.run_in_executor(executor, recognizer.start_continuous_recognition)
+    try:
+        await done
+    finally:
+        # also runs when the client goes away and the handler is cancelled
+        await asyncio.shield(
+            loop.run_in_executor(executor, recognizer.stop_continuous_recognition)
+        )
+
+    return segments
+
+
+async def recognize_once(recognizer) -> List[RecognizedSegment]:
+    '''
+    Single-shot recognition of one utterance, for short clips: no session
+    to start and stop, the result comes back as soon as the service has
+    it. Like recognize_continuous, the result arrives through the SDK's
+    events, which hop back onto the loop, so no thread waits on the
+    service.
+    '''
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+
+    def on_rec(evt):
+        loop.call_soon_threadsafe(_resolve, done, evt.result)
+
+    def on_canceled(evt):
+        details = getattr(evt, "cancellation_details", None)
+        if details is not None and details.reason == speechsdk.CancellationReason.Error:
+            logging.error(f"Speech recognition canceled: {details.error_details}")
+        loop.call_soon_threadsafe(_resolve, done)
+
+    def on_stop(evt):
+        loop.call_soon_threadsafe(_resolve, done)
+
+    recognizer.recognized.connect(on_rec)
+    recognizer.canceled.connect(on_canceled)
+    recognizer.session_stopped.connect(on_stop)
+
+    # the SDK's ResultFuture is never waited on, it only has to live until the result is in
+    pending = recognizer.recognize_once_async()
+    result = await done
+    if result is not None and result.reason == speechsdk.ResultReason.RecognizedSpeech:
+        return [_segment(result)]
+    return []
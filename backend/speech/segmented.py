@@ -0,0 +1,210 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from backend.speech.metrics import RequestTimer
+from backend.speech.recognition import PushRecognizer, RecognizedSegment, recognize_continuous
+from backend.speech.vad import BYTES_PER_SAMPLE, SAMPLE_RATE, classify_frames
+
+# (segment index, PCM, whether it is the last piece of that segment)
+SegmentPiece = Tuple[int, bytes, bool]
+
+
+class PCMSegmenter():
+    '''
+    Splits 16 kHz mono s16le PCM into segments of at most max_segment_seconds,
+    cutting in the middle of the longest pause found in the last
+    lookback_seconds before the limit (or hard at the limit when there is
+    none). PCM is handed out as soon as it cannot be part of a cut decision,
+    so audio shorter than max_segment_seconds - lookback_seconds passes
+    through without any delay.
+    '''
+
+    def __init__(
+        self,
+        max_segment_seconds: float = 30.0,
+        lookback_seconds: float = 5.0,
+        threshold_dbfs: float = -45.0,
+        frame_ms: int = 30,
+    ):
+        self._frame_bytes = SAMPLE_RATE * frame_ms // 1000 * BYTES_PER_SAMPLE
+        max_frames = max(int(max_segment_seconds * 1000) // frame_ms, 2)
+        lookback_frames = min(max(int(lookback_seconds * 1000) // frame_ms, 1), max_frames // 2)
+        self._max_bytes = max_frames * self._frame_bytes
+        self._lookback_bytes = lookback_frames * self._frame_bytes
+        self._threshold_dbfs = threshold_dbfs
+        self._index = 0
+        self._segment_bytes = 0
+        self._held = bytearray()
+
+    def _find_cut(self, window: bytes) -> int:
+        samples = np.frombuffer(window[:len(window) - len(window) % self._frame_bytes], dtype="<i2")
+        silent = ~classify_frames(samples, self._frame_bytes // BYTES_PER_SAMPLE, self._threshold_dbfs)
+        if not silent.any():
+            return len(window)
+
+        edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        lengths = np.flatnonzero(edges == -1) - starts
+        longest = np.argmax(lengths)
+        return int(starts[longest] + lengths[longest] // 2) * self._frame_bytes
+
+    def push(self, pcm: bytes) -> List[SegmentPiece]:
+        pieces = []
+        if self._held:
+            # appended in place, so the lookback window is not copied again for every frame
+            self._held += pcm
+            data = self._held
+        else:
+            data = pcm
+        view = memoryview(data)
+        offset = 0
+        while offset < len(view):
+            free = self._max_bytes - self._lookback_bytes - self._segment_bytes
+            if free > 0:
+                end = min(offset + free, len(view))
+                # push streams only take bytes: a frame that fits whole is passed on as is
+                piece = data if offset == 0 and end == len(view) and isinstance(data, bytes) else view[offset:end].tobytes()
+                pieces.append((self._index, piece, False))
+                self._segment_bytes += end - offset
+                offset = end
+                continue
+
+            # inside the lookback window: hold the audio until the segment is full
+            window_bytes = self._max_bytes - self._segment_bytes
+            if len(view) - offset < window_bytes:
+                break
+            cut = offset + self._find_cut(view[offset:offset + window_bytes])
+            pieces.append((self._index, view[offset:cut].tobytes(), True))
+            offset = cut
+            self._index += 1
+            self._segment_bytes = 0
+
+        rest = view[offset:]
+        if not rest:
+            held = bytearray()
+        elif offset == 0 and data is self._held:
+            held = self._held
+        else:
+            held = bytearray(rest)
+        rest.release()
+        view.release()
+        self._held = held
+        return pieces
+
+    def flush(self) -> List[SegmentPiece]:
+        held, self._held = self._held, bytearray()
+        if not held and not self._segment_bytes:
+            return []
+        self._segment_bytes = 0
+        return [(self._index, bytes(held), True)]
+
+
+def split_at_silence(pcm: bytes, **segmenter_options) -> List[bytes]:
+    segments = []
+    segmenter = PCMSegmenter(**segmenter_options)
+    for index, piece, _ in segmenter.push(pcm) + segmenter.flush():
+        if index == len(segments):
+            segments.append([])
+        segments[index].append(piece)
+    return [b"".join(pieces) for pieces in segments]
+
+
+class SegmentedRecognition():
+    '''
+    Recognizes the segments produced by a PCMSegmenter concurrently, each on
+    its own recognizer from acquire(), and returns the recognized text in
+    segment order.
+
+    At most max_parallel segments of a request are recognized at once.
+    Every segment after the first also takes one of the worker-wide
+    worker_slots, so a long recording cannot take all recognizers away from
+    short ones: the first segment of a request never waits on them. A timer
+    records the recognition stage and the time to the first segment.
+    '''
+
+    def __init__(
+        self,
+        acquire: Callable[[], Awaitable[PushRecognizer]],
+        executor: Optional[Executor] = None,
+        max_parallel: int = 4,
+        worker_slots: Optional[asyncio.Semaphore] = None,
+        timer: Optional[RequestTimer] = None,
+    ):
+        self._acquire = acquire
+        self._timer = timer
+        self._executor = executor
+        self._request_slots = asyncio.Semaphore(max(max_parallel, 1))
+        self._worker_slots = worker_slots
+        self._pieces: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def segments(self) -> int:
+        return len(self._tasks)
+
+    def feed(self, index: int, piece: bytes, last: bool) -> None:
+        if index == len(self._tasks):
+            self._pieces.append(asyncio.Queue())
+            self._tasks.append(asyncio.ensure_future(self._run(index, self._pieces[index])))
+        if piece:
+            self._pieces[index].put_nowait(piece)
+        if last:
+            self._pieces[index].put_nowait(None)
+
+    async def _run(self, index: int, pieces: asyncio.Queue) -> List[RecognizedSegment]:
+        async with self._request_slots:
+            if index == 0 or self._worker_slots is None:
+                return await self._recognize(pieces)
+            async with self._worker_slots:
+                return await self._recognize(pieces)
+
+    async def _recognize(self, pieces: asyncio.Queue) -> List[RecognizedSegment]:
+        pooled = await self._acquire()
+        recognition = None
+        try:
+            try:
+                while True:
+                    piece = await pieces.get()
+                    if piece is None:
+                        break
+                    pooled.push_stream.write(piece)
+                    if recognition is None:
+                        if self._timer:
+                            self._timer.start("recognition")
+                        recognition = asyncio.ensure_future(recognize_continuous(
+                            pooled.recognizer, self._executor, on_recognized=self._recognized
+                        ))
+            finally:
+                pooled.push_stream.close()
+            if recognition is None:
+                return []
+            return await recognition
+        except BaseException:
+            if recognition is not None:
+                recognition.cancel()
+                await asyncio.gather(recognition, return_exceptions=True)
+            raise
+        finally:
+            pooled.close()
+
+    def _recognized(self, text: str) -> None:
+        if self._timer:
+            self._timer.mark("first_segment")
+
+    async def result(self) -> List[RecognizedSegment]:
+        try:
+            results = await asyncio.gather(*self._tasks)
+        except BaseException:
+            await self.cancel()
+            raise
+        if self._timer:
+            self._timer.stop("recognition")
+        return [segment for segments in results for segment in segments]
+
+    async def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
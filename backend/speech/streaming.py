@@ -0,0 +1,201 @@
+import asyncio
+import contextlib
+import logging
+from concurrent.futures import Executor
+from typing import AsyncIterable, AsyncIterator, Callable, List, Optional, Tuple
+
+from backend.speech.decoders import AudioDecoder, FFmpegSubprocessDecoder
+from backend.speech.metrics import RequestTimer
+from backend.speech.recognition import RecognizedSegment, recognize_continuous
+from backend.speech.segmented import PCMSegmenter, SegmentedRecognition
+from backend.speech.vad import BYTES_PER_SAMPLE, SAMPLE_RATE, SilenceTrimmer
+
+
+async def decode_and_recognize(
+    chunks: AsyncIterable[bytes],
+    push_stream,
+    recognizer,
+    executor: Optional[Executor] = None,
+    decoder: Optional[AudioDecoder] = None,
+    on_recognizing: Optional[Callable[[str], None]] = None,
+    on_recognized: Optional[Callable[[str], None]] = None,
+    trimmer: Optional[SilenceTrimmer] = None,
+    sent_audio: Optional[bytearray] = None,
+    timer: Optional[RequestTimer] = None,
+    decode_stage: str = "decode",
+) -> List[RecognizedSegment]:
+    '''
+    Pipelined transcription: PCM frames go into the push stream while the
+    decoder is still working, and recognition starts on the first decoded frame, so
+    decode and recognition overlap instead of running one after the other.
+    The callbacks are passed through to recognize_continuous. With a trimmer,
+    silence is stripped before the audio reaches the push stream. sent_audio,
+    when given, collects a copy of everything written to the push stream so
+    the audio can be recognized again. A timer records the decode and
+    recognition stages and the time to the first recognized segment;
+    decode_stage renames the former when the chunks are PCM handed over
+    from a decode that is timed already (see decode_short_clip).
+    '''
+    decoder = decoder or FFmpegSubprocessDecoder()
+    recognition = None
+
+    def recognized(text: str) -> None:
+        if timer:
+            timer.mark("first_segment")
+        if on_recognized is not None:
+            on_recognized(text)
+
+    def forward(frame: bytes) -> None:
+        nonlocal recognition
+        if not frame:
+            return
+        push_stream.write(frame)
+        if sent_audio is not None:
+            sent_audio.extend(frame)
+        if recognition is None:
+            if timer:
+                timer.start("recognition")
+            recognition = asyncio.ensure_future(recognize_continuous(
+                recognizer, executor, on_recognizing=on_recognizing, on_recognized=recognized
+            ))
+
+    def on_pcm(frame: bytes) -> None:
+        forward(trimmer.push(frame) if trimmer else frame)
+
+    try:
+        with timer.measure(decode_stage) if timer else contextlib.nullcontext():
+            await decoder.stream(chunks, on_pcm)
+        if trimmer:
+            forward(trimmer.flush())
+    except BaseException:
+        if recognition is not None:
+            recognition.cancel()
+            await asyncio.gather(recognition, return_exceptions=True)
+        raise
+    finally:
+        push_stream.close() #end of stream, the recognizer stops once it has consumed everything
+
+    if recognition is None:
+        logging.warning("No audio to recognize, skipping recognition")
+        return []
+
+    segments = await recognition
+    if timer:
+        timer.stop("recognition")
+    return segments
+
+
+async def decode_and_recognize_segmented(
+    chunks: AsyncIterable[bytes],
+    recognition: SegmentedRecognition,
+    segmenter: PCMSegmenter,
+    decoder: Optional[AudioDecoder] = None,
+    trimmer: Optional[SilenceTrimmer] = None,
+    sent_audio: Optional[bytearray] = None,
+    timer: Optional[RequestTimer] = None,
+    decode_stage: str = "decode",
+) -> List[RecognizedSegment]:
+    '''
+    Like decode_and_recognize, but the decoded PCM is split at pauses into
+    bounded segments that are recognized concurrently, so long recordings
+    do not go through one long recognition session. Each segment starts
+    recognizing as soon as its first PCM arrives.
+    '''
+    decoder = decoder or FFmpegSubprocessDecoder()
+
+    def forward(frame: bytes) -> None:
+        if not frame:
+            return
+        if sent_audio is not None:
+            sent_audio.extend(frame)
+        for piece in segmenter.push(frame):
+            recognition.feed(*piece)
+
+    def on_pcm(frame: bytes) -> None:
+        forward(trimmer.push(frame) if trimmer else frame)
+
+    try:
+        with timer.measure(decode_stage) if timer else contextlib.nullcontext():
+            await decoder.stream(chunks, on_pcm)
+        if trimmer:
+            forward(trimmer.flush())
+        for piece in segmenter.flush():
+            recognition.feed(*piece)
+    except BaseException:
+        await recognition.cancel()
+        raise
+
+    if not recognition.segments:
+        logging.warning("No audio to recognize, skipping recognition")
+        return []
+
+    return await recognition.result()
+
+
+async def decode_short_clip(
+    chunks: AsyncIterable[bytes],
+    decoder: AudioDecoder,
+    max_seconds: float,
+    trimmer: Optional[SilenceTrimmer] = None,
+    timer: Optional[RequestTimer] = None,
+) -> Tuple[Optional[bytes], Optional[AsyncIterator[bytes]]]:
+    '''
+    Decode an upload until it turns out to be short or long. A clip whose
+    (trimmed) PCM ends within max_seconds comes back whole as (pcm, None),
+    ready for single-shot recognition. Otherwise (None, frames): frames
+    yields the PCM held so far and then the rest as it is decoded, to go on
+    with streaming recognition without waiting for the end of the upload.
+    '''
+    max_bytes = int(max_seconds * SAMPLE_RATE) * BYTES_PER_SAMPLE
+    held = bytearray()
+    queue: Optional[asyncio.Queue] = None
+    long_clip = asyncio.get_running_loop().create_future()
+
+    def forward(frame: bytes) -> None:
+        nonlocal queue
+        if not frame:
+            return
+        if queue is not None:
+            queue.put_nowait(frame)
+            return
+        held.extend(frame)
+        if len(held) > max_bytes:
+            queue = asyncio.Queue()
+            queue.put_nowait(bytes(held))
+            held.clear()
+            long_clip.set_result(True)
+
+    def on_pcm(frame: bytes) -> None:
+        forward(trimmer.push(frame) if trimmer else frame)
+
+    async def decode() -> None:
+        try:
+            with timer.measure("decode") if timer else contextlib.nullcontext():
+                await decoder.stream(chunks, on_pcm)
+            if trimmer:
+                forward(trimmer.flush())
+        finally:
+            if queue is not None:
+                queue.put_nowait(None)
+
+    decoding = asyncio.ensure_future(decode())
+    try:
+        await asyncio.wait({decoding, long_clip}, return_when=asyncio.FIRST_COMPLETED)
+    except BaseException:
+        decoding.cancel()
+        await asyncio.gather(decoding, return_exceptions=True)
+        raise
+    if not long_clip.done():
+        decoding.result() # decode errors surface here
+        return bytes(held), None
+
+    async def frames() -> AsyncIterator[bytes]:
+        try:
+            while (frame := await queue.get()) is not None:
+                yield frame
+            await decoding
+        finally:
+            if not decoding.done():
+                decoding.cancel()
+
+    return None, frames()
@@ -0,0 +1,143 @@
+import asyncio
+import collections
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import Executor
+from typing import AsyncIterable, AsyncIterator, Optional, Sequence
+
+
+class TranscriptCache():
+    '''
+    Transcripts keyed by a SHA-256 of the uploaded audio bytes and the
+    recognition config (backend and candidate languages), so a retried or
+    re-submitted clip is answered without decoding or recognizing it again.
+
+    The first tier is a per-worker in-memory LRU of max_entries. With a
+    directory, results are also written there as one JSON file per key; on
+    a shared mount (e.g. Azure Files) workers and instances answer each
+    other's retries. Entries older than ttl_seconds are ignored and pruned.
+    '''
+
+    def __init__(
+        self,
+        config: Sequence[str],
+        max_entries: int = 256,
+        ttl_seconds: float = 86400.0,
+        directory: Optional[str] = None,
+        executor: Optional[Executor] = None,
+    ):
+        self.enabled = max_entries > 0 or bool(directory)
+        self._config = ",".join(config).encode()
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._directory = directory
+        self._executor = executor
+        # key → (result, stored at)
+        self._entries = collections.OrderedDict()
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def hasher(self):
+        digest = hashlib.sha256(self._config)
+        digest.update(b"\0")
+        return digest
+
+    def key(self, data: bytes) -> str:
+        digest = self.hasher()
+        digest.update(data)
+        return digest.hexdigest()
+
+    async def hashed(self, chunks: AsyncIterable[bytes], key: asyncio.Future) -> AsyncIterator[bytes]:
+        '''Pass chunks through unchanged and resolve key once the last one went by.'''
+        digest = self.hasher()
+        async for chunk in chunks:
+            digest.update(chunk)
+            yield chunk
+        if not key.done():
+            key.set_result(digest.hexdigest())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, f"{key}.json")
+
+    def _read(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self._ttl_seconds:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key: str, result: dict) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path) # atomic, readers never see a half-written file
+
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self._ttl_seconds
+        for entry in os.scandir(self._directory):
+            try:
+                if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _remember(self, key: str, result: dict) -> None:
+        if self._max_entries <= 0:
+            return
+        self._entries[key] = (result, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            result, stored_at = entry
+            if time.monotonic() - stored_at <= self._ttl_seconds:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return result
+            del self._entries[key]
+
+        if self._directory:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, self._read, key)
+            if result is not None:
+                self.disk_hits += 1
+                self._remember(key, result)
+                return result
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, result: dict) -> None:
+        self._remember(key, result)
+        if self._directory:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self._executor, self._write, key, result)
+            except OSError:
+                logging.exception("Failed to write transcript cache entry")
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,167 @@
+import collections
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2
+# frames classified at once, about 15 s of audio at 30 ms frames
+CLASSIFY_BLOCK_FRAMES = 512
+
+
+def pcm_seconds(num_bytes: int) -> float:
+    return num_bytes / (SAMPLE_RATE * BYTES_PER_SAMPLE)
+
+
+def classify_frames(samples: np.ndarray, frame_samples: int, threshold_dbfs: float) -> np.ndarray:
+    '''
+    Energy/zero-crossing voice activity detection over whole frames of 16-bit
+    samples. Voiced speech is loud, unvoiced consonants (s, f, sh) are quieter
+    but cross zero often, so they pass at half the energy threshold.
+    Returns one bool per frame.
+    '''
+    num_frames = len(samples) // frame_samples
+    if num_frames == 0:
+        return np.zeros(0, dtype=bool)
+
+    frames = samples[:num_frames * frame_samples].reshape(num_frames, frame_samples)
+    rms = np.empty(num_frames, dtype=np.float32)
+    zero_crossing_rate = np.empty(num_frames)
+    # in blocks, so the float copies stay small however long the recording is
+    for start in range(0, num_frames, CLASSIFY_BLOCK_FRAMES):
+        block = frames[start:start + CLASSIFY_BLOCK_FRAMES].astype(np.float32)
+        end = start + len(block)
+        rms[start:end] = np.sqrt(np.mean(block * block, axis=1)) / 32768.0
+        zero_crossing_rate[start:end] = np.mean(np.signbit(block[:, 1:]) != np.signbit(block[:, :-1]), axis=1)
+    threshold = 10 ** (threshold_dbfs / 20)
+
+    voiced = rms >= threshold
+    unvoiced = (rms >= threshold / 2) & (zero_crossing_rate > 0.25)
+    return voiced | unvoiced
+
+
+def contains_speech(pcm: bytes, threshold_dbfs: float = -45.0, frame_ms: int = 30) -> bool:
+    '''Whether any frame of 16 kHz mono s16le PCM is speech, as trim_silence sees it.'''
+    samples = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // BYTES_PER_SAMPLE)
+    return bool(classify_frames(samples, SAMPLE_RATE * frame_ms // 1000, threshold_dbfs).any())
+
+
+def trim_silence(
+    pcm: bytes,
+    threshold_dbfs: float = -45.0,
+    max_pause_ms: int = 600,
+    padding_ms: int = 300,
+    frame_ms: int = 30,
+) -> bytes:
+    '''
+    Strip leading and trailing silence from 16 kHz mono s16le PCM and shorten
+    pauses to at most max_pause_ms. padding_ms of audio is kept around speech
+    so word onsets and endings are not clipped. Returns b"" when there is no
+    speech at all.
+    '''
+    frame_samples = SAMPLE_RATE * frame_ms // 1000
+    samples = np.frombuffer(pcm, dtype="<i2")
+    speech = classify_frames(samples, frame_samples, threshold_dbfs)
+    if not speech.any():
+        return b""
+
+    padding = padding_ms // frame_ms
+    if padding:
+        speech = np.convolve(speech, np.ones(2 * padding + 1), mode="same") > 0
+    if speech.all():
+        return pcm # nothing to trim
+
+    # position of every silent frame inside its run of silence
+    silent = ~speech
+    indices = np.arange(len(silent))
+    run_starts = np.flatnonzero(silent & ~np.concatenate(([False], silent[:-1])))
+    position = indices - run_starts[np.maximum(np.searchsorted(run_starts, indices, side="right") - 1, 0)]
+
+    speech_frames = np.flatnonzero(speech)
+    interior = (indices > speech_frames[0]) & (indices < speech_frames[-1])
+    keep = speech | (silent & interior & (position < max_pause_ms // frame_ms))
+
+    num_frames = len(speech)
+    frames = samples[:num_frames * frame_samples].reshape(num_frames, frame_samples)
+    return frames[keep].tobytes()
+
+
+class SilenceTrimmer():
+    '''
+    Incremental counterpart of trim_silence for pipelined decoding: push()
+    decoded PCM as it arrives and forward whatever it returns. Leading
+    silence is dropped (except padding), pauses are capped at max_pause_ms.
+    When disabled it passes everything through and only counts bytes.
+    '''
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        threshold_dbfs: float = -45.0,
+        max_pause_ms: int = 600,
+        padding_ms: int = 300,
+        frame_ms: int = 30,
+    ):
+        self.enabled = enabled
+        self.received_bytes = 0
+        self.sent_bytes = 0
+        self._threshold_dbfs = threshold_dbfs
+        self._frame_bytes = SAMPLE_RATE * frame_ms // 1000 * BYTES_PER_SAMPLE
+        self._max_pause_frames = max_pause_ms // frame_ms
+        self._lead_in = collections.deque(maxlen=max(padding_ms // frame_ms, 1))
+        self._remainder = b""
+        self._speech_seen = False
+        self._silent_run = 0
+
+    @property
+    def received_seconds(self) -> float:
+        return pcm_seconds(self.received_bytes)
+
+    @property
+    def sent_seconds(self) -> float:
+        return pcm_seconds(self.sent_bytes)
+
+    def push(self, pcm: bytes) -> bytes:
+        self.received_bytes += len(pcm)
+        if not self.enabled:
+            self.sent_bytes += len(pcm)
+            return pcm
+
+        data = self._remainder + pcm
+        whole = len(data) - len(data) % self._frame_bytes
+        self._remainder = data[whole:]
+        samples = np.frombuffer(data[:whole], dtype="<i2")
+        speech = classify_frames(samples, self._frame_bytes // BYTES_PER_SAMPLE, self._threshold_dbfs)
+
+        out = bytearray()
+        for index, is_speech in enumerate(speech):
+            frame = data[index * self._frame_bytes:(index + 1) * self._frame_bytes]
+            if is_speech:
+                if not self._speech_seen:
+                    self._speech_seen = True
+                    for lead_in in self._lead_in:
+                        out += lead_in
+                    self._lead_in.clear()
+                self._silent_run = 0
+                out += frame
+            elif not self._speech_seen:
+                self._lead_in.append(frame)
+            else:
+                self._silent_run += 1
+                if self._silent_run <= self._max_pause_frames:
+                    out += frame
+
+        self.sent_bytes += len(out)
+        return bytes(out)
+
+    def flush(self) -> bytes:
+        tail, self._remainder = self._remainder, b""
+        if self.enabled and (not self._speech_seen or self._silent_run > self._max_pause_frames):
+            return b""
+        self.sent_bytes += len(tail)
+        return tail
+
+    def stats(self) -> dict:
+        return {
+            "received_seconds": round(self.received_seconds, 2),
+            "sent_seconds": round(self.sent_seconds, 2),
+        }
@@ -0,0 +1,139 @@
+import collections
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import AsyncIterable, Dict, Mapping, Optional, Tuple
+
+import httpx
+
+from backend.speech.metrics import LATENCY_BUCKETS, Histogram
+
+# headers the speech workers need to see to act for the same user on the same upload
+FORWARDED_HEADERS = ("content-type", "content-length")
+FORWARDED_HEADER_PREFIX = "x-ms-client-principal"
+RESPONSE_HEADERS = ("retry-after",)
+
+# the app is ASGI, gunicorn's default sync workers cannot serve it
+WORKER_CLASS = "uvicorn.workers.UvicornWorker"
+
+# App Service cuts requests off after 230 seconds, no point waiting longer on the speech workers
+TIMEOUT = httpx.Timeout(230.0, connect=5.0)
+
+
+class SpeechWorkerPool():
+    '''
+    A separately sized pool of speech worker processes: a second gunicorn
+    serving this app on a Unix socket, started and stopped by the gunicorn
+    master of the web workers. Its processes transcribe in-process (they get
+    AZURE_SPEECH_WORKER_PROCESSES=0), with their own admission queue,
+    recognizer pool and decoder threads, and start nothing but speech
+    (AZURE_SPEECH_WORKER_MODE=True).
+    '''
+
+    def __init__(self, socket_path: str, processes: int, app: str = "app:app", stop_timeout_seconds: float = 30.0):
+        self.socket_path = socket_path
+        self.processes = processes
+        self._app = app
+        self._stop_timeout_seconds = stop_timeout_seconds
+        self._process: Optional[subprocess.Popen] = None
+
+    def command(self):
+        return [
+            sys.executable, "-m", "gunicorn",
+            "--bind", f"unix:{self.socket_path}",
+            "--workers", str(self.processes),
+            "--worker-class", WORKER_CLASS,
+            self._app,
+        ]
+
+    def start(self) -> None:
+        env = {**os.environ, "AZURE_SPEECH_WORKER_PROCESSES": "0", "AZURE_SPEECH_WORKER_MODE": "True"}
+        self._process = subprocess.Popen(self.command(), env=env)
+        logging.info(f"Started {self.processes} speech worker processes on {self.socket_path} (pid {self._process.pid})")
+
+    def stop(self) -> None:
+        if self._process is None or self._process.poll() is not None:
+            return
+        self._process.terminate() # gunicorn finishes the transcriptions in flight on SIGTERM
+        try:
+            self._process.wait(self._stop_timeout_seconds)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+
+def forwarded_headers(headers: Mapping[str, str], content_type: Optional[str] = None) -> Dict[str, str]:
+    '''The request headers that go along with an upload to the speech workers.'''
+    forwarded = {
+        name: value for name, value in headers.items()
+        if name.lower() in FORWARDED_HEADERS or name.lower().startswith(FORWARDED_HEADER_PREFIX)
+    }
+    if content_type is not None:
+        #the upload is not the request body (e.g. a multipart field): its own type, and no length to pass on
+        forwarded = {name: value for name, value in forwarded.items() if name.lower() not in FORWARDED_HEADERS}
+        forwarded["Content-Type"] = content_type
+    return forwarded
+
+
+class SpeechWorkerClient():
+    '''
+    Web worker side of the speech worker pool: streams an upload to the
+    pool's /transcribe over the Unix socket and hands back the result, so
+    decoding and recognition never run on the web worker. Keeps in-flight,
+    status and latency counts of the requests it forwarded.
+    '''
+
+    def __init__(self, socket_path: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        #connect retries cover the pool still starting up
+        transport = transport or httpx.AsyncHTTPTransport(uds=socket_path, retries=3)
+        self._client = httpx.AsyncClient(transport=transport, base_url="http://speech-workers", timeout=TIMEOUT)
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statuses = collections.Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.forwarded = 0
+        self.failed = 0
+
+    async def transcribe(self, body: AsyncIterable[bytes], headers: Dict[str, str]) -> Tuple[dict, int, Dict[str, str]]:
+        '''The /transcribe JSON, status code and response headers (Retry-After) of the speech workers.'''
+        started = time.monotonic()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            response = await self._client.post("/transcribe", content=body, headers=headers)
+            result = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            logging.error("Speech workers unavailable: %s", e)
+            self.failed += 1
+            return {"text": "", "error": "speech workers unavailable"}, 503, {}
+        finally:
+            self.in_flight -= 1
+
+        self.forwarded += 1
+        self.statuses[str(response.status_code)] += 1
+        self.latency.observe(time.monotonic() - started)
+        response_headers = {name: response.headers[name] for name in RESPONSE_HEADERS if name in response.headers}
+        return result, response.status_code, response_headers
+
+    async def metrics(self) -> Optional[dict]:
+        '''/transcribe/metrics of one of the speech worker processes, None if none answers.'''
+        try:
+            response = await self._client.get("/transcribe/metrics")
+            return response.json()
+        except (httpx.HTTPError, ValueError):
+            return None
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "forwarded": self.forwarded,
+            "failed": self.failed,
+            "statuses": dict(self.statuses),
+            "latency_seconds": self.latency.snapshot(),
+        }
@@ -1,4 +1,8 @@
 import multiprocessing
+import os
+
+from backend.settings import app_settings
+from backend.speech.workers import SpeechWorkerPool
 
 max_requests = 1000
 max_requests_jitter = 50
@@ -9,5 +13,20 @@ timeout = 230
 # https://learn.microsoft.com/en-us/troubleshoot/azure/app-service/web-apps-performance-faqs#why-does-my-request-time-out-after-230-seconds
 
 num_cpus = multiprocessing.cpu_count()
-workers = (num_cpus * 2) + 1
+workers = int(os.environ.get("WEB_CONCURRENCY", 0)) or (num_cpus * 2) + 1
 worker_class = "uvicorn.workers.UvicornWorker"
+
+# optional: transcription runs in its own, separately sized pool of processes behind a Unix socket
+speech_worker_pool = None
+if app_settings.speech.worker_processes > 0:
+    speech_worker_pool = SpeechWorkerPool(app_settings.speech.worker_socket, app_settings.speech.worker_processes)
+
+
+def on_starting(server):
+    if speech_worker_pool:
+        speech_worker_pool.start()
+
+
+def on_exit(server):
+    if speech_worker_pool:
+        speech_worker_pool.stop()
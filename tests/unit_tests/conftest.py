@@ -0,0 +1,24 @@
+import os
+from importlib import import_module, reload
+
+import pytest
+import pytest_asyncio
+
+
+@pytest.fixture(scope="function")
+def app_module(monkeypatch):
+    # The app with the in-process speech recognizer and no datasource; reload to pick up the environment
+    monkeypatch.setenv("DOTENV_PATH", os.path.join(os.path.dirname(__file__), "dotenv_data", "dotenv_no_datasource_1"))
+    monkeypatch.setenv("AZURE_SPEECH_BACKEND", "local")
+    monkeypatch.setenv("AZURE_SPEECH_LOCAL_CONNECT_SECONDS", "0")
+    monkeypatch.setenv("AZURE_SPEECH_LOCAL_RTF", "0")
+    monkeypatch.setenv("AZURE_SPEECH_TRANSCRIPT_CACHE_SIZE", "0")
+    reload(import_module("backend.settings"))
+    return reload(import_module("app"))
+
+
+@pytest_asyncio.fixture
+async def client(app_module):
+    # Quart test client of the started app
+    async with app_module.app.test_app() as test_app:
+        yield test_app.test_client()
@@ -0,0 +1,48 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+
+def tool_chunk(arguments, id=None, name=None):
+    function = SimpleNamespace(name=name, arguments=arguments)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(tool_calls=[SimpleNamespace(id=id, function=function)]))])
+
+
+def end_chunk():
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(tool_calls=None))])
+
+
+@pytest.mark.asyncio
+async def test_streamed_tool_calls_start_before_the_stream_ends(app_module, monkeypatch):
+    started = []
+
+    async def weather(function_name, function_args):
+        started.append(json.loads(function_args)["location"])
+        await asyncio.sleep(0.05)
+        return f"sunny in {json.loads(function_args)['location']}"
+
+    monkeypatch.setattr(app_module, "openai_remote_azure_function_call", weather)
+    state = app_module.AzureOpenaiFunctionCallStreamState()
+
+    async def feed(chunk):
+        return await app_module.process_function_call_stream(chunk, state, {}, {}, {}, None)
+
+    await feed(tool_chunk('{"loc', id="call-1", name="get_weather"))
+    await feed(tool_chunk('ation": "Berlin"}'))
+    # the arguments of a new call can start on the chunk that carries its id
+    await feed(tool_chunk('{"location": ', id="call-2", name="get_weather"))
+    await asyncio.sleep(0.01) # the model would still be streaming call-2
+    assert started == ["Berlin"]
+
+    await feed(tool_chunk('"Paris"}'))
+    assert await feed(end_chunk()) == "COMPLETED"
+
+    assert [(call["tool_id"], call["tool_arguments"]) for call in state.tool_calls] == [
+        ("call-1", '{"location": "Berlin"}'),
+        ("call-2", '{"location": "Paris"}'),
+    ]
+    assert [message["content"] for message in state.function_messages if message["role"] == "function"] == [
+        "sunny in Berlin", "sunny in Paris"
+    ]
@@ -0,0 +1,45 @@
+import pytest
+
+
+class FakeCredential():
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_failed_init_closes_the_credential(app_module, monkeypatch):
+    credentials = []
+
+    def credential():
+        credentials.append(FakeCredential())
+        return credentials[-1]
+
+    def broken_client(**kwargs):
+        raise ValueError("invalid endpoint")
+
+    monkeypatch.setattr(app_module, "DefaultAzureCredential", credential)
+    monkeypatch.setattr(app_module, "AsyncAzureOpenAI", broken_client)
+    monkeypatch.setattr(app_module.app_settings.azure_openai, "key", None)
+
+    async with app_module.app.app_context():
+        app_module.app.azure_openai_credential = None
+        with pytest.raises(ValueError):
+            await app_module.init_openai_client()
+
+        assert credentials[0].closed
+        assert app_module.app.azure_openai_credential is None
+
+
+@pytest.mark.asyncio
+async def test_missing_deployment_creates_no_credential(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "DefaultAzureCredential", pytest.fail)
+    monkeypatch.setattr(app_module.app_settings.azure_openai, "key", None)
+    monkeypatch.setattr(app_module.app_settings.azure_openai, "model", None)
+
+    async with app_module.app.app_context():
+        app_module.app.azure_openai_credential = None
+        with pytest.raises(ValueError, match="AZURE_OPENAI_MODEL"):
+            await app_module.init_openai_client()
@@ -0,0 +1,137 @@
+import asyncio
+import json
+
+import httpx
+import numpy as np
+import pytest
+
+from backend.speech.admission import AdmissionController
+from backend.speech.workers import SpeechWorkerClient
+from test_speech_decoders import make_webm
+
+
+def pcm(seconds, rate=16000):
+    t = np.arange(int(seconds * rate)) / rate
+    return (0.3 * np.sin(2 * np.pi * 440 * t) * 32767).astype("<i2").tobytes()
+
+
+@pytest.mark.asyncio
+async def test_transcribe_raw_pcm(client):
+    response = await client.post("/transcribe", data=pcm(1), headers={"Content-Type": "audio/pcm; rate=16000"})
+
+    assert response.status_code == 200
+    assert (await response.get_json())["text"]
+
+
+@pytest.mark.asyncio
+async def test_transcribe_rejects_unsupported_pcm_rate(client):
+    response = await client.post("/transcribe", data=pcm(1, 16001), headers={"Content-Type": "audio/pcm; rate=16001"})
+
+    assert response.status_code == 415
+    assert "16001 Hz" in (await response.get_json())["error"]
+
+
+@pytest.mark.asyncio
+async def test_upload_limit_applies_to_speech_routes_only(app_module, client, monkeypatch):
+    # Quart's MAX_CONTENT_LENGTH stays as it is for every other route
+    assert app_module.app.config["MAX_CONTENT_LENGTH"] == 16 * 1024 * 1024
+    app_module.app.config["MAX_CONTENT_LENGTH"] = 16000
+    monkeypatch.setattr(app_module.app_settings.speech, "max_upload_bytes", 0)
+
+    upload = await client.post("/transcribe", data=pcm(1), headers={"Content-Type": "audio/pcm"})
+    chat = await client.post("/conversation", json={"messages": [{"role": "user", "content": "x" * 20000}]})
+
+    assert upload.status_code == 200
+    assert chat.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_live_session_stops_at_audio_limit(app_module, client, monkeypatch):
+    webm = make_webm(2)
+    monkeypatch.setattr(app_module.app_settings.speech, "max_audio_seconds", 0.5)
+
+    async with client.websocket("/transcribe/ws") as ws:
+        for i in range(0, len(webm), 4000):
+            await ws.send(webm[i:i + 4000])
+        await ws.send(json.dumps({"type": "stop"}))
+        frames = []
+        while not frames or frames[-1]["type"] not in ("done", "error"):
+            frames.append(json.loads(await ws.receive()))
+
+    assert frames[-1] == {"type": "error", "error": "audio is longer than 0.5 seconds"}
+
+
+@pytest.mark.asyncio
+async def test_live_sessions_over_the_limit_are_turned_away(app_module, client):
+    webm = make_webm(1)
+    app_module.app.live_admission = AdmissionController(max_concurrent=1, max_queue=0)
+
+    async with client.websocket("/transcribe/ws") as first:
+        await first.send(webm[:4000])
+        await asyncio.sleep(0.1)
+        async with client.websocket("/transcribe/ws") as second:
+            rejected = json.loads(await second.receive())
+
+        await first.send(webm[4000:])
+        await first.send(json.dumps({"type": "stop"}))
+        frames = []
+        while not frames or frames[-1]["type"] not in ("done", "error"):
+            frames.append(json.loads(await first.receive()))
+
+    assert rejected["type"] == "error" and rejected["retry_after"] >= 1
+    assert frames[-1]["type"] == "done"
+    metrics = await (await client.get("/transcribe/metrics")).get_json()
+    assert metrics["live_admission"]["admitted"] == 1 and metrics["live_admission"]["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_forwarded_uploads_keep_the_upload_limit(app_module, client, monkeypatch):
+    forwarded = []
+
+    def speech_workers(request):
+        forwarded.append(request.read())
+        return httpx.Response(200, json={"text": "forwarded"})
+
+    app_module.app.speech_workers = SpeechWorkerClient("/unused.sock", transport=httpx.MockTransport(speech_workers))
+    monkeypatch.setattr(app_module.app_settings.speech, "max_upload_bytes", 16000)
+
+    small = await client.post("/transcribe", data=pcm(0.25), headers={"Content-Type": "audio/pcm"})
+    large = await client.post("/transcribe", data=pcm(1), headers={"Content-Type": "audio/pcm"})
+
+    assert (await small.get_json())["text"] == "forwarded"
+    assert large.status_code == 413
+    assert await large.get_json() == {"text": "", "error": "upload is larger than 16000 bytes"}
+    assert len(forwarded) == 1
+
+
+@pytest.fixture
+def speech_worker_mode(monkeypatch):
+    monkeypatch.setenv("AZURE_SPEECH_WORKER_MODE", "True")
+
+
+@pytest.mark.asyncio
+async def test_speech_worker_starts_speech_only(speech_worker_mode, app_module, client):
+    response = await client.post("/transcribe", data=pcm(1), headers={"Content-Type": "audio/pcm"})
+
+    assert response.status_code == 200
+    assert app_module.app.http_client is None and app_module.app.tool_catalogue is None
+    assert app_module.app.azure_openai_client is None
+
+
+@pytest.mark.asyncio
+async def test_silence_keeps_the_language_hint(app_module, client, monkeypatch):
+    second_passes = []
+
+    async def recognize_pcm(pcm_bytes, languages=None, timer=None):
+        second_passes.append(languages)
+        return [], "continuous"
+
+    monkeypatch.setattr(app_module, "recognize_pcm", recognize_pcm)
+    async with app_module.app.app_context():
+        hints = app_module.app.language_hints
+        # an empty result of silent audio says nothing about the hint, one of audible speech does
+        await app_module.check_language_hint("alice", ["de-DE"], [], bytes(32000))
+        assert second_passes == [] and hints.stats()["fallbacks"] == 0
+
+        await app_module.check_language_hint("alice", ["de-DE"], [], pcm(1))
+        assert second_passes == [None] and hints.stats()["fallbacks"] == 1
@@ -0,0 +1,93 @@
+import io
+import json
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from backend.speech.admission import AdmissionController
+from test_app_transcribe import pcm
+
+VOICE_PATHS = ["/conversation/voice", "/history/generate/voice"]
+
+
+@pytest.fixture
+def answered(app_module, monkeypatch):
+    # the chat completion answers with the question it got, the history records the new conversation
+    questions = []
+
+    async def complete_chat_request(request_body, request_headers, **kwargs):
+        questions.append(request_body["messages"][-1]["content"])
+        return {"choices": [{"messages": [{"role": "assistant", "content": f"answer to {questions[-1]}"}]}],
+                "history_metadata": request_body.get("history_metadata", {})}
+
+    async def add_user_message(user_id, conversation_id, messages):
+        return {"conversation_id": "c1"}
+
+    monkeypatch.setattr(app_module.app_settings.azure_openai, "stream", False)
+    monkeypatch.setattr(app_module, "complete_chat_request", complete_chat_request)
+    monkeypatch.setattr(app_module, "add_user_message", add_user_message)
+    return questions
+
+
+def audio_file(audio):
+    return FileStorage(stream=io.BytesIO(audio), filename="audio", content_type="audio/pcm; rate=16000")
+
+
+def voice_request(audio, request='{"messages": []}'):
+    # multipart fields of the voice endpoints
+    return {"files": {"audio": audio_file(audio)}, "form": {"request": request}}
+
+
+async def lines(response):
+    return [json.loads(line) for line in (await response.get_data(as_text=True)).splitlines() if line.strip()]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", VOICE_PATHS)
+async def test_transcript_comes_before_the_answer(client, answered, path):
+    response = await client.post(path, **voice_request(pcm(1)))
+
+    assert response.status_code == 200
+    first, *rest = await lines(response)
+    transcript = first["transcript"]["text"]
+    assert transcript and first["message"]["content"] == transcript
+    assert answered == [transcript]
+    assert rest[-1]["choices"][0]["messages"][0]["content"] == f"answer to {transcript}"
+    if path == "/history/generate/voice":
+        assert rest[-1]["history_metadata"] == {"conversation_id": "c1"}
+
+
+@pytest.mark.asyncio
+async def test_silence_ends_the_stream_after_the_transcript(client, answered):
+    response = await client.post("/conversation/voice", **voice_request(bytes(32000)))
+
+    assert response.status_code == 200
+    assert [line["message"]["content"] for line in await lines(response)] == [""]
+    assert answered == []
+
+
+@pytest.mark.asyncio
+async def test_missing_fields_are_rejected(client, answered):
+    no_request = await client.post("/conversation/voice", files={"audio": audio_file(pcm(1))})
+    no_audio = await client.post("/conversation/voice", form={"request": "{}"})
+    not_json = await client.post("/conversation/voice", **voice_request(pcm(1), request="{"))
+    not_an_object = [await client.post("/conversation/voice", **voice_request(pcm(1), request=request))
+                     for request in ('["hello"]', '"hello"', '{"messages": "hello"}')]
+
+    assert (no_request.status_code, no_audio.status_code, not_json.status_code) == (400, 400, 400)
+    assert [response.status_code for response in not_an_object] == [400, 400, 400]
+    assert answered == []
+
+
+@pytest.mark.asyncio
+async def test_limits_map_to_413_and_429(app_module, client, answered, monkeypatch):
+    monkeypatch.setattr(app_module.app_settings.speech, "max_audio_seconds", 0.5)
+    too_long = await client.post("/conversation/voice", **voice_request(pcm(1)))
+
+    app_module.app.transcribe_admission = AdmissionController(max_concurrent=1, max_queue=0)
+    async with app_module.app.transcribe_admission.admit():
+        overloaded = await client.post("/conversation/voice", **voice_request(pcm(0.2)))
+
+    assert too_long.status_code == 413 and "longer than" in (await too_long.get_json())["error"]
+    assert overloaded.status_code == 429 and int(overloaded.headers["Retry-After"]) >= 1
+    assert answered == []
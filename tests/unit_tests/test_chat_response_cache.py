@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from backend.chat.response_cache import (
+    CachedAnswer,
+    ResponseCache,
+    StreamRecorder,
+    answer_from_response,
+    replay_response,
+    replay_stream,
+)
+
+
+def model_args(question, **overrides):
+    args = {
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": question},
+        ],
+        "temperature": 0,
+        "model": "gpt-4o",
+        "stream": True,
+        "extra_body": {},
+    }
+    args.update(overrides)
+    return args
+
+
+def event(*messages, model="gpt-4o"):
+    return {"id": "chatcmpl-1", "model": model, "choices": [{"messages": list(messages)}], "history_metadata": {}}
+
+
+def test_key_normalises_messages():
+    cache = ResponseCache()
+
+    assert cache.key(model_args("Where is the  handbook?\n")) == cache.key(model_args("Where is the handbook?", stream=False))
+    assert cache.key(model_args("Where is the handbook?")) != cache.key(model_args("Where is the handbook?", model="gpt-4o-mini"))
+    assert cache.key(model_args("Where is the handbook?")) != cache.key(model_args(
+        "Where is the handbook?", extra_body={"data_sources": [{"type": "azure_search", "parameters": {"filter": "group-a"}}]}
+    ))
+    assert cache.key(model_args("Where is the handbook?")) == cache.key(model_args(
+        "Where is the handbook?", extra_body={"user_security_context": {"end_user_id": "someone"}}
+    ))
+
+
+def test_lru_and_ttl():
+    cache = ResponseCache(max_entries=2, ttl_seconds=0.05)
+    for name in ("a", "b", "c"):
+        cache.put(name, CachedAnswer("gpt-4o", ({"role": "assistant", "content": name},)))
+
+    assert cache.get("a") is None
+    assert cache.get("c").messages[0]["content"] == "c"
+    time.sleep(0.06)
+    assert cache.get("c") is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2, "hit_ratio": 0.333, "expired": 1, "evictions": 1}
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResponseCache(max_entries=0)
+    cache.put("a", CachedAnswer("gpt-4o", ({"role": "assistant", "content": "a"},)))
+
+    assert not cache.enabled
+    assert cache.get("a") is None
+
+
+def test_recorder_keeps_finished_answers_only():
+    recorder = StreamRecorder()
+    recorder.add(event({"role": "tool", "content": '{"citations": []}'}))
+    recorder.add(event({"role": "assistant", "content": "Page "}))
+    recorder.add(event({"role": "assistant", "content": "12."}))
+    assert recorder.answer() is None
+
+    recorder.add({}, "stop")
+    assert recorder.answer() == CachedAnswer("gpt-4o", (
+        {"role": "tool", "content": '{"citations": []}'},
+        {"role": "assistant", "content": "Page 12."},
+    ))
+
+
+def test_answer_from_response():
+    assert answer_from_response({"model": "gpt-4o", "choices": [{"messages": [{"role": "assistant", "content": ""}]}]}) is None
+    assert answer_from_response(event({"role": "assistant", "content": "Page 12."})).messages[0]["content"] == "Page 12."
+
+
+@pytest.mark.asyncio
+async def test_replay_uses_current_history_metadata():
+    answer = CachedAnswer("gpt-4o", ({"role": "tool", "content": "{}"}, {"role": "assistant", "content": "Page 12."}))
+
+    events = [replayed async for replayed in replay_stream(answer, {"conversation_id": "c2"})]
+    response = replay_response(answer, {"conversation_id": "c2"})
+
+    assert [replayed["choices"][0]["messages"][0]["role"] for replayed in events] == ["tool", "assistant"]
+    assert len({replayed["id"] for replayed in events}) == 1
+    assert all(replayed["history_metadata"] == {"conversation_id": "c2"} and replayed["cached"] for replayed in events)
+    assert response["choices"][0]["messages"][1]["content"] == "Page 12."
+    assert response["id"] != events[0]["id"]
@@ -0,0 +1,88 @@
+import time
+
+import numpy as np
+
+from backend.chat.response_cache import CachedAnswer
+from backend.chat.semantic_cache import SemanticCache, partition_key
+
+
+def answer(text):
+    return CachedAnswer("gpt-4o", ({"role": "assistant", "content": text},))
+
+
+def embedding(*values):
+    return list(values)
+
+
+def model_args(question, data_sources=None):
+    return {
+        "messages": [{"role": "system", "content": "You are a helpful assistant."}, {"role": "user", "content": question}],
+        "model": "gpt-4o",
+        "extra_body": {"data_sources": data_sources} if data_sources else {},
+    }
+
+
+def test_partition_ignores_question_only():
+    handbook = [{"type": "azure_search", "parameters": {"index_name": "handbook"}}]
+
+    assert partition_key(model_args("How many vacation days?")) == partition_key(model_args("What's my PTO allowance?"))
+    assert partition_key(model_args("How many vacation days?")) != partition_key(model_args("How many vacation days?", handbook))
+
+
+def test_paraphrase_above_threshold_hits():
+    cache = SemanticCache(threshold=0.9)
+    cache.put("handbook", embedding(1.0, 0.0, 0.0), answer("30 days"))
+
+    assert cache.get("handbook", embedding(0.95, 0.2, 0.0)).messages[0]["content"] == "30 days"
+    assert cache.get("handbook", embedding(0.5, 0.8, 0.0)) is None
+    assert cache.get("other", embedding(1.0, 0.0, 0.0)) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_nearest_question_wins():
+    cache = SemanticCache(threshold=0.8)
+    cache.put("handbook", embedding(1.0, 0.0), answer("vacation"))
+    cache.put("handbook", embedding(0.0, 1.0), answer("parking"))
+
+    assert cache.get("handbook", embedding(0.3, 1.0)).messages[0]["content"] == "parking"
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(threshold=0.99, max_entries=2)
+    cache.put("handbook", embedding(1.0, 0.0, 0.0), answer("a"))
+    cache.put("handbook", embedding(0.0, 1.0, 0.0), answer("b"))
+    cache.get("handbook", embedding(1.0, 0.0, 0.0))
+    cache.put("handbook", embedding(0.0, 0.0, 1.0), answer("c"))
+
+    assert cache.get("handbook", embedding(0.0, 1.0, 0.0)) is None
+    assert cache.get("handbook", embedding(1.0, 0.0, 0.0)).messages[0]["content"] == "a"
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 1
+
+
+def test_matrix_grows_beyond_initial_rows():
+    cache = SemanticCache(threshold=0.999, max_entries=100)
+    vectors = np.eye(40)
+    for row, vector in enumerate(vectors):
+        cache.put("handbook", vector.tolist(), answer(str(row)))
+
+    assert cache.get("handbook", vectors[33].tolist()).messages[0]["content"] == "33"
+    assert cache.stats()["entries"] == 40
+
+
+def test_partitions_and_entries_expire():
+    cache = SemanticCache(threshold=0.9, max_partitions=1, ttl_seconds=0.05)
+    cache.put("a", embedding(1.0, 0.0), answer("a"))
+    cache.put("b", embedding(1.0, 0.0), answer("b"))
+
+    assert cache.get("a", embedding(1.0, 0.0)) is None
+    time.sleep(0.06)
+    assert cache.get("b", embedding(1.0, 0.0)) is None
+    assert cache.stats()["partitions"] == 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = SemanticCache(max_entries=0)
+    cache.put("handbook", embedding(1.0, 0.0), answer("a"))
+
+    assert not cache.enabled
+    assert cache.get("handbook", embedding(1.0, 0.0)) is None
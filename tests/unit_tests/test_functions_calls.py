@@ -0,0 +1,77 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from backend.functions.calls import ToolCall, ToolCallDispatcher, run_tool_calls
+
+
+def slow_tool(seconds, log=None):
+    async def invoke(name, arguments):
+        if log is not None:
+            log.append(("start", name))
+        await asyncio.sleep(seconds)
+        if log is not None:
+            log.append(("end", name))
+        return f"{name}({arguments})"
+    return invoke
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_run_concurrently_in_order():
+    calls = [ToolCall("weather", '{"city": "Berlin"}'), ToolCall("time", "{}"), ToolCall("stocks", "{}")]
+
+    started = time.monotonic()
+    results = await run_tool_calls(calls, slow_tool(0.2))
+
+    assert time.monotonic() - started < 0.4
+    assert results == ['weather({"city": "Berlin"})', "time({})", "stocks({})"]
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_respect_parallel_cap():
+    log = []
+    calls = [ToolCall(f"tool{i}", "{}") for i in range(3)]
+
+    await run_tool_calls(calls, slow_tool(0.05, log), max_parallel=2)
+
+    running = peak = 0
+    for event, _ in log:
+        running += 1 if event == "start" else -1
+        peak = max(peak, running)
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_and_slow_calls_return_errors():
+    async def invoke(name, arguments):
+        if name == "broken":
+            raise RuntimeError("boom")
+        if name == "slow":
+            await asyncio.sleep(1)
+        return "ok"
+
+    calls = [ToolCall("broken", "{}"), ToolCall("slow", "{}"), ToolCall("fine", "{}")]
+    results = await run_tool_calls(calls, invoke, timeout_seconds=0.05)
+
+    assert json.loads(results[0]) == {"error": "broken failed"}
+    assert json.loads(results[1]) == {"error": "slow timed out"}
+    assert results[2] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_starts_calls_on_submit():
+    log = []
+    dispatcher = ToolCallDispatcher(slow_tool(0.1, log))
+
+    dispatcher.submit(ToolCall("weather", "{}", "call-1"))
+    await asyncio.sleep(0.15) # the model is still streaming the next call
+    assert log == [("start", "weather"), ("end", "weather")]
+
+    dispatcher.submit(ToolCall("time", "{}", "call-2"))
+    started = time.monotonic()
+    results = await dispatcher.results()
+
+    assert time.monotonic() - started < 0.15
+    assert results == ["weather({})", "time({})"]
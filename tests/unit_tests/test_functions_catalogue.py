@@ -0,0 +1,57 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend.functions.catalogue import ToolCatalogue, build_snapshot
+from backend.http_client import SharedHTTPClient
+
+
+def tool(name, description="does things"):
+    return {"type": "function", "function": {"name": name, "description": description}}
+
+
+def test_build_snapshot_deduplicates_by_name():
+    snapshot = build_snapshot([tool("weather"), tool("time"), tool("weather", "again"), {"type": "function"}])
+
+    assert [definition["function"]["name"] for definition in snapshot.tools] == ["weather", "time"]
+    assert snapshot.by_name["weather"]["function"]["description"] == "does things"
+    assert "time" in snapshot and "stocks" not in snapshot
+    with pytest.raises(TypeError):
+        snapshot.by_name["stocks"] = tool("stocks")
+
+
+@pytest.mark.asyncio
+async def test_catalogue_refreshes_in_background():
+    responses = [[tool("weather")], [tool("weather"), tool("time")]]
+
+    def tools_function(request):
+        return httpx.Response(200, json=responses.pop(0) if len(responses) > 1 else responses[0])
+
+    client = SharedHTTPClient(transport=httpx.MockTransport(tools_function))
+    catalogue = ToolCatalogue("http://tools", client, ttl_seconds=0.05)
+
+    await catalogue.start()
+    first = catalogue.snapshot
+    await asyncio.sleep(0.15)
+    await catalogue.close()
+
+    assert len(first) == 1
+    assert len(catalogue.snapshot) == 2
+    assert catalogue.stats()["refreshes"] >= 2
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_snapshot():
+    statuses = [200, 500]
+
+    def tools_function(request):
+        return httpx.Response(statuses.pop(0), json=[tool("weather")])
+
+    catalogue = ToolCatalogue("http://tools", SharedHTTPClient(transport=httpx.MockTransport(tools_function)), ttl_seconds=0)
+
+    await catalogue.start()
+    assert not await catalogue.refresh()
+
+    assert "weather" in catalogue.snapshot
+    assert catalogue.stats()["failures"] == 1
@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend.http_client import SharedHTTPClient
+
+
+@pytest.mark.asyncio
+async def test_requests_wait_for_per_host_slot():
+    release = asyncio.Event()
+    active = 0
+    peak = 0
+
+    async def slow_host(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await release.wait()
+        active -= 1
+        return httpx.Response(200, json={"ok": True})
+
+    client = SharedHTTPClient(max_per_host=2, transport=httpx.MockTransport(slow_host))
+    calls = [asyncio.ensure_future(client.post("http://tool.example/api", endpoint="tool")) for _ in range(3)]
+    await asyncio.sleep(0.05)
+
+    host = client.stats()["hosts"]["tool.example"]
+    assert (host["active"], host["waiting"], host["saturated"]) == (2, 1, 1)
+
+    release.set()
+    responses = await asyncio.gather(*calls)
+
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert peak == 2
+    assert client.stats()["latency_seconds"]["tool"]["count"] == 3
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_errors_are_counted_per_host():
+    def failing_host(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    client = SharedHTTPClient(transport=httpx.MockTransport(failing_host))
+
+    with pytest.raises(httpx.ConnectError):
+        await client.get("http://promptflow.example/score", endpoint="promptflow")
+
+    host = client.stats()["hosts"]["promptflow.example"]
+    assert (host["errors"], host["active"]) == (1, 0)
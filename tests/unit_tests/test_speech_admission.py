@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from backend.speech.admission import AdmissionController, Overloaded
+
+
+async def hold(controller, release, user_id=None):
+    async with controller.admit(user_id):
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_queue_then_reject():
+    controller = AdmissionController(max_concurrent=1, max_queue=1)
+    release = asyncio.Event()
+    running = asyncio.ensure_future(hold(controller, release))
+    waiting = asyncio.ensure_future(hold(controller, release))
+    await asyncio.sleep(0.01)
+
+    assert (controller.active, controller.queued) == (1, 1)
+    with pytest.raises(Overloaded) as rejected:
+        async with controller.admit():
+            pass
+    assert rejected.value.retry_after >= 1
+
+    release.set()
+    await asyncio.gather(running, waiting)
+    stats = controller.stats()
+    assert (stats["active"], stats["queued"], stats["admitted"], stats["rejected"]) == (0, 0, 2, 1)
+    assert stats["wait_seconds"]["count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_per_user_limit():
+    controller = AdmissionController(max_concurrent=4, max_queue=4, max_per_user=1)
+    release = asyncio.Event()
+    running = asyncio.ensure_future(hold(controller, release, "alice"))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(Overloaded):
+        async with controller.admit("alice"):
+            pass
+    async with controller.admit("bob"):
+        pass
+
+    release.set()
+    await running
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout_seconds=0.05)
+    release = asyncio.Event()
+    running = asyncio.ensure_future(hold(controller, release))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(Overloaded):
+        async with controller.admit():
+            pass
+    assert controller.queued == 0
+
+    release.set()
+    await running
+
+
+@pytest.mark.asyncio
+async def test_disabled():
+    controller = AdmissionController(max_concurrent=0)
+    async with controller.admit():
+        assert controller.active == 0
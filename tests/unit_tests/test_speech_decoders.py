@@ -0,0 +1,183 @@
+import asyncio
+import contextvars
+import io
+import sys
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from backend.speech import decoders
+from backend.speech.decoders import (
+    FFmpegSubprocessDecoder,
+    PyAVDecoder,
+    SniffingDecoder,
+    create_decoder,
+    stream_decode,
+)
+from backend.speech.local import LocalRecognizerBackend
+
+# stand-ins for FFmpeg
+PASSTHROUGH_ARGS = [sys.executable, "-c", "import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer)"]
+FAILING_ARGS = [sys.executable, "-c", "import sys; sys.stderr.write('invalid data'); sys.exit(1)"]
+
+
+async def body(*chunks):
+    for chunk in chunks:
+        await asyncio.sleep(0)
+        yield chunk
+
+
+def make_webm(seconds: float, rate: int = 48000) -> bytes:
+    av = pytest.importorskip("av")
+    buf = io.BytesIO()
+    with av.open(buf, "w", format="webm") as container:
+        stream = container.add_stream("libopus", rate=rate)
+        stream.layout = "mono"
+        t = np.arange(int(seconds * rate)) / rate
+        samples = (0.3 * np.sin(2 * np.pi * 440 * t) * 32767).astype(np.int16)
+        for i in range(0, len(samples), 960):
+            frame = av.AudioFrame.from_ndarray(samples[i:i + 960].reshape(1, -1), format="s16", layout="mono")
+            frame.rate = rate
+            frame.pts = i
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buf.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_stream_decode_emits_frames():
+    frames = []
+    total = await stream_decode(body(b"ab", b"cd", b"ef"), frames.append, args=PASSTHROUGH_ARGS, frame_bytes=4)
+
+    assert total == 6
+    assert b"".join(frames) == b"abcdef"
+    assert all(len(frame) <= 4 for frame in frames)
+
+
+@pytest.mark.asyncio
+async def test_stream_decode_raises_on_decoder_error():
+    with pytest.raises(RuntimeError, match="invalid data"):
+        await stream_decode(body(b"not audio"), lambda frame: None, args=FAILING_ARGS)
+
+
+def test_ffmpeg_subprocess_decoder():
+    assert FFmpegSubprocessDecoder(PASSTHROUGH_ARGS).decode(b"pcm") == b"pcm"
+    with pytest.raises(RuntimeError, match="invalid data"):
+        FFmpegSubprocessDecoder(FAILING_ARGS).decode(b"not audio")
+
+
+def test_pyav_decoder_decode():
+    webm = make_webm(2)
+
+    pcm = PyAVDecoder().decode(webm)
+
+    # 16 kHz mono s16le, allow for codec priming/padding
+    assert abs(len(pcm) / 32000 - 2) < 0.05
+
+
+@pytest.mark.asyncio
+async def test_pyav_decoder_stream_matches_decode():
+    webm = make_webm(1)
+    decoder = PyAVDecoder()
+    chunks = [webm[i:i + 1000] for i in range(0, len(webm), 1000)]
+    frames = []
+
+    total = await decoder.stream(body(*chunks), frames.append)
+
+    assert total == len(b"".join(frames))
+    assert b"".join(frames) == decoder.decode(webm)
+
+
+@pytest.mark.asyncio
+async def test_pyav_decoder_stream_keeps_caller_context():
+    request_id = contextvars.ContextVar("request_id")
+    request_id.set("r1")
+    seen = set()
+
+    await PyAVDecoder().stream(body(make_webm(0.5)), lambda frame: seen.add(request_id.get(None)))
+
+    assert seen == {"r1"}
+
+
+@pytest.mark.asyncio
+async def test_open_pyav_streams_leave_speech_executor_free():
+    webm = make_webm(1)
+    speech_executor = ThreadPoolExecutor(2)
+    asyncio.get_running_loop().set_default_executor(speech_executor)
+    uploaded = asyncio.Event()
+
+    async def slow_body():
+        yield webm[:len(webm) // 2]
+        await uploaded.wait()
+        yield webm[len(webm) // 2:]
+
+    decoder = PyAVDecoder()
+    streams = [asyncio.create_task(decoder.stream(slow_body(), lambda frame: None)) for _ in range(4)]
+    await asyncio.sleep(0.1)
+    try:
+        backend = LocalRecognizerBackend(["en-US"], connect_seconds=0)
+        recognizer = await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(None, backend.create_push, True), 1)
+        await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(None, recognizer.recognizer.start_continuous_recognition), 1)
+        recognizer.push_stream.close()
+        recognizer.recognizer.stop_continuous_recognition()
+    finally:
+        uploaded.set()
+        totals = await asyncio.gather(*streams)
+
+    assert all(total > 0 for total in totals)
+
+
+@pytest.mark.asyncio
+async def test_pyav_decoder_rejects_invalid_input():
+    pytest.importorskip("av")
+    with pytest.raises(RuntimeError):
+        PyAVDecoder().decode(b"not audio at all")
+    with pytest.raises(RuntimeError):
+        await PyAVDecoder().stream(body(b"not audio at all"), lambda frame: None)
+
+
+def test_create_decoder():
+    assert create_decoder("ffmpeg").name == "ffmpeg"
+    assert create_decoder("auto").name == ("pyav" if decoders.av else "ffmpeg")
+
+
+def test_sniffing_decoder_passes_pcm_through():
+    pcm = np.arange(-800, 800, dtype=np.int16).tobytes()
+    decoder = SniffingDecoder(FFmpegSubprocessDecoder(FAILING_ARGS), "audio/pcm; rate=16000")
+
+    assert decoder.decode(pcm) == pcm
+    assert decoder.name == "pcm"
+
+
+@pytest.mark.asyncio
+async def test_sniffing_decoder_streams_wav_in_small_chunks():
+    samples = np.arange(-8000, 8000, dtype=np.int16)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(samples.tobytes())
+    wav = buf.getvalue()
+    decoder = SniffingDecoder(FFmpegSubprocessDecoder(FAILING_ARGS))
+
+    frames = []
+    total = await decoder.stream(body(*(wav[i:i + 5] for i in range(0, len(wav), 5))), frames.append)
+
+    assert decoder.audio_format.sample_rate == 8000
+    assert total == len(b"".join(frames)) == len(samples) * 2 * 2
+
+
+@pytest.mark.asyncio
+async def test_sniffing_decoder_hands_compressed_audio_to_decoder():
+    decoder = SniffingDecoder(FFmpegSubprocessDecoder(PASSTHROUGH_ARGS), "audio/webm")
+    frames = []
+
+    await decoder.stream(body(b"\x1a\x45\xdf\xa3", b"rest of the file"), frames.append)
+
+    assert b"".join(frames) == b"\x1a\x45\xdf\xa3rest of the file"
+    assert decoder.audio_format.container == "webm"
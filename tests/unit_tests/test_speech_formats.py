@@ -0,0 +1,92 @@
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from backend.speech.formats import AudioFormat, PCMConverter, Resampler, UnsupportedAudio, sniff_format
+
+RATE = 16000
+
+
+def sine(seconds, rate, frequency=440):
+    t = np.arange(int(seconds * rate)) / rate
+    return (0.3 * np.sin(2 * np.pi * frequency * t) * 32767).astype(np.int16)
+
+
+def make_wav(samples, rate, channels=1):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+    return buf.getvalue()
+
+
+def test_sniff_wav_header():
+    wav = make_wav(sine(0.1, 44100).repeat(2), 44100, channels=2)
+
+    fmt = sniff_format(wav[:64])
+
+    assert (fmt.container, fmt.sample_rate, fmt.channels, fmt.data_offset) == ("wav", 44100, 2, 44)
+    assert fmt.data_bytes == len(wav) - 44
+    assert sniff_format(wav[:20]) is None
+    assert sniff_format(wav[:20], complete=True).container == "wav-unknown"
+
+
+def test_sniff_compressed_and_raw():
+    assert sniff_format(b"\x1a\x45\xdf\xa3" + bytes(60), "audio/pcm").container == "webm"
+    assert sniff_format(b"OggS" + bytes(60)).container == "ogg"
+    assert not sniff_format(bytes(64), "application/octet-stream").is_pcm
+
+    fmt = sniff_format(bytes(64), "audio/L16; rate=8000; channels=2")
+    assert (fmt.container, fmt.sample_rate, fmt.channels, fmt.big_endian) == ("pcm", 8000, 2, True)
+    assert sniff_format(bytes(64), "audio/pcm").sample_rate == RATE
+
+
+def test_odd_rates_are_not_converted_in_process():
+    # 16001 Hz would need a filter with 320,000 taps
+    assert sniff_format(make_wav(sine(0.1, 16001), 16001)).container == "wav-16001hz-1ch"
+    assert not sniff_format(make_wav(sine(0.1, 16001), 16001)).is_pcm
+    with pytest.raises(UnsupportedAudio):
+        sniff_format(bytes(64), "audio/pcm; rate=16001")
+    with pytest.raises(UnsupportedAudio):
+        sniff_format(bytes(64), "audio/pcm; rate=16000; channels=64")
+    with pytest.raises(UnsupportedAudio):
+        Resampler(16001)
+
+
+def test_resampler_is_chunking_independent():
+    samples = sine(1, 44100).astype(np.float64)
+
+    whole = Resampler(44100)
+    expected = np.concatenate([whole.process(samples), whole.flush()])
+    chunked = Resampler(44100)
+    parts = [chunked.process(samples[i:i + 1001]) for i in range(0, len(samples), 1001)]
+
+    assert len(expected) == RATE
+    assert np.array_equal(np.concatenate(parts + [chunked.flush()]), expected)
+    # a 440 Hz tone stays a 440 Hz tone
+    assert np.abs(expected[200:-200] - sine(1, RATE)[200:-200]).max() < 20
+
+
+def test_converter_passes_target_format_through():
+    pcm = sine(0.5, RATE).tobytes()
+    converter = PCMConverter(AudioFormat("pcm"))
+
+    assert converter.push(pcm) is pcm
+    assert converter.flush() == b""
+
+
+def test_converter_downmixes_and_skips_header():
+    left = sine(0.5, RATE)
+    stereo = np.stack([left, np.zeros_like(left)], axis=1).reshape(-1)
+    wav = make_wav(stereo, RATE, channels=2) + b"LIST\x04\x00\x00\x00info"
+    converter = PCMConverter(sniff_format(wav))
+
+    # odd chunk sizes split samples and frames
+    out = b"".join(converter.push(wav[i:i + 333]) for i in range(0, len(wav), 333)) + converter.flush()
+
+    assert len(out) == len(left) * 2
+    assert np.abs(np.frombuffer(out, dtype="<i2") - left / 2).max() <= 1
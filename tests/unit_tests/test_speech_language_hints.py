@@ -0,0 +1,79 @@
+import time
+
+from backend.speech.language_hints import LanguageHintCache
+from backend.speech.recognition import RecognizedSegment
+
+
+def detected(*languages, confidence=None):
+    return [RecognizedSegment(text="text", language=language, confidence=confidence) for language in languages]
+
+
+def test_hint_after_min_samples():
+    cache = LanguageHintCache(min_samples=3)
+
+    for _ in range(2):
+        cache.record("alice", detected("de-DE"))
+        assert cache.lookup("alice") is None
+
+    cache.record("alice", detected("de-DE"))
+    assert cache.lookup("alice") == ["de-DE"]
+    assert cache.stats()["hints_used"] == 1
+    assert cache.stats()["single_language"] == 1
+
+
+def test_hint_keeps_most_frequent_languages():
+    cache = LanguageHintCache(min_samples=1, max_languages=2)
+    cache.record("alice", detected("de-DE", "en-US"))
+    cache.record("alice", detected("de-DE"))
+    cache.record("alice", detected("tr-TR"))
+    cache.record("alice", detected("en-US"))
+
+    assert cache.lookup("alice") == ["de-DE", "en-US"]
+
+
+def test_single_fixed_language_is_recorded_from_hint():
+    cache = LanguageHintCache(min_samples=2)
+    cache.record("alice", detected(None, None), hint=["fr-FR"])
+    cache.record("alice", detected(None), hint=["fr-FR"])
+
+    assert cache.lookup("alice") == ["fr-FR"]
+
+
+def test_entries_expire_and_evict():
+    cache = LanguageHintCache(min_samples=1, max_users=2, ttl_seconds=0.05)
+    cache.record("alice", detected("de-DE"))
+    cache.record("bob", detected("en-US"))
+    cache.lookup("alice")
+    cache.record("carol", detected("pl-PL"))
+
+    assert cache.lookup("bob") is None
+    assert cache.stats()["evictions"] == 1
+
+    time.sleep(0.1)
+    assert cache.lookup("alice") is None
+    assert cache.stats()["users"] == 1
+
+
+def test_low_confidence_rejects_hint():
+    cache = LanguageHintCache(min_samples=1, min_confidence=0.5)
+    cache.record("alice", detected("de-DE"))
+
+    assert cache.is_confident(detected("de-DE", confidence=0.9))
+    assert cache.is_confident(detected("de-DE"))
+    assert not cache.is_confident(detected("de-DE", confidence=0.2))
+    assert not cache.is_confident([])
+
+    cache.reject("alice")
+    assert cache.lookup("alice") is None
+    assert cache.stats()["fallbacks"] == 1
+
+
+def test_disabled_or_anonymous():
+    cache = LanguageHintCache(enabled=False, min_samples=1)
+    cache.record("alice", detected("de-DE"))
+    assert cache.lookup("alice") is None
+
+    cache = LanguageHintCache(min_samples=1)
+    cache.record(None, detected("de-DE"))
+    assert cache.lookup(None) is None
+    assert cache.stats()["lookups"] == 0
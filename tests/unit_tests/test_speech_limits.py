@@ -0,0 +1,56 @@
+import pytest
+
+from backend.speech.decoders import PCMDecoder
+from backend.speech.formats import AudioFormat
+from backend.speech.limits import LimitedDecoder, UploadTooLarge, check_content_length, limited
+from test_speech_decoders import body
+
+SECOND = 32000 # bytes of 16 kHz mono s16le
+
+
+def test_check_content_length():
+    check_content_length(None, 10)
+    check_content_length(10, 10)
+    check_content_length(10**9, 0)
+    with pytest.raises(UploadTooLarge):
+        check_content_length(11, 10)
+
+
+@pytest.mark.asyncio
+async def test_limited_stops_reading_past_the_limit():
+    seen = []
+
+    with pytest.raises(UploadTooLarge):
+        async for chunk in limited(body(b"abc", b"def", b"ghi", b"jkl"), 7):
+            seen.append(chunk)
+
+    assert seen == [b"abc", b"def"]
+    assert [chunk async for chunk in limited(body(b"abc", b"def"), 0)] == [b"abc", b"def"]
+
+
+def test_limited_decoder_decode():
+    decoder = LimitedDecoder(PCMDecoder(AudioFormat("pcm")), max_seconds=1)
+
+    assert len(decoder.decode(bytes(SECOND))) == SECOND
+    with pytest.raises(UploadTooLarge, match="longer than 1 seconds"):
+        decoder.decode(bytes(SECOND + 2))
+    assert decoder.name == "pcm"
+
+
+@pytest.mark.asyncio
+async def test_limited_decoder_stops_streaming_at_the_limit():
+    decoder = LimitedDecoder(PCMDecoder(AudioFormat("pcm")), max_seconds=1)
+    chunks = [bytes(SECOND // 4)] * 20
+    fed = []
+
+    async def upload():
+        async for chunk in body(*chunks):
+            fed.append(chunk)
+            yield chunk
+
+    frames = []
+    with pytest.raises(UploadTooLarge):
+        await decoder.stream(upload(), frames.append)
+
+    assert sum(len(frame) for frame in frames) == SECOND
+    assert len(fed) < len(chunks)
@@ -0,0 +1,98 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from backend.speech.local import LocalRecognizerBackend
+from backend.speech.recognition import recognize_continuous, recognize_once
+
+RATE = 16000
+
+
+def audio(seconds, seed=0):
+    return np.random.default_rng(seed).integers(-3000, 3000, int(seconds * RATE), dtype=np.int16).tobytes()
+
+
+@pytest.mark.asyncio
+async def test_push_recognizer_is_deterministic():
+    backend = LocalRecognizerBackend(["de-DE", "en-US"], connect_seconds=0, rtf=0, segment_seconds=1.0)
+    transcripts = []
+    for _ in range(2):
+        entry = backend.create_push(preconnect=True)
+        partials = []
+        recognition = asyncio.ensure_future(recognize_continuous(entry.recognizer, on_recognizing=partials.append))
+        entry.push_stream.write(audio(1.6))
+        entry.push_stream.close()
+        transcripts.append(await recognition)
+
+    first, second = transcripts
+    assert [segment.text for segment in first] == [segment.text for segment in second]
+    assert len(first) == 2
+    assert partials
+    assert (first[0].language, first[0].confidence) == ("de-DE", 0.9)
+
+
+@pytest.mark.asyncio
+async def test_pull_recognizer_uses_narrowed_language():
+    backend = LocalRecognizerBackend(["de-DE", "en-US"], connect_seconds=0, rtf=0)
+
+    segments = await recognize_continuous(backend.create_pull(audio(0.5), languages=["en-US"]))
+
+    assert [segment.language for segment in segments] == ["en-US"]
+
+
+@pytest.mark.asyncio
+async def test_cancellation_stops_recognizer():
+    backend = LocalRecognizerBackend(["de-DE"], connect_seconds=0, rtf=1.0)
+    entry = backend.create_push()
+    entry.push_stream.write(audio(10))
+
+    recognition = asyncio.ensure_future(recognize_continuous(entry.recognizer))
+    await asyncio.sleep(0.2)
+    recognition.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await recognition
+    assert not entry.recognizer._thread.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_simulated_service_error():
+    backend = LocalRecognizerBackend(["de-DE"], connect_seconds=0, rtf=0, segment_seconds=0.5, fail_after_seconds=1.0)
+
+    segments = await recognize_continuous(backend.create_pull(audio(3)))
+
+    assert len(segments) == 1
+
+
+@pytest.mark.asyncio
+async def test_single_shot_matches_continuous_on_short_clip():
+    backend = LocalRecognizerBackend(["de-DE", "en-US"], connect_seconds=0, rtf=0)
+    clip = audio(2.0)
+
+    once = await recognize_once(backend.create_once(clip))
+    continuous = await recognize_continuous(backend.create_pull(clip))
+
+    assert [segment.text for segment in once] == [segment.text for segment in continuous]
+    assert await recognize_once(backend.create_once(b"")) == []
+
+
+@pytest.mark.asyncio
+async def test_single_shot_waits_without_a_thread():
+    # rtf 0.5: each 1 s clip takes the service half a second
+    backend = LocalRecognizerBackend(["de-DE"], connect_seconds=0, rtf=0.5)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    results = await asyncio.gather(*(recognize_once(backend.create_once(audio(1, seed))) for seed in range(4)))
+
+    # in parallel, not one after another
+    assert all(len(segments) == 1 for segments in results)
+    assert loop.time() - start < 1.5
+
+
+def test_single_shot_follows_at_start_language_limit():
+    backend = LocalRecognizerBackend(["de-DE", "en-US", "fr-FR", "it-IT", "es-ES"])
+
+    assert not backend.supports_single_shot()
+    assert backend.supports_single_shot(["de-DE", "en-US"])
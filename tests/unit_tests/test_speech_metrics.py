@@ -0,0 +1,54 @@
+import time
+
+from backend.speech.metrics import Histogram, RequestTimer, TranscriptionMetrics
+
+
+def test_request_timer_report():
+    timer = RequestTimer()
+    with timer.measure("decode"):
+        time.sleep(0.02)
+    timer.mark("first_segment")
+    timer.mark("first_segment")
+
+    report = timer.report(audio_seconds=2.0)
+
+    assert report["decode_seconds"] >= 0.02
+    assert report["first_segment_seconds"] >= report["decode_seconds"]
+    assert abs(report["rtf"] - report["total_seconds"] / 2.0) <= 0.001
+    assert "body_read_seconds" not in report
+    assert "rtf" not in RequestTimer().report(audio_seconds=0)
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = Histogram([1.0, 5.0])
+    for value in (0.5, 1.0, 2.0, 10.0):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+
+    assert snapshot["buckets"] == {"1.0": 2, "5.0": 3, "+Inf": 4}
+    assert snapshot["count"] == 4 and snapshot["sum"] == 13.5
+    assert snapshot["p50"] == 2.0 and snapshot["p99"] == 10.0
+
+
+def test_transcription_metrics_observe():
+    metrics = TranscriptionMetrics()
+    metrics.observe({"total_seconds": 1.2, "rtf": 0.4, "unknown": 1})
+
+    stats = metrics.stats()
+
+    assert stats["total_seconds"]["count"] == 1
+    assert stats["rtf"]["p50"] == 0.4
+    assert stats["decode_seconds"]["count"] == 0
+
+
+def test_transcription_metrics_by_strategy():
+    metrics = TranscriptionMetrics()
+    metrics.observe({"total_seconds": 0.4}, "single_shot")
+    metrics.observe({"total_seconds": 3.0}, "continuous")
+    metrics.observe({"total_seconds": 0.6}, "single_shot")
+
+    by_strategy = metrics.stats()["total_seconds_by_strategy"]
+
+    assert by_strategy["single_shot"]["count"] == 2
+    assert by_strategy["continuous"]["p50"] == 3.0
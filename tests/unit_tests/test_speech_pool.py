@@ -0,0 +1,87 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from backend.speech.pool import RecognizerPool
+from backend.speech.recognition import SpeechRecognizerFactory
+
+
+class FakeEntry:
+    def __init__(self, preconnected):
+        self.preconnected = preconnected
+        self.created_at = time.monotonic()
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+async def settle():
+    await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_pool_hit_after_warmup():
+    pool = RecognizerPool(FakeEntry, size=2)
+    await pool.start()
+    await settle()
+
+    entry = await pool.acquire()
+
+    assert entry.preconnected
+    assert pool.stats() == {"size": 2, "idle": 1, "hits": 1, "misses": 0, "expired": 0}
+    await settle()
+    assert pool.stats()["idle"] == 2
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_miss_builds_on_demand():
+    pool = RecognizerPool(FakeEntry, size=0)
+    await pool.start()
+
+    entry = await pool.acquire()
+
+    assert not entry.preconnected
+    assert pool.stats()["misses"] == 1
+    assert pool.stats()["idle"] == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_discards_stale_entries():
+    pool = RecognizerPool(FakeEntry, size=1, max_idle_seconds=0.01)
+    await pool.start()
+    await settle()
+    stale = pool._idle[0]
+
+    await asyncio.sleep(0.02)
+    entry = await pool.acquire()
+
+    assert entry is not stale
+    assert stale.closed
+    assert pool.stats()["expired"] == 1
+    assert pool.stats()["misses"] == 1
+    await pool.close()
+
+
+def test_factory_builds_push_recognizer():
+    factory = SpeechRecognizerFactory(SimpleNamespace(key="dummy", region="westeurope", languages=["de-DE", "en-US"]))
+
+    entry = factory.create_push()
+
+    assert entry.connection is None
+    assert entry.recognizer is not None
+    entry.close()
+
+
+def test_factory_narrows_candidate_languages():
+    factory = SpeechRecognizerFactory(SimpleNamespace(key="dummy", region="westeurope", languages=["de-DE", "en-US", "tr-TR"]))
+
+    single = factory.create_push(languages=["de-DE"])
+    narrowed = factory.create_push(languages=["de-DE", "en-US"])
+    factory.create_push(languages=["de-DE", "en-US"])
+
+    assert single.recognizer is not None and narrowed.recognizer is not None
+    assert list(factory._narrowed) == [("de-DE",), ("de-DE", "en-US")]
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+import azure.cognitiveservices.speech as speechsdk
+
+from backend.speech.recognition import MemoryPCMCallback, _segment, recognize_continuous
+
+
+class _Signal:
+    def __init__(self):
+        self.callbacks = []
+
+    def connect(self, cb):
+        self.callbacks.append(cb)
+
+    def fire(self, evt):
+        for cb in self.callbacks:
+            cb(evt)
+
+
+class FakeRecognizer:
+    '''Emits events from a background thread, the way the Speech SDK does.'''
+
+    def __init__(self, segments, delay=0.05):
+        self.segments = segments
+        self.delay = delay
+        self.recognized = _Signal()
+        self.session_stopped = _Signal()
+        self.canceled = _Signal()
+        self.stopped = False
+
+    def _run(self):
+        for text in self.segments:
+            time.sleep(self.delay)
+            self.recognized.fire(SimpleNamespace(
+                result=SimpleNamespace(reason=speechsdk.ResultReason.RecognizedSpeech, text=text)
+            ))
+        self.session_stopped.fire(SimpleNamespace())
+
+    def start_continuous_recognition(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop_continuous_recognition(self):
+        self.stopped = True
+
+
+@pytest.mark.asyncio
+async def test_recognize_continuous_collects_segments():
+    recognizer = FakeRecognizer(["hello", "world"])
+    segments = await recognize_continuous(recognizer)
+
+    assert [segment.text for segment in segments] == ["hello", "world"]
+    assert recognizer.stopped
+
+
+@pytest.mark.asyncio
+async def test_recognize_continuous_does_not_block_loop():
+    recognizers = [FakeRecognizer([str(i)], delay=0.2) for i in range(10)]
+
+    start = time.monotonic()
+    results = await asyncio.gather(*(recognize_continuous(r) for r in recognizers))
+
+    assert [[segment.text for segment in segments] for segments in results] == [[str(i)] for i in range(10)]
+    assert time.monotonic() - start < 1.0
+
+
+def test_segment_reads_language_and_confidence():
+    result = SimpleNamespace(text="hallo welt", properties={
+        speechsdk.PropertyId.SpeechServiceConnection_AutoDetectSourceLanguageResult: "de-DE",
+        speechsdk.PropertyId.SpeechServiceResponse_JsonResult: json.dumps({"NBest": [{"Confidence": 0.87}]}),
+    })
+
+    segment = _segment(result)
+
+    assert (segment.text, segment.language, segment.confidence) == ("hallo welt", "de-DE", 0.87)
+    assert _segment(SimpleNamespace(text="hi", properties={})).confidence is None
+
+
+def test_memory_pcm_callback_read():
+    cb = MemoryPCMCallback(b"\x01\x02\x03\x04\x05")
+    buffer = memoryview(bytearray(4))
+
+    assert cb.read(buffer) == 4
+    assert bytes(buffer) == b"\x01\x02\x03\x04"
+    assert cb.read(buffer) == 1
+    assert cb.read(buffer) == 0
+
+
+def test_memory_pcm_callback_reads_bytearray_until_closed():
+    pcm = bytearray(range(10))
+    cb = MemoryPCMCallback(pcm)
+    buffer = memoryview(bytearray(4))
+
+    assert cb.read(buffer) == 4
+    assert bytes(buffer) == bytes(range(4))
+    cb.close()
+    assert cb.read(buffer) == 0
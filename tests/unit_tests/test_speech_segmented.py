@@ -0,0 +1,97 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from backend.speech.recognition import PushRecognizer
+from backend.speech.segmented import PCMSegmenter, SegmentedRecognition, split_at_silence
+from backend.speech.vad import pcm_seconds
+from test_speech_streaming import FakePushStream, FakeStreamingRecognizer
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * RATE), dtype=np.int16)
+
+
+def test_short_audio_passes_through_immediately():
+    segmenter = PCMSegmenter(max_segment_seconds=10, lookback_seconds=2)
+    pcm = tone(3).tobytes()
+
+    assert segmenter.push(pcm) == [(0, pcm, False)]
+    assert segmenter.flush() == [(0, b"", True)]
+
+
+def test_split_at_longest_pause_before_limit():
+    # speech up to 8.5s with a pause at 6.0-6.6s (inside the 5s lookback of a 10s segment)
+    pcm = np.concatenate([tone(6), silence(0.6), tone(2), silence(0.2), tone(7)]).tobytes()
+
+    segments = split_at_silence(pcm, max_segment_seconds=10, lookback_seconds=5)
+
+    assert b"".join(segments) == pcm
+    assert len(segments) == 2
+    assert abs(pcm_seconds(len(segments[0])) - 6.3) < 0.05
+
+
+def test_split_hard_without_pause():
+    pcm = tone(25).tobytes()
+
+    segments = split_at_silence(pcm, max_segment_seconds=10, lookback_seconds=2)
+
+    assert b"".join(segments) == pcm
+    assert [round(pcm_seconds(len(segment)), 2) for segment in segments] == [9.99, 9.99, 5.02]
+
+
+def test_frame_by_frame_matches_whole_buffer():
+    pcm = np.concatenate([tone(6), silence(0.6), tone(2), silence(0.2), tone(7)]).tobytes()
+    segmenter = PCMSegmenter(max_segment_seconds=10, lookback_seconds=5)
+
+    pieces = []
+    for offset in range(0, len(pcm), 640):
+        pieces += segmenter.push(bytearray(pcm[offset:offset + 640]))
+    pieces += segmenter.flush()
+
+    assert all(type(piece) is bytes for _, piece, _ in pieces)
+    segments = [b"".join(piece for index, piece, _ in pieces if index == i) for i in range(2)]
+    assert segments == split_at_silence(pcm, max_segment_seconds=10, lookback_seconds=5)
+
+
+class Recognizers:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def acquire(self):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        push_stream = FakePushStream()
+        entry = PushRecognizer(push_stream=push_stream, recognizer=FakeStreamingRecognizer(push_stream))
+        entry.close = self.release
+        return entry
+
+    def release(self):
+        self.active -= 1
+
+
+@pytest.mark.asyncio
+async def test_segments_recognized_in_order_within_limits():
+    recognizers = Recognizers()
+    worker_slots = asyncio.Semaphore(1)
+    recognition = SegmentedRecognition(recognizers.acquire, max_parallel=3, worker_slots=worker_slots)
+
+    for index, word in enumerate([b"one", b"two", b"three", b"four"]):
+        recognition.feed(index, word, False)
+    for index in range(4):
+        recognition.feed(index, b"", True)
+    segments = await recognition.result()
+
+    assert [segment.text for segment in segments] == ["one", "two", "three", "four"]
+    # the first segment plus one worker-wide slot for the rest
+    assert recognizers.peak == 2
+    assert recognizers.active == 0
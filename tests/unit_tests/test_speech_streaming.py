@@ -0,0 +1,173 @@
+import asyncio
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+import azure.cognitiveservices.speech as speechsdk
+
+from backend.speech.decoders import FFmpegSubprocessDecoder, PCMDecoder
+from backend.speech.formats import AudioFormat
+from backend.speech.metrics import RequestTimer
+from backend.speech.streaming import decode_and_recognize, decode_short_clip
+
+# stand-in for FFmpeg: copies stdin to stdout unchanged
+PASSTHROUGH_ARGS = [sys.executable, "-c", "import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer)"]
+PASSTHROUGH = FFmpegSubprocessDecoder(PASSTHROUGH_ARGS)
+PCM = PCMDecoder(AudioFormat("pcm"))
+
+
+async def body(*chunks, delay=0.0):
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
+
+
+class _Signal:
+    def __init__(self):
+        self.callbacks = []
+
+    def connect(self, cb):
+        self.callbacks.append(cb)
+
+    def fire(self, evt):
+        for cb in self.callbacks:
+            cb(evt)
+
+
+class FakePushStream:
+    def __init__(self):
+        self.frames = []
+        self.closed = threading.Event()
+
+    def write(self, frame):
+        self.frames.append(frame)
+
+    def close(self):
+        self.closed.set()
+
+
+class FakeStreamingRecognizer:
+    '''Recognizes everything written to the push stream once it is closed.'''
+
+    def __init__(self, push_stream):
+        self.push_stream = push_stream
+        self.recognizing = _Signal()
+        self.recognized = _Signal()
+        self.session_stopped = _Signal()
+        self.canceled = _Signal()
+        self.started_with_frames = None
+
+    def _run(self):
+        self.push_stream.closed.wait()
+        text = b"".join(self.push_stream.frames).decode()
+        self.recognizing.fire(SimpleNamespace(
+            result=SimpleNamespace(reason=speechsdk.ResultReason.RecognizingSpeech, text=text.split()[0])
+        ))
+        self.recognized.fire(SimpleNamespace(
+            result=SimpleNamespace(reason=speechsdk.ResultReason.RecognizedSpeech, text=text)
+        ))
+        self.session_stopped.fire(SimpleNamespace())
+
+    def start_continuous_recognition(self):
+        self.started_with_frames = len(self.push_stream.frames)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop_continuous_recognition(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_decode_and_recognize_starts_on_first_frame():
+    push_stream = FakePushStream()
+    recognizer = FakeStreamingRecognizer(push_stream)
+
+    segments = await decode_and_recognize(
+        body(b"hello ", b"world", delay=0.05), push_stream, recognizer, decoder=PASSTHROUGH
+    )
+
+    assert [segment.text for segment in segments] == ["hello world"]
+    assert recognizer.started_with_frames == 1
+    assert push_stream.closed.is_set()
+
+
+@pytest.mark.asyncio
+async def test_decode_and_recognize_reports_partial_and_final_text():
+    push_stream = FakePushStream()
+    recognizer = FakeStreamingRecognizer(push_stream)
+    events = []
+
+    await decode_and_recognize(
+        body(b"hello ", b"world"),
+        push_stream,
+        recognizer,
+        decoder=PASSTHROUGH,
+        on_recognizing=lambda text: events.append(("partial", text)),
+        on_recognized=lambda text: events.append(("final", text)),
+    )
+
+    assert events == [("partial", "hello"), ("final", "hello world")]
+
+
+@pytest.mark.asyncio
+async def test_decode_and_recognize_keeps_sent_audio():
+    push_stream = FakePushStream()
+    recognizer = FakeStreamingRecognizer(push_stream)
+    sent_audio = bytearray()
+
+    await decode_and_recognize(
+        body(b"hello ", b"world"), push_stream, recognizer, decoder=PASSTHROUGH, sent_audio=sent_audio
+    )
+
+    assert sent_audio == b"hello world"
+
+
+@pytest.mark.asyncio
+async def test_decode_and_recognize_records_stages():
+    push_stream = FakePushStream()
+    recognizer = FakeStreamingRecognizer(push_stream)
+    timer = RequestTimer()
+
+    await decode_and_recognize(body(b"hello"), push_stream, recognizer, decoder=PASSTHROUGH, timer=timer)
+
+    assert set(timer.durations) == {"decode", "recognition"}
+    assert "first_segment" in timer.marks
+
+
+@pytest.mark.asyncio
+async def test_decode_and_recognize_without_audio():
+    push_stream = FakePushStream()
+    recognizer = FakeStreamingRecognizer(push_stream)
+
+    assert await decode_and_recognize(body(), push_stream, recognizer, decoder=PASSTHROUGH) == []
+    assert recognizer.started_with_frames is None
+
+
+@pytest.mark.asyncio
+async def test_decode_short_clip_returns_whole_short_clip():
+    pcm_bytes, frames = await decode_short_clip(body(b"ab" * 100, b"cd" * 100), PCM, max_seconds=1.0)
+
+    assert pcm_bytes == b"ab" * 100 + b"cd" * 100
+    assert frames is None
+
+
+@pytest.mark.asyncio
+async def test_decode_short_clip_streams_long_clip():
+    second = b"\x01\x00" * 16000
+    pcm_bytes, frames = await decode_short_clip(body(second, second, second, delay=0.01), PCM, max_seconds=1.5)
+
+    assert pcm_bytes is None
+    assert b"".join([frame async for frame in frames]) == second * 3
+
+
+@pytest.mark.asyncio
+async def test_handoff_keeps_decode_timing_of_long_clip():
+    second = b"ab" * 16000
+    timer = RequestTimer()
+    pcm_bytes, frames = await decode_short_clip(body(second, second, second, delay=0.1), PCM, 1.5, timer=timer)
+    await asyncio.sleep(0.15) # e.g. waiting for a recognizer, the upload ends meanwhile
+    push_stream = FakePushStream()
+
+    await decode_and_recognize(frames, push_stream, FakeStreamingRecognizer(push_stream), decoder=PCM, timer=timer, decode_stage="handoff")
+
+    assert timer.durations["decode"] >= 0.25
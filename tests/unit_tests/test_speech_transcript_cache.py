@@ -0,0 +1,63 @@
+import asyncio
+import os
+
+import pytest
+
+from backend.speech.transcript_cache import TranscriptCache
+
+
+async def body(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_memory_lru():
+    cache = TranscriptCache(["de-DE"], max_entries=2)
+    for name in ("a", "b", "c"):
+        await cache.put(cache.key(name.encode()), {"text": name})
+
+    assert await cache.get(cache.key(b"a")) is None
+    assert await cache.get(cache.key(b"c")) == {"text": "c"}
+    assert cache.stats() == {"entries": 2, "memory_hits": 1, "disk_hits": 0, "misses": 1}
+
+
+def test_key_covers_recognition_config():
+    assert TranscriptCache(["de-DE"]).key(b"clip") != TranscriptCache(["de-DE", "en-US"]).key(b"clip")
+    assert TranscriptCache(["de-DE"]).key(b"clip") == TranscriptCache(["de-DE"]).key(b"clip")
+
+
+@pytest.mark.asyncio
+async def test_hashed_body_resolves_key():
+    cache = TranscriptCache(["de-DE"])
+    key = asyncio.get_running_loop().create_future()
+
+    received = [chunk async for chunk in cache.hashed(body(b"we", b"bm"), key)]
+
+    assert received == [b"we", b"bm"]
+    assert key.result() == cache.key(b"webm")
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_is_shared(tmp_path):
+    writer = TranscriptCache(["de-DE"], directory=str(tmp_path))
+    reader = TranscriptCache(["de-DE"], directory=str(tmp_path))
+    key = writer.key(b"clip")
+    await writer.put(key, {"text": "hallo"})
+
+    assert await reader.get(key) == {"text": "hallo"}
+    assert await reader.get(key) == {"text": "hallo"}
+    assert reader.stats()["disk_hits"] == 1
+    assert reader.stats()["memory_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_entries_expire(tmp_path):
+    cache = TranscriptCache(["de-DE"], max_entries=0, ttl_seconds=60, directory=str(tmp_path))
+    key = cache.key(b"clip")
+    await cache.put(key, {"text": "old"})
+    os.utime(tmp_path / f"{key}.json", (0, 0))
+
+    assert await cache.get(key) is None
+    cache._prune()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,87 @@
+import numpy as np
+
+from backend.speech import vad
+from backend.speech.vad import SilenceTrimmer, classify_frames, contains_speech, pcm_seconds, trim_silence
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16)
+
+
+def silence(seconds):
+    # -70 dBFS background noise
+    noise = np.random.default_rng(0).normal(0, 10, int(seconds * RATE))
+    return noise.astype(np.int16)
+
+
+def clip():
+    # 1s silence, 0.5s speech, 3s pause, 0.5s speech, 1s silence
+    return np.concatenate([silence(1), tone(0.5), silence(3), tone(0.5), silence(1)]).tobytes()
+
+
+def test_classify_frames():
+    samples = np.concatenate([silence(0.3), tone(0.3)])
+
+    speech = classify_frames(samples, 480, -45.0)
+
+    assert not speech[:10].any()
+    assert speech[10:].all()
+
+
+def test_classify_frames_in_blocks(monkeypatch):
+    samples = np.frombuffer(clip(), dtype=np.int16)
+    whole = classify_frames(samples, 480, -45.0)
+
+    monkeypatch.setattr(vad, "CLASSIFY_BLOCK_FRAMES", 7)
+
+    assert (classify_frames(samples, 480, -45.0) == whole).all()
+
+
+def test_contains_speech():
+    assert contains_speech(clip())
+    assert not contains_speech(silence(2).tobytes())
+    assert not contains_speech(b"")
+
+
+def test_trim_silence_strips_edges_and_collapses_pauses():
+    pcm = clip()
+
+    trimmed = trim_silence(pcm, max_pause_ms=600, padding_ms=300)
+
+    assert pcm_seconds(len(pcm)) == 6
+    # 0.3 padding + 0.5 speech + (0.3 + 0.6 + 0.3) pause + 0.5 speech + 0.3 padding
+    assert abs(pcm_seconds(len(trimmed)) - 2.8) < 0.1
+
+
+def test_trim_silence_without_speech():
+    assert trim_silence(silence(2).tobytes()) == b""
+
+
+def test_trim_silence_without_pauses():
+    pcm = tone(2).tobytes()
+
+    assert trim_silence(pcm) == pcm
+
+
+def test_silence_trimmer_streaming():
+    pcm = clip()
+    trimmer = SilenceTrimmer(max_pause_ms=600, padding_ms=300)
+
+    out = b"".join(trimmer.push(pcm[i:i + 3200]) for i in range(0, len(pcm), 3200)) + trimmer.flush()
+
+    assert trimmer.received_seconds == 6
+    assert trimmer.sent_seconds == pcm_seconds(len(out))
+    # 0.3 lead-in + 0.5 speech + 0.6 pause + 0.5 speech + 0.6 trailing pause
+    assert abs(trimmer.sent_seconds - 2.5) < 0.1
+    assert trimmer.stats() == {"received_seconds": 6.0, "sent_seconds": round(trimmer.sent_seconds, 2)}
+
+
+def test_silence_trimmer_disabled_passes_through():
+    pcm = clip()
+    trimmer = SilenceTrimmer(enabled=False)
+
+    assert trimmer.push(pcm) + trimmer.flush() == pcm
+    assert trimmer.sent_seconds == trimmer.received_seconds == 6
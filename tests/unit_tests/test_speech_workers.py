@@ -0,0 +1,79 @@
+import httpx
+import pytest
+
+from backend.speech.workers import SpeechWorkerClient, SpeechWorkerPool, forwarded_headers
+
+
+async def body(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def speech_workers(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/transcribe/metrics":
+        return httpx.Response(200, json={"admission": {"queued": 0}})
+    audio = request.read()
+    if len(audio) > 8:
+        return httpx.Response(429, json={"text": "", "error": "busy"}, headers={"Retry-After": "3"})
+    return httpx.Response(200, json={
+        "text": audio.decode(), "user": request.headers.get("x-ms-client-principal-id"),
+    })
+
+
+@pytest.mark.asyncio
+async def test_client_streams_upload_and_relays_result():
+    client = SpeechWorkerClient("/unused.sock", transport=httpx.MockTransport(speech_workers))
+
+    result, status, headers = await client.transcribe(body(b"hal", b"lo"), {"X-Ms-Client-Principal-Id": "user-1"})
+
+    assert (result, status, headers) == ({"text": "hallo", "user": "user-1"}, 200, {})
+    assert client.stats()["forwarded"] == 1
+    assert client.stats()["in_flight"] == 0
+    assert await client.metrics() == {"admission": {"queued": 0}}
+
+
+@pytest.mark.asyncio
+async def test_client_relays_rejection_with_retry_after():
+    client = SpeechWorkerClient("/unused.sock", transport=httpx.MockTransport(speech_workers))
+
+    result, status, headers = await client.transcribe(body(b"a" * 16), {})
+
+    assert status == 429
+    assert headers == {"retry-after": "3"}
+    assert client.stats()["statuses"] == {"429": 1}
+
+
+@pytest.mark.asyncio
+async def test_client_reports_unavailable_pool(tmp_path):
+    client = SpeechWorkerClient(str(tmp_path / "missing.sock"))
+
+    result, status, _ = await client.transcribe(body(b"audio"), {})
+
+    assert status == 503
+    assert client.stats()["failed"] == 1
+    assert await client.metrics() is None
+    await client.close()
+
+
+def test_forwarded_headers():
+    headers = {
+        "Content-Type": "multipart/form-data; boundary=x",
+        "Content-Length": "123",
+        "X-Ms-Client-Principal-Id": "user-1",
+        "Cookie": "session",
+    }
+
+    assert forwarded_headers(headers) == {
+        "Content-Type": "multipart/form-data; boundary=x", "Content-Length": "123", "X-Ms-Client-Principal-Id": "user-1",
+    }
+    assert forwarded_headers(headers, "audio/webm") == {"X-Ms-Client-Principal-Id": "user-1", "Content-Type": "audio/webm"}
+
+
+def test_pool_command_binds_socket():
+    pool = SpeechWorkerPool("/tmp/speech.sock", 3)
+
+    command = pool.command()
+
+    assert command[-1] == "app:app"
+    assert "unix:/tmp/speech.sock" in command and "3" in command
+    assert command[command.index("--worker-class") + 1] == "uvicorn.workers.UvicornWorker"
@@ -0,0 +1,86 @@
+import argparse
+import io
+import os
+import shutil
+import statistics
+import sys
+import time
+
+import numpy as np
+
+# Add parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.speech.decoders import FFmpegSubprocessDecoder, PyAVDecoder
+
+#Microbenchmark for the /transcribe audio decoders: decodes synthetic WebM/Opus voice notes of different lengths
+#with every available backend and reports throughput (seconds of audio decoded per wall-clock second) and latency percentiles.
+#usage: python tools/benchmark_decoders.py --durations 5 30 120 --iterations 50
+
+
+def make_webm(seconds, rate=48000):
+    import av
+
+    buf = io.BytesIO()
+    with av.open(buf, "w", format="webm") as container:
+        stream = container.add_stream("libopus", rate=rate)
+        stream.layout = "mono"
+        t = np.arange(int(seconds * rate)) / rate
+        #speech-like signal: a wobbling tone with bursts of noise and pauses
+        tone = np.sin(2 * np.pi * (180 + 40 * np.sin(2 * np.pi * 3 * t)) * t)
+        envelope = (np.sin(2 * np.pi * 0.5 * t) > -0.3).astype(np.float64)
+        noise = np.random.default_rng(0).normal(0, 0.05, len(t))
+        samples = (np.clip(0.4 * tone * envelope + noise, -1, 1) * 32767).astype(np.int16)
+        for i in range(0, len(samples), 960):
+            frame = av.AudioFrame.from_ndarray(samples[i:i + 960].reshape(1, -1), format="s16", layout="mono")
+            frame.rate = rate
+            frame.pts = i
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buf.getvalue()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run(decoder, webm, iterations):
+    decoder.decode(webm) #warm up
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        decoder.decode(webm)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the /transcribe audio decoders")
+    parser.add_argument("--durations", type=float, nargs="+", default=[5, 30, 120])
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    decoders = [PyAVDecoder()]
+    if shutil.which("ffmpeg"):
+        decoders.append(FFmpegSubprocessDecoder())
+    else:
+        print("ffmpeg binary not found, skipping the subprocess decoder")
+
+    print(f"{'decoder':<8} {'clip':>6} {'x realtime':>11} {'p50 ms':>8} {'p99 ms':>8}")
+    for seconds in args.durations:
+        webm = make_webm(seconds)
+        for decoder in decoders:
+            latencies = run(decoder, webm, args.iterations)
+            throughput = seconds * len(latencies) / sum(latencies)
+            print(
+                f"{decoder.name:<8} {seconds:>5.0f}s {throughput:>10.0f}x "
+                f"{statistics.median(latencies) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
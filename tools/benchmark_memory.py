@@ -0,0 +1,111 @@
+import argparse
+import asyncio
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import azure.cognitiveservices.speech as speechsdk
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark_decoders import make_webm
+from backend.speech.decoders import PyAVDecoder
+from backend.speech.local import LocalRecognizer, PullCallbackStream
+from backend.speech.recognition import MemoryPCMCallback, recognize_continuous
+from backend.speech.vad import trim_silence
+
+#Peak memory of concurrent buffered transcriptions: decodes the same WebM clip N times at once, trims silence and
+#recognizes it through a pull stream with the in-process recognizer, then reports the growth of the peak RSS per
+#transcription. "before" copies the decoded PCM into bytes and reads it through a BytesIO callback (one new bytes
+#object per SDK read), "after" is the current path. Each variant runs in its own process, since peak RSS only grows.
+#usage: python tools/benchmark_memory.py --seconds 120 --concurrency 8
+#       python tools/benchmark_memory.py --clip recordings/long.webm --concurrency 16
+
+
+class BytesIOPCMCallback(speechsdk.audio.PullAudioInputStreamCallback):
+    '''The pull callback as it was before MemoryPCMCallback read through a memoryview.'''
+
+    def __init__(self, pcm_bytes: bytes):
+        super().__init__()
+        self._buf = io.BytesIO(pcm_bytes)
+
+    def read(self, buffer: memoryview) -> int:
+        chunk = self._buf.read(buffer.nbytes)
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+    def close(self) -> None:
+        self._buf.close()
+        super().close()
+
+
+def peak_rss_mb() -> float:
+    #VmHWM belongs to this process image, ru_maxrss on Linux also covers the parent's peak from before exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 1024)
+
+
+async def transcribe(webm, variant, decoder, executor):
+    loop = asyncio.get_running_loop()
+    pcm = await loop.run_in_executor(executor, decoder.decode, webm)
+    if variant == "before":
+        pcm = bytes(pcm)
+    pcm = await loop.run_in_executor(executor, trim_silence, pcm)
+    callback = BytesIOPCMCallback(pcm) if variant == "before" else MemoryPCMCallback(pcm)
+    recognizer = LocalRecognizer(PullCallbackStream(callback), "de-DE", connect_seconds=0, rtf=0.01)
+    return await recognize_continuous(recognizer, executor)
+
+
+async def measure(args):
+    with open(args.clip, "rb") as f:
+        webm = f.read()
+    decoder = PyAVDecoder()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        await transcribe(webm[:4096], args.variant, decoder, executor) # load libav and the SDK before the baseline
+        baseline = peak_rss_mb()
+        await asyncio.gather(*(transcribe(webm, args.variant, decoder, executor) for _ in range(args.concurrency)))
+    peak = peak_rss_mb()
+    print(f"{args.variant:<7} {peak:>12.1f} {(peak - baseline) / args.concurrency:>17.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS of concurrent buffered transcriptions")
+    parser.add_argument("--clip", help="recorded .webm clip, a synthetic one of --seconds otherwise")
+    parser.add_argument("--seconds", type=float, default=120)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--variant", choices=["before", "after"], help="run a single variant in this process")
+    args = parser.parse_args()
+
+    if args.variant:
+        asyncio.run(measure(args))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = args.clip
+        if not clip:
+            #generated here, so building it does not count towards the peak of the measuring processes
+            clip = os.path.join(tmp, "clip.webm")
+            with open(clip, "wb") as f:
+                f.write(make_webm(args.seconds))
+        print(f"{args.clip or f'synthetic {args.seconds:g}s clip'}, concurrency {args.concurrency}")
+        print(f"{'variant':<7} {'peak RSS MB':>12} {'MB/transcription':>17}")
+        sys.stdout.flush()
+        for variant in ("before", "after"):
+            subprocess.run([
+                sys.executable, __file__, "--variant", variant, "--clip", clip, "--concurrency", str(args.concurrency),
+            ], check=True)
+
+
+if __name__ == "__main__":
+    main()
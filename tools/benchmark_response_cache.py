@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import csv
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_decoders import percentile
+
+#Asks the golden set (sample_prompts.csv) twice against a running app and reports the latency of each pass. With
+#RESPONSE_CACHE_ENABLED=True the second pass is answered from the response cache, see GET /conversation/metrics.
+#usage: python tools/benchmark_response_cache.py --url http://localhost:50505 --concurrency 4 --limit 20
+
+
+def load_questions(path, limit):
+    with open(path, newline="", encoding="utf-8") as f:
+        questions = [row["Question"] for row in csv.DictReader(f)]
+    return questions[:limit] if limit else questions
+
+
+async def ask(client, url, question):
+    start = time.perf_counter()
+    cached = False
+    async with client.stream("POST", url, json={"messages": [{"role": "user", "content": question}]}) as response:
+        async for line in response.aiter_lines():
+            cached = cached or '"cached": true' in line or '"cached":true' in line
+    return time.perf_counter() - start, cached
+
+
+async def run_pass(client, url, questions, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(question):
+        async with semaphore:
+            return await ask(client, url, question)
+
+    return await asyncio.gather(*(one(question) for question in questions))
+
+
+async def main(args):
+    questions = load_questions(args.prompts, args.limit)
+    url = f"{args.url.rstrip('/')}/conversation"
+    print(f"{len(questions)} questions, concurrency {args.concurrency}")
+    print(f"{'pass':<6} {'p50 ms':>8} {'p90 ms':>8} {'mean ms':>8} {'cached':>7}")
+    async with httpx.AsyncClient(timeout=args.timeout) as client:
+        for name in ("first", "second"):
+            results = await run_pass(client, url, questions, args.concurrency)
+            seconds = [result[0] for result in results]
+            print(
+                f"{name:<6} {statistics.median(seconds) * 1000:>8.0f} {percentile(seconds, 90) * 1000:>8.0f} "
+                f"{statistics.mean(seconds) * 1000:>8.0f} {sum(result[1] for result in results):>7}"
+            )
+        metrics = await client.get(f"{args.url.rstrip('/')}/conversation/metrics")
+        print(metrics.json())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of repeated golden set questions with the response cache")
+    parser.add_argument("--url", default="http://localhost:50505")
+    parser.add_argument("--prompts", default=os.path.join(os.path.dirname(__file__), "..", "sample_prompts.csv"))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import collections
+import glob
+import itertools
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_decoders import make_webm, percentile
+
+#Load test for /transcribe: keeps N requests in flight against a running app, cycling through a folder of recorded
+#WebM clips (or synthetic ones), and reports throughput, latency percentiles and status codes.
+#To measure only our side of the pipeline, start the app with the in-process recognizer and without the transcript cache:
+#  AZURE_SPEECH_BACKEND=local AZURE_SPEECH_TRANSCRIPT_CACHE_SIZE=0 python -m quart run --port 50505
+#usage: python tools/benchmark_transcribe.py --clips recordings/ --concurrency 16 --requests 500
+#       python tools/benchmark_transcribe.py --synthetic 5 30 --concurrency 8
+
+
+def load_clips(args):
+    clips = []
+    if args.clips:
+        for path in sorted(glob.glob(os.path.join(args.clips, "*.webm"))):
+            with open(path, "rb") as f:
+                clips.append((os.path.basename(path), f.read()))
+    for seconds in args.synthetic or []:
+        clips.append((f"synthetic-{seconds:g}s", make_webm(seconds)))
+    return clips
+
+
+async def worker(client, url, requests, results):
+    for name, webm, user in requests:
+        headers = {"Content-Type": "audio/webm"}
+        if user:
+            headers["X-Ms-Client-Principal-Id"] = user
+        start = time.perf_counter()
+        try:
+            response = await client.post(url, content=webm, headers=headers)
+            status = response.status_code
+            body = response.json() if status == 200 else {}
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+            body = {}
+        results.append({
+            "clip": name,
+            "status": status,
+            "seconds": time.perf_counter() - start,
+            "audio_seconds": body.get("audio", {}).get("received_seconds", 0),
+            "cached": body.get("cached", False),
+        })
+
+
+async def run(args, clips):
+    users = [f"benchmark-user-{i}" for i in range(args.users)] if args.users else [None]
+    plan = zip(itertools.cycle(clips), itertools.cycle(users))
+    requests = [(name, webm, user) for (name, webm), user in itertools.islice(plan, args.requests)]
+    # deal the requests out round-robin so every worker keeps one in flight
+    shares = [requests[i::args.concurrency] for i in range(args.concurrency)]
+    results = []
+    url = args.url.rstrip("/") + "/transcribe"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, url, share, results) for share in shares))
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def report(results, elapsed):
+    ok = [r for r in results if r["status"] == 200]
+    statuses = collections.Counter(str(r["status"]) for r in results)
+    print(f"requests: {len(results)} in {elapsed:.1f}s, status: {dict(statuses)}")
+    if not ok:
+        return
+
+    latencies = [r["seconds"] for r in ok]
+    audio = sum(r["audio_seconds"] for r in ok)
+    print(f"throughput: {len(ok) / elapsed:.2f} req/s, {audio / elapsed:.1f} s of audio/s")
+    print(
+        f"latency ms: p50 {statistics.median(latencies) * 1000:.0f}  p90 {percentile(latencies, 90) * 1000:.0f}  "
+        f"p99 {percentile(latencies, 99) * 1000:.0f}  max {max(latencies) * 1000:.0f}"
+    )
+    cached = sum(1 for r in ok if r["cached"])
+    if cached:
+        print(f"warning: {cached} responses came from the transcript cache, set AZURE_SPEECH_TRANSCRIPT_CACHE_SIZE=0 on the server")
+
+    print(f"\n{'clip':<32} {'n':>5} {'p50 ms':>8} {'p99 ms':>8}")
+    by_clip = collections.defaultdict(list)
+    for r in ok:
+        by_clip[r["clip"]].append(r["seconds"])
+    for name, values in sorted(by_clip.items()):
+        print(f"{name:<32} {len(values):>5} {statistics.median(values) * 1000:>8.0f} {percentile(values, 99) * 1000:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive concurrent /transcribe requests against a running app")
+    parser.add_argument("--url", default="http://localhost:50505")
+    parser.add_argument("--clips", help="folder of recorded .webm clips")
+    parser.add_argument("--synthetic", type=float, nargs="+", help="also send synthetic clips of these lengths in seconds")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--users", type=int, default=0, help="spread requests over this many fake signed-in users")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    clips = load_clips(args)
+    if not clips:
+        parser.error("no clips: pass --clips with a folder of .webm files and/or --synthetic")
+
+    results, elapsed = asyncio.run(run(args, clips))
+    report(results, elapsed)
+
+
+if __name__ == "__main__":
+    main()
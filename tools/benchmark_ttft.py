@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+from azure.identity.aio import DefaultAzureCredential, get_bearer_token_provider
+from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark_decoders import percentile
+from backend.settings import app_settings
+
+#Time to first token of streamed chat completions against the configured Azure OpenAI deployment (AZURE_OPENAI_* settings),
+#with N requests in flight. "before" builds a new AsyncAzureOpenAI (and DefaultAzureCredential without a key) per request,
+#as send_chat_request used to, "after" shares one long-lived client with the tuned connection pool, as the app does now.
+#usage: python tools/benchmark_ttft.py --concurrency 8 --requests 64
+
+
+def endpoint():
+    return app_settings.azure_openai.endpoint or f"https://{app_settings.azure_openai.resource}.openai.azure.com/"
+
+
+def build_client(credential=None, http_client=None):
+    token_provider = None
+    if credential is not None:
+        token_provider = get_bearer_token_provider(credential, "https://cognitiveservices.azure.com/.default")
+    return AsyncAzureOpenAI(
+        api_version=app_settings.azure_openai.preview_api_version,
+        api_key=app_settings.azure_openai.key,
+        azure_ad_token_provider=token_provider,
+        azure_endpoint=endpoint(),
+        http_client=http_client,
+    )
+
+
+def shared_client(credential):
+    return build_client(credential, DefaultAsyncHttpxClient(limits=httpx.Limits(
+        max_connections=app_settings.azure_openai.max_connections,
+        max_keepalive_connections=app_settings.azure_openai.max_keepalive_connections,
+        keepalive_expiry=app_settings.azure_openai.keepalive_expiry_seconds,
+    )))
+
+
+async def first_token(client, prompt):
+    start = time.perf_counter()
+    stream = await client.chat.completions.create(
+        model=app_settings.azure_openai.model,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=32,
+        stream=True,
+    )
+    ttft = None
+    async for chunk in stream:
+        if ttft is None and chunk.choices and chunk.choices[0].delta.content:
+            ttft = time.perf_counter() - start
+    return ttft if ttft is not None else time.perf_counter() - start
+
+
+async def request_before(args):
+    if app_settings.azure_openai.key:
+        client = build_client()
+        async with client:
+            return await first_token(client, args.prompt)
+    async with DefaultAzureCredential() as credential:
+        client = build_client(credential)
+        async with client:
+            return await first_token(client, args.prompt)
+
+
+async def run(args, variant):
+    credential = None if app_settings.azure_openai.key else DefaultAzureCredential()
+    client = shared_client(credential) if variant == "after" else None
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        async with semaphore:
+            if client is None:
+                return await request_before(args)
+            return await first_token(client, args.prompt)
+
+    try:
+        return await asyncio.gather(*(one() for _ in range(args.requests)))
+    finally:
+        if client is not None:
+            await client.close()
+        if credential is not None:
+            await credential.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to first token with a per-request vs. a shared Azure OpenAI client")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--prompt", default="Say hello in one short sentence.")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, deployment {app_settings.azure_openai.model}")
+    print(f"{'variant':<7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for variant in ("before", "after"):
+        ttfts = asyncio.run(run(args, variant))
+        print(
+            f"{variant:<7} {statistics.median(ttfts) * 1000:>8.0f} {percentile(ttfts, 90) * 1000:>8.0f} "
+            f"{percentile(ttfts, 99) * 1000:>8.0f} {statistics.mean(ttfts) * 1000:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()